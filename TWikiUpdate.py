@@ -6,25 +6,30 @@
 ##
 
 import os, sys, glob, time, json, pdb, ast
-from selenium import webdriver
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import Select
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support.expected_conditions import presence_of_element_located
-from selenium.webdriver.firefox.options import Options
+try:
+	from selenium import webdriver
+	from selenium.webdriver.common.keys import Keys
+	from selenium.webdriver.support.ui import Select
+	from selenium.webdriver.common.by import By
+	from selenium.webdriver.support.ui import WebDriverWait
+	from selenium.webdriver.support.expected_conditions import presence_of_element_located
+	from selenium.webdriver.firefox.options import Options
+except ImportError:
+	# only needed for the --browser fallback
+	webdriver = None
+try:
+	from modules.twiki_client import SaveAttempted
+except ImportError:
+	# without requests and cernrequests only the browser can edit the page
+	class SaveAttempted(Exception):
+		pass
 
 from argparse import ArgumentParser
 parser = ArgumentParser(description="Options for batch run")
 parser.add_argument('--headless', action="store_true", dest='headless', help='Do things without opening browser')
+parser.add_argument('--browser', action="store_true", dest='browser', help='Edit the page through Firefox instead of HTTP requests')
 args = parser.parse_known_args()[0]
 
-options = Options()
-options.setAcceptInsecureCerts = True
-options.setAcceptUntrustedCertificates = True
-options.setAssumeUntrustedCertificateIssuer = False
-options.headless = args.headless
-
 # options.binary = os.path.join(os.environ['HOME'], ".local/firefox/firefox") 
 # provide path of geckodriver for firefox
 # sys.path.append(os.path.join(os.environ['HOME'], ".local/bin"))
@@ -33,6 +38,13 @@ url = "https://twiki.cern.ch/twiki/bin/viewauth/CMS/PdmVTriggerConditionValidati
 
 class AccessFirefox:
 	def __init__(self):
+		if webdriver is None:
+			raise ImportError('selenium is needed to edit the page through Firefox')
+		options = Options()
+		options.setAcceptInsecureCerts = True
+		options.setAcceptUntrustedCertificates = True
+		options.setAssumeUntrustedCertificateIssuer = False
+		options.headless = args.headless
 		self.profile_path = os.path.join(os.environ['HOME'],'.mozilla/firefox')
 		self.profile_name = 'alcauser'
 		self.profile_file = self.get_profile_file()
@@ -66,6 +78,9 @@ class AccessFirefox:
 
 	def append_section(self, section):
 		OriginalText = self.browser.find_element(By.XPATH, '//*[@id="topic"]').get_attribute("value")
+		if section.strip() in OriginalText:
+			print(">> The section is already in the topic")
+			return
 		OriginalText = OriginalText.strip().strip("%MyButtons%")
 		NewText = OriginalText + section
 		topic = self.browser.find_element(By.XPATH, '//*[@id="topic"]')
@@ -73,131 +88,65 @@ class AccessFirefox:
 		topic.submit()
 
 def get_config_for_twiki():
-	from modules.jira_api import get_workflow_id_names
-	campID, wf_names = get_workflow_id_names()
+	from modules.twiki_render import load_workflows, campaign_ids, workflow_names
+	workflows = load_workflows()
 	envs = json.load(open('envs.json'))
-	return {'campID':campID, 'wf_names':wf_names, 'envs':envs}
+	return {'campID':campaign_ids(workflows), 'wf_names':workflow_names(workflows), 'envs':envs}
 
 def compose_section(campID, wf_names, envs, dqm={}, **kwargs):
 	"""Compose twiki section"""
-	dmytro = 'https://dmytro.web.cern.ch/dmytro/cmsprodmon/requests.php?campaign='
-	conddb = 'https://cms-conddb.cern.ch/cmsDbBrowser/list/Prod/gts/'
-	GTdiff = 'https://cms-conddb.cern.ch/cmsDbBrowser/diff/Prod/gts'
-	reqmgr = 'https://cmsweb.cern.ch/reqmgr2/fetch?rid='
-	daslink= 'https://cmsweb.cern.ch/das/request?view=list&limit=50&instance=prod/global&input=summary+dataset='
-	HLT = ('HLT', str(*campID['HLT']))
-	PR = ('Prompt', str(*campID['PR']))
-	EXPR = ('Express', str(*campID['EXPR']))
-
-	section = '\n\n---++ Week %s' %envs['Week'].strip('Week').strip()
-	section += '\n---+++ %s\n' %envs['Title']
-	section += '\n*Description*: %s\n' %envs['emailSubject']
-	section += '\n%StartTwisty%'
-
-	section += '\n*Campaign IDs and JIRA link*: '
-	for wf, campaign in (HLT, PR, EXPR): 
-		if not wf in envs['WorkflowsToSubmit'].split('/'): continue
-		section += '\n   * *{2} Campaign*: [[{0}{1}][{1}]]'.format(dmytro, campaign, wf)
-	section += '\n   * *Jira*: [[https://its.cern.ch/jira/browse/CMSALCA-{jira}][CMSALCA-{jira}]]\n'.format(jira=envs['Jira'])
-
-	section += '\n*Hypernews links*: '
-	section += '\n   * *New tag validation request*: [[{0}][{0}]]'.format(envs['ValidationRequest'])
-	section += '\n   * *Request email with full details about validation*: [[][]]'
-	section += '\n   * *Email after the new tag is deployed*: [[][]]'
-
-	section += '\n\n*Details for the workflows*:  \n   * *Dataset*: %s' % envs['Dataset']
-	for run, LS in ast.literal_eval(envs['Run']).items():
-		section += '\n   * *Run/s*: %s, LS: %s recorded on %s with B-field %sT' % (run, LS, envs['start_date'], envs['b_field'])
-	section += '\n   * *HLT Key*: %s' % envs['hlt_key']
-	section += '\n   * *CMSSW*: %s\n' % envs['HLT_release']
-
-	# GT table
-	section += '%TABLE{ caption="Conditions Table" valign="middle" headeralign="center"}%'
-	c1 = '\n| *Conditions Type* |'; c2 = '\n| Target |'; c3 = '\n| Reference |'; c4 = '\n| Common |'; c5 = '\n| |'
-	for wf, campID in (HLT, PR, EXPR):
-		if not wf in envs['WorkflowsToSubmit']: continue
-		c1 += ' *%s* |'% wf
-		c2 += ' [[{0}{1}][{1}]] |'.format(conddb, envs['TargetGT_%s' % wf])
-		c3 += ' [[{0}{1}][{1}]] |'.format(conddb, envs['ReferenceGT_%s' % wf])
-		c4 += ' [[{0}{1}][{1}]] |'.format(conddb, envs['TargetGT_Prompt']) if wf=='HLT' else ' |'
-		c5 += ' [[{0}][{1}]] |'.format('%s/%s/%s' %(GTdiff, envs['TargetGT_%s' % wf], envs['ReferenceGT_%s' % wf]), 'Target vs Reference')
-	section += c1 + c2 + c3 + c4 + c5 if 'HLT' in envs['WorkflowsToSubmit'] else c1 + c2 + c3 + c5
-
-	# Request Manager Workflow table
-	section += '%TABLE{ caption="Workflows Table" valign="middle" headeralign="center" dataalign="center,left,left,left,center,center"}%'
-	section += '\n\n| *Index* | *PD* | *Description* | *Workflow name* | *DQM Plots* | *Overlay* |'
-	count = 1; pd_sect = len(envs['WorkflowsToSubmit'].split('/'))*2
-	for dataset in envs['Dataset'].split(','):
-		dname = dataset.split('/')[1].strip()
-		for condition, ckey in [('HLT', 'HLT'), ('Express', 'EXPR'), ('Prompt', 'PR')]:
-			if not condition in envs['WorkflowsToSubmit']: continue
-			for Type in ('New Conditions', 'Reference Conditions'):
-				section += '\n|WF%s| %s | %s %s | %s | %s | %s |'%(
-					count,
-					'[[{0}{1}+run={2}][{1}]]'.format(daslink, dataset, envs['run_number']) if count%pd_sect==1 else '^',
-					condition,
-					Type,
-					'[[{0}{1}][{1}]]'.format(reqmgr, wf_names[ckey+'_'+Type.replace(' ', '').lower()[:5]+'_'+dname]),
-					'[[%s][%s]]' % (dqm[ckey+'_'+Type.replace(' ', '').lower()[:5]+'_'+dname], 'DQM'),
-					'[[%s][%s]]' % (dqm[condition+'_'+dname], 'Overlay plots') if count%2==1 else '^' 
-				)
-				count += 1
-	section += '\n%ENDTWISTY%'
-	section += '\n%MyButtons%'
-	return section
+	from modules.twiki_render import SectionRenderer
+	return SectionRenderer().render(campID, wf_names, envs, dqm)
 
 def get_DQM_links(envs, **kwargs):
 	"""Create DQM links. Inputs needed are
 	1) workflow_config.json file which contains configuration of the submission
 	2) envs dictionary containing input information of run_number"""
-	ifile = 'workflow_config.json'	
-	if os.path.exists(ifile):
-		config = json.load(open(ifile))
-	else:
-		raise FileNotFoundError('Create %s by submitting relval for production' %ifile)
-
-	dataset = dict()
-	for section in config.keys():
-		sec = section.split('_')[:3]
-		wtype = ('_').join([sec[0], sec[1][:5], sec[2]]).strip()
-		cmssw = config[section]['Config']['CMSSWVersion']
-		pstring = config[section]['Config']['ProcessingString']
-		dname = config[section]['Config']['Task1']['InputDataset'].split('/')[1].strip()
-		dataset[wtype] = '/'+ dname +'/'+ cmssw +'-'+ pstring +'-v1/DQMIO'
-
-	links = dict.fromkeys(dataset)
-	s1 = 'https://cmsweb.cern.ch/dqm/relval/start?runnr=%s;' % envs['run_number']
-	s3 = 'workspace=Everything'
-	s4 = 'referencepos=ratiooverlay;referenceshow=all;referencenorm=True;'
-	for key in links.keys():
-		s2 = 'dataset=%s;' % dataset[key]
-		links[key] = s1 + s2 + s3
-
-	for ds in envs['Dataset'].split(','):
-		dname = ds.split('/')[1].strip()
-		for key, wf in [('HLT', 'HLT'), ('EXPR', 'Express'), ('PR', 'Prompt')]:
-			if not wf in envs['WorkflowsToSubmit']: continue
-			s2 = 'dataset=%s;' % dataset[key+'_newco_'+dname]
-			s5 = 'referenceobj1=other%3A%3A{}%3A%3A;'.format(dataset[key+'_refer_'+dname])
-			links[wf+'_'+dname] = s1 + s2 + s4 + s5 + s3 
-	return links
+	from modules.twiki_render import load_workflows, dqm_links
+	return dqm_links(envs, load_workflows())
 
 #--------------------------------------------------------------------------
 
-if __name__ == '__main__':
+def update_with_requests(section):
+	"""Append the section with plain HTTP requests"""
+	from modules.twiki_client import TWikiClient
+	client = TWikiClient(url)
+	print("Trying to open TWiki.cern.ch")
+	client.login()
+	client.append_section(section)
+
+def update_with_browser(section):
+	"""Append the section through Firefox"""
+	instance = AccessFirefox()
 	try:
-		instance = AccessFirefox()
 		print("Trying to open TWiki.cern.ch")
 		instance.login(url)
 		OrignalTopic = instance.copy_page_content()
+		instance.append_section(section)
+	finally:
+		instance.browser.quit()
+
+#--------------------------------------------------------------------------
 
+if __name__ == '__main__':
+	try:
 		config = get_config_for_twiki()
 		links = get_DQM_links(**config)
 		NewSection = compose_section(dqm=links, **config)
-		instance.append_section(NewSection)
+		updated = False
+		if not args.browser:
+			try:
+				update_with_requests(NewSection)
+				updated = True
+			except SaveAttempted as e:
+				# the topic may be saved, the browser would append the section twice
+				print(">> Update through HTTP requests failed after saving, check the topic:", e)
+				updated = True
+			except Exception as e:
+				print(">> Update through HTTP requests failed, falling back to the browser:", e)
+		if not updated:
+			update_with_browser(NewSection)
 	except Exception as e:
 		print(e)
-	finally:
-		instance.browser.quit()
 
-	#------------------------------------------------------------------------
\ No newline at end of file
+	#------------------------------------------------------------------------
@@ -5,13 +5,19 @@ import ast
 import os
 import sys
 import re
+import json
 import datetime
+from collections import OrderedDict
 
 from optparse import OptionParser
 
 sys.path.append('/afs/cern.ch/cms/PPD/PdmV/tools/prod/devel/')
 from phedex import phedex
 from modules import wma
+from modules import resource_estimator
+from modules import job_splitting
+from modules import input_discovery
+from modules.input_planner import InputPlanner, write_file_list
 
 DRYRUN = False # pass option --dry to set to true
 
@@ -94,6 +100,21 @@ def createOptionParser():
                         help="Prevents the site check to be operated",
                         default=False,
                         action='store_true')
+    parser.add_option("--planInput",
+                        help="Choose the input files and number of events of the local test from the DBS event counts",
+                        default=False,
+                        action='store_true')
+    parser.add_option("--nEvents",
+                        help="Number of events of the local test, -1 to process all the selected lumisections (default: 100)",
+                        type="int",
+                        default=100)
+    parser.add_option("--prefetch",
+                        help="Copy the input files of the local test to a node-local cache before running it",
+                        default=False,
+                        action='store_true')
+    parser.add_option("--lumisPerJob",
+                        help="LumisPerJob of the tasks: auto chooses it from the DBS lumisections for jobs of 2-4 hours, or a fixed number (default: auto)",
+                        default='auto')
 
     (options,args) = parser.parse_args()
 
@@ -103,6 +124,9 @@ def createOptionParser():
     if (options.runLs):
         options.runLs = ast.literal_eval(options.runLs)
 
+    if options.lumisPerJob != 'auto' and not options.lumisPerJob.isdigit():
+        parser.error("option --lumisPerJob is either auto or a number")
+
 
     CMSSW_VERSION = 'CMSSW_VERSION'
     if CMSSW_VERSION not in os.environ:
@@ -128,8 +152,23 @@ def createOptionParser():
     if (options.run):
         options.run = options.run.split(',')
 
+    # {run: lumi ranges, None for the full run} of all the runs, in run order
+    if (options.runLs):
+        options.runLs = dict((str(run), input_discovery.merge_lumi_ranges(ranges)) for run, ranges in options.runLs.items())
+        options.runs = OrderedDict((run, options.runLs[run]) for run in sorted(options.runLs, key=int))
+    else:
+        options.runs = OrderedDict((run, None) for run in sorted(options.run, key=int))
+
     return options
 
+def firstRun(options):
+    return list(options.runs)[0]
+
+def runsLabel(options):
+    """The run of the request names, first_last for several runs"""
+    runs = list(options.runs)
+    return runs[0] if len(runs) == 1 else '%s_%s' % (runs[0], runs[-1])
+
 #-------------------------------------------------------------------------------
 
 def getConfCondDictionary(conditions_filename):
@@ -402,23 +441,52 @@ def getDriverDetails(Type, release, ds, B0T, HIon, pA, cosmics, recoRelease):
 
 #-------------------------------------------------------------------------------
 def step1(options):
-    """Collect list of input files, needed for dry run"""
+    """Collect list of input files, needed for dry run.
+    The files of every (dataset, run) are discovered concurrently in DBS3 and merged in step1_files.txt,
+    the lumi ranges of all the runs in step1_lumi_ranges.txt"""
     dfile.write("\n# Step1: create list of input files\n")
-    run = options.run[0] if options.run else str(options.runLs).split(":")[0].strip("{u").strip("'")
-    value2 = None if options.run else list(options.runLs.items())[0][1]
-    command1 = "echo '' > step1_files.txt\n"
-    execme(command1, echo=False)
-    for dataset in options.ds:
-        dasgo0 = "dasgoclient --limit 10 --format json --query 'lumi,file dataset={} run={}'"
-        if options.runLs:
-            dasgo = dasgo0 + " | das-selected-lumis.py {} | sort -u >> step1_files.txt\n"
-            execme(dasgo.format(dataset, run, "%s,%s"%(value2[0][0],value2[0][1]) ), echo=False)
-        else:
-            dasgo = "dasgoclient --limit 10 --format list --query 'file dataset={} run={}' >> step1_files.txt"
-            execme(dasgo.format(dataset, run), echo=False)
+    if options.planInput:
+        planStep1(options)
+        prefetchStep1(options)
+        return
+    files = input_discovery.discover(options.ds, options.runs)
+    if not files:
+        raise ValueError("No input files found in DBS for runs %s of %s" % (",".join(options.runs), ",".join(options.ds)))
+    write_file_list(files)
+    dfile.write("\n# step1_files.txt written by the input discovery: %d files\n" % (len(files)))
+    writeLumiRanges(options)
+    prefetchStep1(options)
+
+def writeLumiRanges(options):
+    """The merged LumiMask of all the runs, read by cmsDriver --lumiToProcess"""
     if options.runLs:
-        command3 = 'echo \'{}\' > step1_lumi_ranges.txt\n'.format("{\""+run+"\": %s}"%(value2))
-        execme(command3, echo=False)
+        execme("echo '%s' > step1_lumi_ranges.txt\n" % (json.dumps(options.runLs, sort_keys=True)), echo=False)
+
+def prefetchStep1(options):
+    """Copy the input files once to the node-local cache, only useful for the local tests"""
+    if options.prefetch and DRYRUN:
+        execme("python3 -m modules.prefetch step1_files.txt\n", echo=False)
+
+def planStep1(options):
+    """Write the list of input files and set the number of events from the DBS event counts.
+    Every (dataset, run) is planned concurrently, they are used in order until there are enough events"""
+    pairs = [(dataset, run) for dataset in options.ds for run in options.runs]
+    plans = input_discovery.map_pairs(lambda dataset, run: InputPlanner(dataset, run, options.runs[run]).plan(options.nEvents),
+                                      pairs)
+    files = []
+    nevents = 0
+    for found in plans:
+        files.extend(f for f in found.files if f not in files)
+        nevents += found.nevents
+        if options.nEvents > 0 and nevents >= options.nEvents:
+            nevents = options.nEvents
+            break
+    if not files:
+        raise ValueError("No input files found in DBS for runs %s of %s" % (",".join(options.runs), ",".join(options.ds)))
+    write_file_list(files)
+    options.nEvents = nevents
+    dfile.write("\n# step1_files.txt written by the input planner: %d files, %d events\n" % (len(files), nevents))
+    writeLumiRanges(options)
 
 def splitOptions(command, echo = True):
     if echo: dfile.write("\n")
@@ -466,12 +534,8 @@ def collect_commands(options):
 
 def createHLTConfig(options):
     assert os.path.exists("%s/src/HLTrigger/Configuration/" % (options.hltCmsswDir)), "error: HLTrigger/Configuration/ is missing in the CMSSW release for HLT (set to: echo $CMSSW_VERSION ) - can't create the HLT configuration "
-    onerun = 0
-
-    if (options.run):
-        onerun = options.run[0]
-    elif (options.runLs):
-        onerun = options.runLs.keys()[0]
+    # the runs of a validation are expected to share the menu of the first one
+    onerun = firstRun(options)
 
     if options.HLT == "SameAsRun":
         hlt_command = "hltGetConfiguration --unprescale --cff --offline " +\
@@ -496,6 +560,54 @@ def createHLTConfig(options):
         execme(cmssw_command + '; ' + hlt_command + '; ' + patch_command + '; ' + patch_command2 + '; ' + build_command)
         print("\n CMSSW release for HLT doesn't allow usage of hltGetConfiguration out-of-the-box, patching configuration ")
 
+def inputConf(options, ds):
+    """Input of a request: all the runs are in lumi_list with runLs, otherwise in the run whitelist"""
+    text = 'input_name = %s\n' % (ds)
+    if not options.runLs:
+        text += 'dset_run_dict = %s\n' % ({ds: [int(run) for run in options.runs]})
+    return text
+
+def splittingLumis(options, ds):
+    """Selected lumisections of ds with their events, to tune the LumisPerJob of the tasks"""
+    if DRYRUN or options.lumisPerJob != 'auto':
+        return None
+    try:
+        return job_splitting.dbs_lumis(ds, options.runs)
+    except Exception as e:
+        print("Could not get the lumisections of %s from DBS, using 1 lumi per job: %s" % (ds, e))
+        return None
+
+def lumisPerJob(options, lumis, task, time_event):
+    if options.lumisPerJob != 'auto':
+        return int(options.lumisPerJob)
+    if not lumis:
+        return 1
+    # only the first task reads the input files, the others read the merged output of a task
+    best = job_splitting.SplittingTuner(lumis, file_boundaries=(task == 1)).tune(time_event)
+    print("Task%d: %s" % (task, job_splitting.describe(best)))
+    return best.lumis_per_job
+
+def resourceConf(estimator, options, ds, step, task, time_event, lumis=None):
+    """TimePerEvent, Memory, SizePerEvent and LumisPerJob of a task, estimated from the local tests
+    measured so far. Without measurements the given time_event and 8 GB are used"""
+    scen = resource_estimator.scenario(options.cosmics, options.HIon)
+    estimate = estimator.estimate(options.release, options.Type, ds, scen, step) or {}
+    if estimate:
+        print("Resources of %s of %s estimated from %s: %s s/event, %s MB" % (step, ds, estimate['source'],
+                estimate['time_event'], estimate['size_memory']))
+    time_event = estimate.get('time_event') or time_event
+    size_memory = estimate.get('size_memory') or 8000
+    text = 'step%d_lumisperjob = %d\n' % (task, lumisPerJob(options, lumis, task, time_event))
+    if task == 1:
+        text += 'time_event = %s\n' % (time_event) +\
+                'size_memory = %d\n' % (size_memory)
+        if estimate.get('size_event'):
+            text += 'size_event = %d\n' % (estimate['size_event'])
+        return text
+    return text +\
+           'step%d_timeevent = %s\n' % (task, time_event) +\
+           'step%d_memory = %d\n' % (task, size_memory)
+
 def createCMSSWConfigs(options,confCondDictionary,allRunsAndBlocks):
     details = getDriverDetails(options.Type, options.release, options.ds, options.B0T, options.HIon,options.pA, options.cosmics, options.recoRelease)
     # get processing string
@@ -524,7 +636,7 @@ def createCMSSWConfigs(options,confCondDictionary,allRunsAndBlocks):
                 "--filein '%s' " % ("filelist:step1_files.txt") +\
                 "--fileout '%s' " % ("file:step2.root") +\
                 "--no_exec " +\
-                "-n 100 "
+                "-n %d " % (options.nEvents)
 
         if details['eventcontent']:
             driver_command += "--eventcontent %s " % (details['eventcontent'])
@@ -574,7 +686,7 @@ def createCMSSWConfigs(options,confCondDictionary,allRunsAndBlocks):
                             "--conditions %s " % (options.basegt) +\
                             "--python_filename reco.py " +\
                             "--no_exec " +\
-                            "-n 100 "
+                            "-n %d " % (options.nEvents)
 
             execme(driver_command)
 
@@ -594,7 +706,7 @@ def createCMSSWConfigs(options,confCondDictionary,allRunsAndBlocks):
                             "--fileout=file:step3.root " +\
                             "--python_filename recodqm_%s.py "% (label) +\
                             "--no_exec " +\
-                            "-n 100 "
+                            "-n %d " % (options.nEvents)
 
             if 'customise' in recodqm.keys() and recodqm['customise'] != "":
                 driver_command += "--customise %s " % (recodqm['customise'])
@@ -636,7 +748,7 @@ def createCMSSWConfigs(options,confCondDictionary,allRunsAndBlocks):
                             "--fileout=file:step4.root " +\
                             "--python_filename=step4_%s_HARVESTING.py " % (label) +\
                             "--no_exec " +\
-                            "-n 100 "
+                            "-n %d " % (options.nEvents)
 
             if recodqm['era'] != "":
                 driver_command += "--era %s " % (recodqm['era'])
@@ -663,7 +775,7 @@ def createCMSSWConfigs(options,confCondDictionary,allRunsAndBlocks):
                             "--filein=file:%s " % (filein) +\
                             "--python_filename=step4_%s_HARVESTING.py " % (label) +\
                             "--no_exec " +\
-                            "-n 100 "
+                            "-n %d " % (options.nEvents)
             if details['era'] != "":
                 driver_command += "--era %s " % (details['era'])
             execme(driver_command)
@@ -699,6 +811,10 @@ def createCMSSWConfigs(options,confCondDictionary,allRunsAndBlocks):
         else:
             gtshort = options.basegt
 
+    # the resources of the tasks are learnt from the local tests run with relval_submit.py --perf
+    estimator = resource_estimator.ResourceEstimator()
+    lumis = dict((ds, splittingLumis(options, ds)) for ds in options.ds)
+
     # Creating the WMC cfgfile
     wmcconf_text = '[DEFAULT] \n'+\
                     'group=ppd \n'+\
@@ -733,18 +849,14 @@ def createCMSSWConfigs(options,confCondDictionary,allRunsAndBlocks):
             wmcconf_text += '"%s" : [],\n ' % (ds)
     wmcconf_text += '}\n'
     """
-    onerun = 0
-    if (options.run):
-        onerun = options.run[0]
-    elif (options.runLs):
-        onerun = options.runLs.keys()[0]
+    onerun = runsLabel(options)
 
-    # lumi_list is set as a general parameter,
+    # lumi_list is set as a general parameter, with the lumi ranges of all the runs,
     # under the assumption that all workflows need be run on the same set of events
     if (options.runLs):
         wmcconf_text += 'lumi_list=%s\n' % (options.runLs)
 
-    wmcconf_text+='multicore=4\n'
+    wmcconf_text+='multicore=%d\n' % (resource_estimator.MULTICORE)
     wmcconf_text += 'enableharvesting = True\n'
     wmcconf_text += 'dqmuploadurl = https://cmsweb.cern.ch/dqm/relval\n'
     wmcconf_text += 'subreq_type = RelVal\n\n'
@@ -762,12 +874,10 @@ def createCMSSWConfigs(options,confCondDictionary,allRunsAndBlocks):
             ds_name = ds_name.replace("-","_")
             label   = cfgname.lower().replace('.py', '')[0:5]
             wmcconf_text += '[%s_reference_%s]\n' % (details['reqtype'],ds_name) +\
-                            'input_name = %s\n' % (ds) +\
+                            inputConf(options, ds) +\
                             'request_id = %s__ALCA_%s-%s_%s_%srefer\n' % (options.release,options.jira,datetime.datetime.now().strftime("%Y_%m_%d_%H_%M"),ds_name, details['reqtype']) +\
                             'keep_step1 = True\n' +\
-                            'time_event = 10\n' +\
-                            'size_memory = 8000\n' +\
-                            'step1_lumisperjob = 1\n' +\
+                            resourceConf(estimator, options, ds, 'step1', 1, 10, lumis[ds]) +\
                             'processing_string = %s_%sref_%s \n' % (processing_string, details['reqtype'], refgtshort) +\
                             'cfg_path = REFERENCE.py\n' +\
                             'req_name = %s_reference_RelVal_%s\n' % (details['reqtype'], onerun) +\
@@ -794,23 +904,20 @@ def createCMSSWConfigs(options,confCondDictionary,allRunsAndBlocks):
                     label = cfgname.lower().replace('.py', '')[0:5]
                     ReqLabel = details['reqtype']+label
                     wmcconf_text += '\n[%s_%s_%s]\n' % (details['reqtype'], label, ds_name) +\
-                                    'input_name = %s\n' % (ds) +\
+                                    inputConf(options, ds) +\
                                     'request_id=%s__ALCA_%s-%s_%s_%s\n' % (options.release,options.jira,datetime.datetime.now().strftime("%Y_%m_%d_%H_%M"),ds_name,ReqLabel) +\
                                     'keep_step%d = True\n' % (task) +\
-                                    'time_event = 1\n' +\
-                                    'size_memory = 8000\n' +\
-                                    'step1_lumisperjob = 1\n' +\
+                                    resourceConf(estimator, options, ds, 'step1', 1, 1, lumis[ds]) +\
                                     'processing_string = %s_%s_%s \n' % (processing_string, details['reqtype']+label, refsubgtshort) +\
                                     'cfg_path = %s\n' % (cfgname) +\
                                     'req_name = %s_%s_RelVal_%s\n' % (details['reqtype'], label, onerun) +\
                                     'globaltag = %s\n' % (refsubgtshort) +\
                                     'step%d_output = %s\n' % (task, 'FEVTDEBUGoutput' if options.cosmics else 'FEVTDEBUGHLToutput') +\
                                     'step%d_cfg = recodqm_%s.py\n' % (task, label) +\
-                                    'step%d_lumisperjob = 1\n' % (task) +\
                                     'step%d_globaltag = %s \n' % (task, gtshort) +\
                                     'step%d_processstring = %s_%s_%s \n' % (task, processing_string, details['reqtype']+label, refsubgtshort) +\
                                     'step%d_input = Task1\n' % (task) +\
-                                    'step%d_timeevent = 10\n' % (task)
+                                    resourceConf(estimator, options, ds, 'recodqm', task, 10, lumis[ds])
 
                     if options.recoRelease:
                         wmcconf_text += 'step%d_release = %s \n' % (task, options.recoRelease)
@@ -834,23 +941,20 @@ def createCMSSWConfigs(options,confCondDictionary,allRunsAndBlocks):
                 label = cfgname.lower().replace('.py', '')[0:5]
                 ReqLabel = details['reqtype']+label
                 wmcconf_text += '\n\n[%s_%s_%s]\n' %(details['reqtype'], label, ds_name) +\
-                                'input_name = %s\n' % (ds) +\
+                                inputConf(options, ds) +\
                                 'request_id=%s__ALCA_%s-%s_%s_%s\n' % (options.release,options.jira,datetime.datetime.now().strftime("%Y_%m_%d_%H_%M"),ds_name,ReqLabel) +\
                                 'keep_step%d = True\n' % (task) +\
-                                'time_event = 1\n' +\
-                                'size_memory = 8000\n' +\
-                                'step1_lumisperjob = 1\n' +\
+                                resourceConf(estimator, options, ds, 'step1', 1, 1, lumis[ds]) +\
                                 'processing_string = %s_%s_%s \n' % (processing_string, details['reqtype']+label, subgtshort) +\
                                 'cfg_path = %s\n' % (cfgname) +\
                                 'req_name = %s_%s_RelVal_%s\n' % (details['reqtype'], label, onerun) +\
                                 'globaltag = %s\n' % (subgtshort) +\
                                 'step%d_output = %s\n' % (task, 'FEVTDEBUGoutput' if options.cosmics else 'FEVTDEBUGHLToutput') +\
                                 'step%d_cfg = recodqm_%s.py\n' % (task, label) +\
-                                'step%d_lumisperjob = 1\n' % (task) +\
                                 'step%d_globaltag = %s \n' % (task, gtshort) +\
                                 'step%d_processstring = %s_%s_%s \n' % (task, processing_string, details['reqtype']+label, subgtshort) +\
                                 'step%d_input = Task1\n' % (task) +\
-                                'step%d_timeevent = 10\n' % (task)
+                                resourceConf(estimator, options, ds, 'recodqm', task, 10, lumis[ds])
                 if options.recoRelease:
                     wmcconf_text += 'step%d_release = %s \n' % (task,options.recoRelease)
                 wmcconf_text += 'harvest_cfg=step4_%s_HARVESTING.py\n\n' % (label)
@@ -862,12 +966,10 @@ def createCMSSWConfigs(options,confCondDictionary,allRunsAndBlocks):
                     label = cfgname.lower().replace('.py', '')[0:5]
                     ReqLabel = details['reqtype']+label
                     wmcconf_text += '\n\n[%s_%s_%s]\n' % (details['reqtype'], label,ds_name) +\
-                                    'input_name = %s\n' % (ds) +\
+                                    inputConf(options, ds) +\
                                     'request_id=%s__ALCA_%s-%s_%s_%s\n' % (options.release,options.jira,datetime.datetime.now().strftime("%Y_%m_%d_%H_%M"),ds_name,ReqLabel) +\
                                     'keep_step1 = True\n' +\
-                                    'time_event = 10\n' +\
-                                    'size_memory = 8000\n' +\
-                                    'step1_lumisperjob = 1\n' +\
+                                    resourceConf(estimator, options, ds, 'step1', 1, 10, lumis[ds]) +\
                                     'processing_string = %s_%s_%s \n' % (processing_string, details['reqtype']+label, gtshort) +\
                                     'cfg_path = %s\n' % (cfgname) +\
                                     'req_name = %s_%s_RelVal_%s\n' % (details['reqtype'], label, onerun) +\
@@ -936,10 +1038,10 @@ def printInfo(options):
     print("type: %s" % (options.Type))
     print("dataset: %s" % (",".join(options.ds)))
     #print "run: %s" % (",".join(options.run))
-    if (options.run):
-        print("run: %s" % (",".join(options.run)))
-    elif (options.runLs):
+    if (options.runLs):
         print("run: %s" % (options.runLs))
+    else:
+        print("run: %s" % (",".join(options.runs)))
 
     if "HLT" in options.Type or "EXPR+RECO" in options.Type:
         print("HLT menu: %s" % (menu))
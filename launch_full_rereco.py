@@ -38,6 +38,10 @@ def build_parser():
                     help="Prepare all the configurations")
     parser.add_option("--test",default=False,action='store_true',
                     help="Do a dry run")
+    parser.add_option("--workers",default=4,type='int',
+                    help="Number of configurations uploaded and of requests submitted at the same time")
+    parser.add_option("--pds",default='',
+                    help="Comma separated primary datasets to submit, all of them by default")
 
     options, args = parser.parse_args()
     return options, args
@@ -0,0 +1,112 @@
+"""
+Module that has BulkSubmitter class
+
+Injects and approves many ReqMgr2 requests concurrently, with retries and
+an exponential backoff. Every step is appended to the RequestStore, so
+that a submission interrupted halfway can be resumed without injecting the
+same request twice. An injection is only retried when it could not be sent
+at all: after any other error ReqMgr2 may already have created the
+workflow, and the request is left SUBMITTING to be checked by hand.
+"""
+from __future__ import print_function
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor
+from modules import wma
+from modules.request_store import SUBMITTING, INJECTED, APPROVED, FAILED, PREPARED, request_pd
+
+
+class RetriesExhausted(RuntimeError):
+    pass
+
+
+class BulkSubmitter():
+
+    def __init__(self, journal, url=None, workers=4, retries=3, backoff=5, approve=True):
+        """Concurrent submission of requests to ReqMgr2
+
+        Arguments
+        journal -- RequestStore of the campaign
+        url -- ReqMgr2 host, wma.WMAGENT_URL by default
+        workers -- number of requests handled at the same time
+        retries -- attempts per request and per step
+        backoff -- seconds to wait after the first failure, doubled at every retry
+        approve -- approve the injected requests
+        """
+        self.journal = journal
+        self.url = url or wma.WMAGENT_URL
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.approve = approve
+
+    def retry(self, what, function, args, retriable=(Exception, SystemExit)):
+        """Call function, retrying on the retriable errors. wma exits on HTTP
+        errors, so SystemExit is caught by default as well"""
+        for attempt in range(self.retries):
+            try:
+                return function(*args)
+            except retriable as e:
+                if attempt == self.retries - 1:
+                    raise RetriesExhausted("%s failed after %d attempts: %s" % (what, self.retries, e))
+                wait = self.backoff * 2**attempt + random.uniform(0, self.backoff)
+                print("%s failed (%s), retrying in %.0f s" % (what, e, wait))
+                time.sleep(wait)
+
+    def report_submitting(self, key):
+        print("WARNING: request %s may have been injected. "
+              "Check ReqMgr2 and mark it with" % (key))
+        print("  python3 -m modules.request_store %s --mark %s injected --workflow <name>" % (self.journal.path, key))
+        print("  python3 -m modules.request_store %s --mark %s failed    (to submit it again)" % (self.journal.path, key))
+
+    def submit_one(self, request, state):
+        key = request['RequestString']
+        pd = request_pd(request)
+        workflow = state.get('workflow')
+        try:
+            if not workflow:
+                trimmed = dict((k, v) for k, v in request.items() if not k.startswith('NR_'))
+                self.journal.append(key, pd, status=SUBMITTING)
+                try:
+                    # only the requests that were never sent are posted again
+                    workflow = self.retry("Injection of %s" % key, wma.makeRequest, (self.url, trimmed),
+                                          retriable=(wma.NotSentError,))
+                except RetriesExhausted:
+                    raise
+                except (Exception, SystemExit) as e:
+                    print("Injection of %s failed after sending it: %s" % (key, e))
+                    self.report_submitting(key)
+                    return key, SUBMITTING
+                self.journal.append(key, pd, status=INJECTED, workflow=workflow)
+            if self.approve:
+                self.retry("Approval of %s" % workflow, wma.approveRequest, (self.url, workflow))
+                self.journal.append(key, pd, status=APPROVED)
+        except RetriesExhausted as e:
+            print(e)
+            self.journal.append(key, pd, status=FAILED, error=str(e))
+            return key, FAILED
+        return key, APPROVED if self.approve else INJECTED
+
+    def submit(self, requests):
+        """Submit the requests that are not done yet. Returns {key: status}"""
+        states = self.journal.load()
+        todo = []
+        done = dict()
+        for request in requests:
+            key = request['RequestString']
+            state = states.get(key, {})
+            status = state.get('status', PREPARED)
+            if status == APPROVED or (status == INJECTED and not self.approve):
+                print("Request %s already %s as %s" % (key, status, state.get('workflow')))
+                done[key] = status
+            elif status == SUBMITTING:
+                # the injection may have succeeded before the interruption
+                self.report_submitting(key)
+                done[key] = SUBMITTING
+            else:
+                todo.append((request, state))
+        print("Submitting %d requests, %d already handled" % (len(todo), len(done)))
+        if todo:
+            with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(todo)))) as pool:
+                done.update(pool.map(lambda t: self.submit_one(*t), todo))
+        return done
@@ -7,14 +7,10 @@ in order to remove wmcontrol's dependency on WMCore
 wmcontrol: https://github.com/cms-PdmV/wmcontrol/
 WMCore: https://github.com/dmwm/WMCore/
 """
-import os
 import json
 import hashlib
 import base64
-try:
-    import httplib
-except ImportError:
-    import http.client as httplib
+from modules import credentials
 
 
 class ConfigCacheLite():
@@ -23,23 +19,9 @@ class ConfigCacheLite():
     ConfigCacheLite has a couple of basic attributes and can read and attach a file
     """
     def __init__(self, cmsweb_url):
-        env_proxy = os.getenv('X509_USER_PROXY')
-        env_cert = os.getenv('X509_USER_CERT')
-        env_key = os.getenv('X509_USER_KEY')
-        if env_proxy:
-            cert_file = env_proxy
-            key_file = env_proxy
-        elif env_cert and env_key:
-            cert_file = env_cert
-            key_file = env_key
-        else:
-            raise Exception('Missing X509_USER_PROXY or X509_USER_CERT and X509_USER_KEY')
-
         self.database_name = '/couchdb/reqmgr_config_cache'
         cmsweb_url = cmsweb_url.rstrip('/')
-        self.http_client = httplib.HTTPSConnection(cmsweb_url,
-                                                   cert_file=cert_file,
-                                                   key_file=key_file)
+        self.http_client = credentials.https_connection(cmsweb_url)
 
         self.document = {}
         self.document['type'] = "config"
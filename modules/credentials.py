@@ -0,0 +1,205 @@
+"""
+Module that has Credentials class
+
+The X509 proxy is located once per process tree (X509_USER_PROXY, the
+default /tmp/x509up_u<uid>, then voms-proxy-info -path), its remaining
+lifetime is read from the proxy certificate itself and a single
+ssl.SSLContext loaded with it is shared by every HTTPS client (DBS3,
+ReqMgr2, the config cache). The checked proxy and its expiry are exported
+in X509_USER_PROXY and ALCAVAL_PROXY_CHECKED, the child processes trust
+them instead of checking the proxy again. A warning is printed when the
+proxy expires in less than WARN_HOURS, before a long submission starts.
+
+Usage (from the top directory of the repository):
+    python3 -m modules.credentials --init
+    eval `python3 -m modules.credentials --init --export`
+"""
+from __future__ import print_function
+import os
+import sys
+import ssl
+import time
+import calendar
+import threading
+import subprocess
+try:
+    import httplib
+except ImportError:
+    import http.client as httplib
+try:
+    from cryptography import x509
+except ImportError:
+    x509 = None
+
+CHECKED = 'ALCAVAL_PROXY_CHECKED'
+# remaining lifetime below which the proxy is reported, and renewed with init
+WARN_HOURS = 6
+VOMS_INIT = 'voms-proxy-init --rfc --voms cms'
+CA_DIR = '/etc/grid-security/certificates'
+
+_lock = threading.Lock()
+_shared = None
+_contexts = dict()
+
+
+def certificate_expiry(path):
+    """Epoch of the end of validity of the first certificate of a PEM file, the proxy itself for a proxy"""
+    if x509 is not None:
+        with open(path, 'rb') as f:
+            data = f.read()
+        start = data.index(b'-----BEGIN CERTIFICATE-----')
+        end = data.index(b'-----END CERTIFICATE-----', start) + len(b'-----END CERTIFICATE-----')
+        cert = x509.load_pem_x509_certificate(data[start:end])
+        if hasattr(cert, 'not_valid_after_utc'):
+            return cert.not_valid_after_utc.timestamp()
+        # cryptography older than 42 only has the naive UTC datetime
+        return calendar.timegm(cert.not_valid_after.utctimetuple())
+    try:
+        # notAfter=Oct 21 10:00:00 2026 GMT
+        output = subprocess.check_output(['openssl', 'x509', '-enddate', '-noout', '-in', path],
+                                         stderr=subprocess.STDOUT).decode()
+        return ssl.cert_time_to_seconds(output.strip().split('=', 1)[1])
+    except (OSError, IndexError, ValueError, subprocess.CalledProcessError):
+        pass
+    output = subprocess.check_output(['voms-proxy-info', '-timeleft', '-file', path], stderr=subprocess.STDOUT)
+    return time.time() + int(output.decode().strip())
+
+
+def find_proxy():
+    """Path of the proxy, None if there is none"""
+    path = os.getenv('X509_USER_PROXY')
+    if path and os.path.exists(path):
+        return path
+    path = '/tmp/x509up_u%d' % os.getuid()
+    if os.path.exists(path):
+        return path
+    try:
+        path = subprocess.check_output(['voms-proxy-info', '-path'], stderr=subprocess.STDOUT).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return path if path and os.path.exists(path) else None
+
+
+class Credentials():
+
+    def __init__(self, warn_hours=WARN_HOURS):
+        """The proxy, or X509_USER_CERT and X509_USER_KEY, of the process tree
+
+        Arguments
+        warn_hours -- remaining lifetime below which a warning is printed
+        """
+        self.warn_hours = warn_hours
+        self.cert_file = self.key_file = None
+        self.expiry = None
+        self.warned = False
+        self.locate()
+
+    def locate(self):
+        """Find the credentials, from the exported check when the parent process made it"""
+        checked = os.getenv(CHECKED, '')
+        path, _, expiry = checked.rpartition(':')
+        if path and path == os.getenv('X509_USER_PROXY') and os.path.exists(path):
+            self.cert_file = self.key_file = path
+            self.expiry = float(expiry)
+            return
+        path = find_proxy()
+        if path:
+            self.cert_file = self.key_file = path
+            self.expiry = certificate_expiry(path)
+            self.export()
+        elif os.getenv('X509_USER_CERT') and os.getenv('X509_USER_KEY'):
+            self.cert_file = os.getenv('X509_USER_CERT')
+            self.key_file = os.getenv('X509_USER_KEY')
+            self.expiry = certificate_expiry(self.cert_file)
+
+    def export(self):
+        """Point the child processes to the checked proxy"""
+        os.environ['X509_USER_PROXY'] = self.cert_file
+        os.environ[CHECKED] = '%s:%d' % (self.cert_file, self.expiry)
+
+    def remaining(self):
+        """Seconds of validity left, None without credentials"""
+        if self.expiry is None:
+            return None
+        return self.expiry - time.time()
+
+    def check(self):
+        """Raise if there are no valid credentials, warn once if they expire soon"""
+        remaining = self.remaining()
+        if remaining is None:
+            raise Exception('Missing X509_USER_PROXY or X509_USER_CERT and X509_USER_KEY, run %s' % VOMS_INIT)
+        if remaining <= 0:
+            raise Exception('The X509 credentials %s have expired, run %s' % (self.cert_file, VOMS_INIT))
+        if remaining < self.warn_hours * 3600 and not self.warned:
+            self.warned = True
+            print(">> WARNING the X509 credentials %s expire in %.1f hours" % (self.cert_file, remaining / 3600.),
+                  file=sys.stderr)
+        return remaining
+
+    def ssl_context(self):
+        """Client context with the credentials, verifying the servers with the grid CAs when available"""
+        self.check()
+        return make_context(self.cert_file, self.key_file)
+
+
+def make_context(cert_file, key_file):
+    """One ssl.SSLContext per pair of files, shared by all the connections"""
+    with _lock:
+        if (cert_file, key_file) not in _contexts:
+            context = ssl.create_default_context()
+            ca_dir = os.getenv('X509_CERT_DIR', CA_DIR)
+            if os.path.isdir(ca_dir):
+                context.load_verify_locations(capath=ca_dir)
+            context.load_cert_chain(cert_file, key_file)
+            _contexts[(cert_file, key_file)] = context
+        return _contexts[(cert_file, key_file)]
+
+
+def credentials():
+    """The Credentials of the process, located on first use"""
+    global _shared
+    with _lock:
+        if _shared is None:
+            _shared = Credentials()
+        return _shared
+
+
+def ssl_context(cert_file=None, key_file=None):
+    """Shared context of the process credentials, or of explicit certificate and key files"""
+    if cert_file:
+        return make_context(cert_file, key_file or cert_file)
+    return credentials().ssl_context()
+
+
+def https_connection(url, cert_file=None, key_file=None):
+    """HTTPS connection to a host with the shared context"""
+    return httplib.HTTPSConnection(url, port=443, context=ssl_context(cert_file, key_file))
+
+
+def ensure_proxy(init=True, min_hours=WARN_HOURS):
+    """Check the proxy once, create it with voms-proxy-init only if it is missing or expires
+    in less than min_hours. Returns its path"""
+    global _shared
+    found = credentials()
+    remaining = found.remaining()
+    if init and (remaining is None or remaining < min_hours * 3600):
+        subprocess.check_call(VOMS_INIT, shell=True, stdout=sys.stderr)
+        with _lock:
+            os.environ.pop(CHECKED, None)
+            _shared = found = Credentials()
+    found.check()
+    return found.cert_file
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+    parser = ArgumentParser(description='Check the X509 proxy, creating it only if needed')
+    parser.add_argument('--init', action='store_true', help='Run %s if the proxy is missing or expires soon' % VOMS_INIT)
+    parser.add_argument('--min-hours', dest='min_hours', type=float, default=WARN_HOURS,
+                        help='Lifetime needed in hours (Default: %d)' % WARN_HOURS)
+    parser.add_argument('--export', action='store_true', help='Print the shell exports of the checked proxy')
+    options = parser.parse_args()
+    path = ensure_proxy(options.init, options.min_hours)
+    print(">> Proxy %s valid for %.1f hours" % (path, credentials().remaining() / 3600.), file=sys.stderr)
+    if options.export and CHECKED in os.environ:
+        print("export X509_USER_PROXY=%s; export %s=%s" % (path, CHECKED, os.environ[CHECKED]))
@@ -0,0 +1,74 @@
+"""
+Module that has RunIndex class
+
+RunIndex keeps the DBS3 run list of every dataset in the cache area, one
+file per dataset with the sorted runs and the time they were fetched.
+Run range selections (run.number >= X and <= Y) are answered by bisection
+on the cached list, DBS3 is queried once per dataset.
+"""
+from __future__ import print_function
+import os
+import re
+import time
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from modules import wma
+from modules.local_store import JsonStore, cache_dir
+
+
+def filter_runs(runs, minrun=-1, maxrun=-1):
+    """Runs of a sorted list in [minrun, maxrun], a negative bound is ignored"""
+    first = bisect_left(runs, int(minrun)) if int(minrun) >= 0 else 0
+    last = bisect_right(runs, int(maxrun)) if int(maxrun) >= 0 else len(runs)
+    return runs[first:last]
+
+
+def find_datasets(pattern):
+    """Names of the datasets matching a DBS3 pattern, e.g. /*/Run2012A-v1/RAW"""
+    dbs = wma.ConnectionWrapper()
+    return sorted(d['dataset'] for d in dbs.api('datasets', 'dataset', pattern))
+
+
+class RunIndex():
+
+    def __init__(self, directory=None, max_age=86400):
+        """Cached run lists of the datasets
+
+        Arguments
+        directory -- cache directory, dbs_runs in the cache area by default
+        max_age -- seconds after which the runs of a dataset are fetched again
+        """
+        self.directory = directory or cache_dir('dbs_runs')
+        os.makedirs(self.directory, exist_ok=True)
+        self.max_age = max_age
+
+    def store(self, dataset):
+        return JsonStore(os.path.join(self.directory, re.sub(r'[^\w.-]', '_', dataset.strip('/')) + '.json'))
+
+    def fetch(self, dataset):
+        """Sorted run numbers of a dataset according to DBS3"""
+        dbs = wma.ConnectionWrapper()
+        runs = set()
+        for entry in dbs.api('runs', 'dataset', dataset):
+            value = entry['run_num']
+            runs.update(value if isinstance(value, list) else [value])
+        return sorted(int(r) for r in runs)
+
+    def all_runs(self, dataset, refresh=False):
+        store = self.store(dataset)
+        cached = store.load()
+        if refresh or cached.get('dataset') != dataset or time.time() - cached.get('fetched_at', 0) > self.max_age:
+            print("Looking for runs in DBS for %s" % (dataset))
+            cached = {'dataset': dataset, 'runs': self.fetch(dataset), 'fetched_at': time.time()}
+            store.save(cached)
+        return cached['runs']
+
+    def runs(self, dataset, minrun=-1, maxrun=-1, refresh=False):
+        """Runs of a dataset in [minrun, maxrun]"""
+        return filter_runs(self.all_runs(dataset, refresh), minrun, maxrun)
+
+    def runs_many(self, datasets, minrun=-1, maxrun=-1, workers=8):
+        """Returns {dataset: runs in [minrun, maxrun]}, the missing datasets are fetched concurrently"""
+        datasets = list(datasets)
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(datasets)))) as pool:
+            return dict(zip(datasets, pool.map(lambda d: self.runs(d, minrun, maxrun), datasets)))
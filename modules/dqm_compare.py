@@ -0,0 +1,304 @@
+"""
+Module that has DQMComparison class
+
+Compares the MonitorElements of the new and reference DQM outputs of the
+local tests (HLT_newco_DQMoutput.root vs HLT_refer_DQMoutput.root). The
+files are read with uproot, the histograms of every top DQM folder are
+compared in a separate process, and the histograms with the same binning
+are compared together as NumPy arrays. The profiles hold means, not
+counts, they are compared on their means with their errors and ranked
+separately. The report ranks the histograms of the subsystem of the
+validation by how much they changed.
+
+Usage (from the top directory of the repository):
+    python3 -m modules.dqm_compare HLT_newco_DQMoutput.root HLT_refer_DQMoutput.root --subsystem Pixel
+"""
+from __future__ import print_function
+import re
+import json
+import html
+import math
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import uproot
+
+# DQM folders of the subsystems of the validation templates
+SUBSYSTEM_FOLDERS = {
+    'pixel': ['PixelPhase1', 'SiPixel'],
+    'tracker': ['SiStrip', 'Tracking', 'PixelPhase1', 'SiPixel'],
+    'beamspot': ['AlcaBeamMonitor', 'BeamMonitor'],
+    'ecal': ['Ecal', 'EcalBarrel', 'EcalEndcap', 'EcalPreshower'],
+    'hcal': ['Hcal', 'HcalCalib'],
+    'muon': ['CSC', 'DT', 'RPC', 'GEM'],
+}
+
+HISTOGRAM = re.compile(r'^(TH1|TH2|TProfile)')
+PROFILE = re.compile(r'^TProfile')
+METRICS = ('ks', 'chi2ndf', 'maxdev')
+
+
+def compare_batch(new, ref):
+    """Shape comparison of histograms with the same binning
+
+    Arguments
+    new, ref -- (histograms, bins) arrays of bin contents
+
+    Returns the arrays of the Kolmogorov-Smirnov distance, the chi2/ndf of
+    the two-sample test and the largest deviation of the normalized bins.
+    2D histograms are compared on their flattened bins.
+    Two empty histograms do not differ, an empty and a filled one differ
+    by 1 (ks and maxdev) and infinity (chi2ndf).
+    """
+    new = np.clip(np.asarray(new, dtype=float), 0, None)
+    ref = np.clip(np.asarray(ref, dtype=float), 0, None)
+    n1 = new.sum(axis=1)
+    n2 = ref.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = new / n1[:, None]
+        q = ref / n2[:, None]
+        ks = np.abs(np.cumsum(p, axis=1) - np.cumsum(q, axis=1)).max(axis=1)
+        maxdev = np.abs(p - q).max(axis=1)
+        both = new + ref
+        terms = (new * np.sqrt(n2 / n1)[:, None] - ref * np.sqrt(n1 / n2)[:, None])**2 / both
+        chi2 = np.where(both > 0, terms, 0).sum(axis=1)
+        chi2ndf = chi2 / np.maximum((both > 0).sum(axis=1) - 1, 1)
+    empty = (n1 == 0) | (n2 == 0)
+    same = empty & (n1 == n2)
+    ks[empty] = maxdev[empty] = 1.
+    chi2ndf[empty] = np.inf
+    ks[same] = maxdev[same] = chi2ndf[same] = 0.
+    return {'ks': ks, 'chi2ndf': chi2ndf, 'maxdev': maxdev, 'entries_new': n1, 'entries_ref': n2}
+
+
+def compare_profiles(new, ref, new_err, ref_err, new_counts, ref_counts):
+    """Comparison of profiles with the same binning on their means
+
+    Arguments
+    new, ref -- (profiles, bins) arrays of the means of the bins
+    new_err, ref_err -- errors of the means
+    new_counts, ref_counts -- entries of the bins
+
+    Returns the arrays of the largest relative deviation of the means and of
+    the largest deviation in units of the combined error (pull), on the bins
+    filled in both profiles. A bin filled in only one of them differs by 1
+    (maxdev) and infinity (pull).
+    """
+    new, ref, new_err, ref_err, new_counts, ref_counts = [np.asarray(a, dtype=float) for a in (
+        new, ref, new_err, ref_err, new_counts, ref_counts)]
+    filled = (new_counts > 0) & (ref_counts > 0)
+    diff = np.abs(new - ref)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rel = np.nan_to_num(diff / np.maximum(np.abs(new), np.abs(ref)))
+        sigma = np.sqrt(new_err**2 + ref_err**2)
+        pull = np.where(sigma > 0, diff / sigma, np.where(diff > 0, np.inf, 0.))
+    maxdev = np.where(filled, rel, 0.).max(axis=1)
+    pull = np.where(filled, pull, 0.).max(axis=1)
+    one_sided = ((new_counts > 0) != (ref_counts > 0)).any(axis=1)
+    maxdev[one_sided] = 1.
+    pull[one_sided] = np.inf
+    return {'maxdev': maxdev, 'pull': pull, 'entries_new': new_counts.sum(axis=1),
+            'entries_ref': ref_counts.sum(axis=1)}
+
+
+def run_directory(f):
+    """'DQMData/Run 344518' of a harvested DQM file"""
+    runs = [k for k in f['DQMData'].keys(recursive=False, cycle=False) if k.startswith('Run ')]
+    if len(runs) != 1:
+        raise ValueError("Expecting one run in %s, found %s, the local tests save one DQM output per run"
+                         % (f.file_path, runs))
+    return 'DQMData/' + runs[0]
+
+
+def histograms(f, folder):
+    """{path in the folder: class name} of the histograms of a folder"""
+    return dict((name, cls) for name, cls in f[folder].classnames(recursive=True, cycle=False).items()
+                if HISTOGRAM.match(cls))
+
+
+def compare_folder(new_path, ref_path, folder):
+    """Compare the histograms of one top DQM folder. Runs in a worker process"""
+    with uproot.open(new_path) as new, uproot.open(ref_path) as ref:
+        new_dir = '%s/%s' % (run_directory(new), folder)
+        ref_dir = '%s/%s' % (run_directory(ref), folder)
+        new_hists = histograms(new, new_dir)
+        ref_hists = histograms(ref, ref_dir) if ref_dir in ref else {}
+        common = sorted(set(new_hists) & set(ref_hists))
+        # group by binning, every group is compared in one go
+        groups = defaultdict(list)
+        for name in common:
+            h_new = new['%s/%s' % (new_dir, name)]
+            h_ref = ref['%s/%s' % (ref_dir, name)]
+            a = h_new.values(flow=False)
+            b = h_ref.values(flow=False)
+            if a.shape != b.shape:
+                groups['rebinned'].append((name, None, None))
+                continue
+            if PROFILE.match(new_hists[name]):
+                groups[('profile', a.shape)].append((name, [a.ravel(), h_new.errors(flow=False).ravel(),
+                                                            h_new.counts(flow=False).ravel()],
+                                                     [b.ravel(), h_ref.errors(flow=False).ravel(),
+                                                      h_ref.counts(flow=False).ravel()]))
+                continue
+            groups[a.shape].append((name, a.ravel(), b.ravel()))
+    records = []
+    for shape, items in groups.items():
+        if shape == 'rebinned':
+            for name, _, _ in items:
+                record = {'path': '%s/%s' % (folder, name), 'class': new_hists[name], 'status': 'rebinned', 'maxdev': 1.}
+                if PROFILE.match(new_hists[name]):
+                    record['pull'] = float('inf')
+                else:
+                    record.update({'ks': 1., 'chi2ndf': float('inf')})
+                records.append(record)
+            continue
+        if shape[0] == 'profile':
+            new_arrays = [np.stack([a[k] for _, a, _ in items]) for k in range(3)]
+            ref_arrays = [np.stack([b[k] for _, _, b in items]) for k in range(3)]
+            result = compare_profiles(new_arrays[0], ref_arrays[0], new_arrays[1], ref_arrays[1],
+                                      new_arrays[2], ref_arrays[2])
+        else:
+            result = compare_batch(np.stack([a for _, a, _ in items]), np.stack([b for _, _, b in items]))
+        for i, (name, _, _) in enumerate(items):
+            record = dict((key, float(values[i])) for key, values in result.items())
+            record.update({'path': '%s/%s' % (folder, name), 'class': new_hists[name],
+                           'status': 'identical' if record['maxdev'] == 0 else 'compared'})
+            records.append(record)
+    missing_new = ['%s/%s' % (folder, n) for n in sorted(set(ref_hists) - set(new_hists))]
+    missing_ref = ['%s/%s' % (folder, n) for n in sorted(set(new_hists) - set(ref_hists))]
+    return records, missing_new, missing_ref
+
+
+def subsystem_folders(folders, subsystem=None):
+    """Top DQM folders of a subsystem, all of them if no subsystem is given"""
+    if not subsystem or subsystem.lower() == 'all':
+        return sorted(folders)
+    wanted = SUBSYSTEM_FOLDERS.get(subsystem.lower(), [subsystem])
+    selected = sorted(f for f in folders if any(f.lower().startswith(w.lower()) for w in wanted))
+    if not selected:
+        print(">> No DQM folder of %s in %s, comparing all the folders" % (subsystem, ', '.join(sorted(folders))))
+        return sorted(folders)
+    return selected
+
+
+class DQMComparison():
+
+    def __init__(self, new_path, ref_path, subsystem=None, workers=None):
+        """Comparison of the new and reference DQM outputs
+
+        Arguments
+        new_path, ref_path -- harvested DQM files of the local tests
+        subsystem -- Subsystem of the validation template, all the folders if None
+        workers -- processes comparing the folders, the number of cores by default
+        """
+        self.new_path = new_path
+        self.ref_path = ref_path
+        self.subsystem = subsystem
+        self.workers = workers
+
+    def folders(self):
+        with uproot.open(self.new_path) as f:
+            top = run_directory(f)
+            folders = f[top].keys(recursive=False, cycle=False)
+        return subsystem_folders(folders, self.subsystem)
+
+    def run(self):
+        """Returns the records of all the compared histograms and the missing ones"""
+        folders = self.folders()
+        records, missing_new, missing_ref = [], [], []
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for r, mn, mr in pool.map(compare_folder, [self.new_path] * len(folders),
+                                      [self.ref_path] * len(folders), folders):
+                records.extend(r)
+                missing_new.extend(mn)
+                missing_ref.extend(mr)
+        return records, missing_new, missing_ref
+
+    def report(self, rank_by='ks', top=100):
+        """Ranked report of the most changed histograms"""
+        records, missing_new, missing_ref = self.run()
+        profiles = [r for r in records if 'pull' in r]
+        ranked = sorted((r for r in records if 'pull' not in r), key=lambda r: (-r[rank_by], -r['maxdev'], r['path']))
+        profiles.sort(key=lambda r: (-r['pull'], -r['maxdev'], r['path']))
+        return {'new': self.new_path, 'reference': self.ref_path, 'subsystem': self.subsystem,
+                'rank_by': rank_by,
+                'summary': {'compared': len(records),
+                            'identical': sum(r['status'] == 'identical' for r in records),
+                            'rebinned': sum(r['status'] == 'rebinned' for r in records),
+                            'profiles': len(profiles),
+                            'missing_in_new': len(missing_new),
+                            'missing_in_reference': len(missing_ref)},
+                'histograms': ranked[:top],
+                'profiles': profiles[:top],
+                'missing_in_new': missing_new,
+                'missing_in_reference': missing_ref}
+
+
+def to_html(report):
+    rows = ''.join('<tr><td>%d</td><td>%s</td><td>%s</td><td>%.4f</td><td>%.3g</td><td>%.4f</td>'
+                   '<td>%d</td><td>%d</td></tr>\n' % (
+                       i, html.escape(r['path']), r['class'], r['ks'], r['chi2ndf'], r['maxdev'],
+                       r.get('entries_new', 0), r.get('entries_ref', 0))
+                   for i, r in enumerate(report['histograms'], 1))
+    profiles = ''.join('<tr><td>%d</td><td>%s</td><td>%s</td><td>%.3g</td><td>%.4f</td><td>%d</td><td>%d</td></tr>\n' % (
+                       i, html.escape(r['path']), r['class'], r['pull'], r['maxdev'],
+                       r.get('entries_new', 0), r.get('entries_ref', 0))
+                       for i, r in enumerate(report['profiles'], 1))
+    summary = ', '.join('%s: %d' % (k.replace('_', ' '), v) for k, v in report['summary'].items())
+    return ('<html><head><title>DQM comparison</title></head><body>\n'
+            '<h2>%s: new vs reference</h2>\n<p>%s<br>%s<br>%s</p>\n'
+            '<table border="1"><tr><th>#</th><th>Histogram</th><th>Class</th><th>KS</th><th>chi2/ndf</th>'
+            '<th>max bin deviation</th><th>Entries new</th><th>Entries ref</th></tr>\n%s</table>\n'
+            '<h3>Profiles</h3>\n'
+            '<table border="1"><tr><th>#</th><th>Profile</th><th>Class</th><th>max pull</th>'
+            '<th>max relative deviation of the means</th><th>Entries new</th><th>Entries ref</th></tr>\n%s</table>\n'
+            '</body></html>\n') % (html.escape(str(report['subsystem'] or 'All subsystems')),
+                                   html.escape(report['new']), html.escape(report['reference']), summary, rows,
+                                   profiles)
+
+
+def json_safe(value):
+    """The report with null instead of the infinite and NaN metrics, which are not valid JSON"""
+    if isinstance(value, dict):
+        return dict((k, json_safe(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return [json_safe(v) for v in value]
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def write_report(report, output):
+    """Write the report as <output>.json and <output>.html"""
+    with open(output + '.json', 'w') as f:
+        json.dump(json_safe(report), f, indent=2, allow_nan=False)
+    with open(output + '.html', 'w') as f:
+        f.write(to_html(report))
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+    parser = ArgumentParser(description='Rank the histograms changed between the new and reference DQM outputs')
+    parser.add_argument('new', help='DQM output of the new conditions, e.g. HLT_newco_DQMoutput.root')
+    parser.add_argument('reference', help='DQM output of the reference conditions, e.g. HLT_refer_DQMoutput.root')
+    parser.add_argument('--subsystem', default=None,
+                        help='Subsystem of the validation (Default: the one of envs.json, all if there is none)')
+    parser.add_argument('--rank-by', dest='rank_by', choices=METRICS, default='ks', help='Ranking metric (Default: ks)')
+    parser.add_argument('--top', type=int, default=100, help='Histograms in the report (Default: 100)')
+    parser.add_argument('--workers', type=int, default=None, help='Processes (Default: the number of cores)')
+    parser.add_argument('--output', default='dqm_comparison', help='Report name, written as .json and .html')
+    options = parser.parse_args()
+    subsystem = options.subsystem
+    if subsystem is None:
+        try:
+            subsystem = json.load(open('envs.json')).get('Subsystem')
+        except (IOError, ValueError):
+            subsystem = None
+    report = DQMComparison(options.new, options.reference, subsystem, options.workers).report(options.rank_by, options.top)
+    write_report(report, options.output)
+    print(">> %s" % ', '.join('%s: %d' % (k, v) for k, v in report['summary'].items()))
+    for r in report['histograms'][:10]:
+        print(">> %-90s ks=%.4f chi2/ndf=%.3g maxdev=%.4f" % (r['path'], r['ks'], r['chi2ndf'], r['maxdev']))
+    for r in report['profiles'][:10]:
+        print(">> %-90s pull=%.3g maxdev=%.4f" % (r['path'], r['pull'], r['maxdev']))
+    print(">> Report written to %s.json and %s.html" % (options.output, options.output))
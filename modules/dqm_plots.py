@@ -0,0 +1,202 @@
+"""
+Module that has OverlayRenderer class
+
+Renders PNG overlays of the new and reference DQM outputs of the local
+tests, with the new/reference ratio below, for a list of DQM folders. The
+histograms are rendered by a pool of processes with the Agg backend, and
+every image is cached under the hash of the contents of the two
+histograms, so that a new rendering only draws the histograms that changed.
+
+Usage (from the top directory of the repository):
+    python3 -m modules.dqm_plots HLT_newco_DQMoutput.root HLT_refer_DQMoutput.root --folders PixelPhase1
+"""
+from __future__ import print_function
+import os
+import json
+import html
+import shutil
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import uproot
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from modules.local_store import cache_dir
+from modules.dqm_compare import run_directory, histograms, subsystem_folders
+
+# change it when the style of the plots changes, to render them again
+STYLE = 1
+CHUNK = 200
+
+
+def content_hash(name, new, ref):
+    """Hash of the contents and binning of the two histograms"""
+    digest = hashlib.sha1(('%s:%d:' % (name, STYLE)).encode())
+    for h in (new, ref):
+        digest.update(np.ascontiguousarray(h.values(flow=False), dtype=float).tobytes())
+        for axis in h.axes:
+            digest.update(np.ascontiguousarray(axis.edges(), dtype=float).tobytes())
+    return digest.hexdigest()
+
+
+def ratio(a, b):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(b != 0, a / b, np.nan)
+
+
+def draw_1d(ax, rax, new, ref, profile):
+    edges = new.axes[0].edges()
+    a = new.values(flow=False)
+    b = ref.values(flow=False)
+    if not profile and b.sum() > 0:
+        # the reference normalized to the new one, as the DQM GUI overlays
+        b = b * a.sum() / b.sum()
+    ax.stairs(b, edges, label='reference', color='tab:blue', fill=True, alpha=0.3)
+    ax.stairs(a, edges, label='new', color='tab:red', linewidth=1.5)
+    ax.legend(loc='best', fontsize='small')
+    rax.stairs(ratio(a, b), edges, color='black', baseline=None)
+    rax.axhline(1, color='grey', linestyle='--', linewidth=0.8)
+    rax.set_ylim(0.5, 1.5)
+    rax.set_ylabel('new/ref')
+
+
+def draw_2d(axes, new, ref):
+    x, y = new.axes[0].edges(), new.axes[1].edges()
+    a = new.values(flow=False)
+    b = ref.values(flow=False)
+    for ax, values, title in zip(axes, [a, b, ratio(a, b)], ['new', 'reference', 'new/ref']):
+        mesh = ax.pcolormesh(x, y, values.T, shading='flat', vmin=0.5 if title == 'new/ref' else None,
+                             vmax=1.5 if title == 'new/ref' else None)
+        ax.set_title(title, fontsize='small')
+        plt.colorbar(mesh, ax=ax)
+
+
+def render(path, name, cls, new, ref):
+    if cls.startswith('TH2') or cls.startswith('TProfile2D'):
+        fig, axes = plt.subplots(1, 3, figsize=(15, 4))
+        draw_2d(axes, new, ref)
+    else:
+        fig, (ax, rax) = plt.subplots(2, 1, figsize=(7, 6), sharex=True, gridspec_kw={'height_ratios': [3, 1]})
+        draw_1d(ax, rax, new, ref, cls.startswith('TProfile'))
+    fig.suptitle(name, fontsize='small')
+    fig.savefig(path, dpi=80)
+    plt.close(fig)
+
+
+def image_name(folder, name):
+    return '%s/%s.png' % (folder, name.replace('Run summary/', '').replace(' ', '_'))
+
+
+def render_chunk(new_path, ref_path, folder, items, output, cache):
+    """Render (or take from the cache) the images of some histograms of a folder.
+    Runs in a worker process, returns the images written and the number of rendered ones.
+    The rebinned histograms have no image"""
+    images = []
+    rendered = 0
+    with uproot.open(new_path) as new, uproot.open(ref_path) as ref:
+        new_dir = '%s/%s' % (run_directory(new), folder)
+        ref_dir = '%s/%s' % (run_directory(ref), folder)
+        for name, cls in items:
+            h_new = new['%s/%s' % (new_dir, name)]
+            h_ref = ref['%s/%s' % (ref_dir, name)]
+            if h_new.values(flow=False).shape != h_ref.values(flow=False).shape:
+                continue
+            cached = os.path.join(cache, content_hash('%s/%s' % (folder, name), h_new, h_ref) + '.png')
+            if not os.path.exists(cached):
+                tmp = cached + '.%d.png' % os.getpid()
+                render(tmp, '%s/%s' % (folder, name), cls, h_new, h_ref)
+                os.replace(tmp, cached)
+                rendered += 1
+            target = os.path.join(output, image_name(folder, name))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(cached, target)
+            images.append(image_name(folder, name))
+    return images, rendered
+
+
+class OverlayRenderer():
+
+    def __init__(self, new_path, ref_path, folders=None, subsystem=None, output='dqm_plots', workers=None):
+        """Overlays of the new and reference DQM outputs
+
+        Arguments
+        new_path, ref_path -- harvested DQM files of the local tests
+        folders -- DQM folders to render, below 'DQMData/Run N'
+        subsystem -- Subsystem of the validation, selects the folders when none are given
+        output -- directory of the images and of their index.html
+        workers -- rendering processes, the number of cores by default
+        """
+        self.new_path = new_path
+        self.ref_path = ref_path
+        self.folders = folders
+        self.subsystem = subsystem
+        self.output = output
+        self.workers = workers
+        self.cache = cache_dir('dqm_plots')
+
+    def tasks(self):
+        """(folder, histograms) chunks of the histograms in both files"""
+        tasks = []
+        with uproot.open(self.new_path) as new, uproot.open(self.ref_path) as ref:
+            new_top, ref_top = run_directory(new), run_directory(ref)
+            folders = self.folders or subsystem_folders(new[new_top].keys(recursive=False, cycle=False),
+                                                        self.subsystem)
+            for folder in folders:
+                if '%s/%s' % (ref_top, folder) not in ref:
+                    print(">> No folder %s in %s" % (folder, self.ref_path))
+                    continue
+                new_hists = histograms(new, '%s/%s' % (new_top, folder))
+                ref_hists = histograms(ref, '%s/%s' % (ref_top, folder))
+                items = sorted((n, c) for n, c in new_hists.items() if n in ref_hists)
+                tasks.extend((folder, items[i:i + CHUNK]) for i in range(0, len(items), CHUNK))
+        return tasks
+
+    def run(self):
+        """Render the images, returns {folder: [image]} and the number of rendered ones"""
+        tasks = self.tasks()
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(render_chunk, self.new_path, self.ref_path, folder, items, self.output, self.cache)
+                       for folder, items in tasks]
+            results = [f.result() for f in futures]
+        images = dict()
+        for (folder, _), (written, _) in zip(tasks, results):
+            images.setdefault(folder, []).extend(written)
+        rendered = sum(r for _, r in results)
+        self.write_index(images)
+        total = sum(len(v) for v in images.values())
+        print(">> %d images in %s, %d rendered and %d from the cache" % (total, self.output, rendered, total - rendered))
+        return images, rendered
+
+    def write_index(self, images):
+        os.makedirs(self.output, exist_ok=True)
+        with open(os.path.join(self.output, 'index.html'), 'w') as f:
+            f.write('<html><head><title>New vs reference</title></head><body>\n')
+            f.write('<h2>%s vs %s</h2>\n' % (html.escape(self.new_path), html.escape(self.ref_path)))
+            for folder in sorted(images):
+                f.write('<h3>%s</h3>\n' % html.escape(folder))
+                for image in sorted(images[folder]):
+                    f.write('<a href="%s"><img src="%s" width="400" title="%s"></a>\n' % (
+                        html.escape(image), html.escape(image), html.escape(image)))
+            f.write('</body></html>\n')
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+    parser = ArgumentParser(description='Render new vs reference overlays of the local test DQM outputs')
+    parser.add_argument('new', help='DQM output of the new conditions, e.g. HLT_newco_DQMoutput.root')
+    parser.add_argument('reference', help='DQM output of the reference conditions, e.g. HLT_refer_DQMoutput.root')
+    parser.add_argument('--folders', default='',
+                        help='Comma separated DQM folders (Default: those of the Subsystem of envs.json)')
+    parser.add_argument('--subsystem', default=None, help='Subsystem of the validation (Default: the one of envs.json)')
+    parser.add_argument('--output', default='dqm_plots', help='Output directory (Default: dqm_plots)')
+    parser.add_argument('--workers', type=int, default=None, help='Processes (Default: the number of cores)')
+    options = parser.parse_args()
+    subsystem = options.subsystem
+    if subsystem is None:
+        try:
+            subsystem = json.load(open('envs.json')).get('Subsystem')
+        except (IOError, ValueError):
+            subsystem = None
+    folders = [f for f in options.folders.split(',') if f] or None
+    OverlayRenderer(options.new, options.reference, folders, subsystem, options.output, options.workers).run()
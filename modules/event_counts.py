@@ -0,0 +1,59 @@
+"""
+Module with the batched DBS3 event-count lookups
+
+The proxy is checked once, the datasets and runs are queried concurrently
+(one DBS3 connection per thread) and the cheap 'filesummaries' aggregate is used
+whenever no lumisection selection is given.
+"""
+from __future__ import print_function
+from concurrent.futures import ThreadPoolExecutor
+from modules import wma
+from modules import credentials
+
+
+def count_events(dbs, dataset, run, lumi_list=''):
+    """Number of events of a dataset in a run, optionally in a lumi selection
+
+    Arguments
+    dbs -- wma.ConnectionWrapper
+    dataset -- dataset name
+    run -- run number
+    lumi_list -- DBS3 lumi_list string, e.g. '[[1,500]]'
+    """
+    if lumi_list == '':
+        # aggregated on the server, no need to download the list of files
+        res = dbs.api('filesummaries', 'dataset', '%s&run_num=%s' % (dataset, run))
+        if not res:
+            return 0
+        return int(res[0]['num_event'] or 0)
+    query = '%s&run_num=%s&lumi_list=%s' % (dataset, run, lumi_list)
+    res = dbs.api('files', 'dataset', query, detail=True)
+    return int(sum(f['event_count'] for f in res))
+
+
+def get_event_counts(datasets, run, lumi_list='', workers=8):
+    """Returns {dataset: events} for all datasets, queried concurrently"""
+    return get_selection_event_counts(datasets, {run: lumi_list}, workers)
+
+
+def get_selection_event_counts(datasets, runs, workers=8):
+    """Returns {dataset: events} summed over several runs, one query per
+    (dataset, run), all of them concurrently
+
+    Arguments
+    datasets -- dataset names
+    runs -- {run: DBS3 lumi_list string, '' for the full run}
+    """
+    credentials.ensure_proxy()
+    datasets = [d.strip() for d in datasets if d.strip()]
+    pairs = [(dataset, run) for dataset in datasets for run in runs]
+
+    def lookup(pair):
+        dataset, run = pair
+        return dataset, count_events(wma.ConnectionWrapper(), dataset, run, runs[run])
+
+    counts = dict((dataset, 0) for dataset in datasets)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pairs)))) as pool:
+        for dataset, events in pool.map(lookup, pairs):
+            counts[dataset] += events
+    return counts
@@ -6,10 +6,10 @@ from __future__ import print_function
 from __future__ import absolute_import
 import os
 import sys
-import ast
 import copy
-import hashlib
 import pprint
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
 
 #-------------------------------------------------------------------------------
 # Check if it is the case to start
@@ -25,8 +25,11 @@ if 'CMSSW_VERSION' not in os.environ:
 #-------------------------------------------------------------------------------
 
 import wma
+from modules.dbs_runs import RunIndex, find_datasets
+from modules.bulk_submit import BulkSubmitter
+from modules.request_store import RequestStore
 
-DUMPED_REQUESTS_SCHELETON = "requests_for_%s_cache"
+DUMPED_REQUESTS_SCHELETON = "requests_for_%s_journal.jsonl"
 
 g_dry_run = False
 
@@ -50,16 +53,13 @@ requestDefault = {
 
 #-------------------------------------------------------------------------------
 
-def addSkimToRequest(params, cfg):
+def addSkimToRequest(params, cfg, cfgid):
     nextIndex = 1
     while 'SkimName%d' % (nextIndex,) in params.keys():
         nextIndex += 1
 
     params['SkimName%d' % (nextIndex,)] = params["RequestString"] + 'Skim'
     params['SkimInput%d' % (nextIndex,)] = 'RECOoutput'
-    cfgid = wma.upload_to_couch(cfg,
-            params["RequestString"] + 'Skim', params["RequestString"] + 'Skim',
-            g_dry_run)
 
     if cfgid == None:
         print("no id for", cfg)
@@ -102,28 +102,49 @@ def getSkimCfg(PD):
 
 #-------------------------------------------------------------------------------
 
+def upload_config(cfg, label, test_mode):
+    """Upload one configuration, run in the worker processes"""
+    return wma.upload_to_couch(cfg, label, requestDefault["Requestor"],
+            requestDefault["Group"], test_mode)
+
+#-------------------------------------------------------------------------------
+
+def upload_configs(cfgs, workers=4):
+    """Upload every distinct configuration file once, in parallel.
+    Returns {cfg: couch ID}"""
+    cfgs = sorted(set(cfgs))
+    labels = [requestDefault["RequestString"] + '_' + os.path.splitext(os.path.basename(cfg))[0]
+            for cfg in cfgs]
+    print("Uploading %d distinct configurations" % (len(cfgs)))
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(cfgs)))) as pool:
+        ids = pool.map(upload_config, cfgs, labels, [g_dry_run] * len(cfgs))
+        return dict(zip(cfgs, ids))
+
+#-------------------------------------------------------------------------------
+
 def prepareRequest(rawdataset, options):
-    requests = []
-    for dataset in rawdataset:
-        PD = dataset.split('/')[1]
+    # reprocessing and skimming configurations of every PD, many PDs share them
+    PDs = [dataset.split('/')[1] for dataset in rawdataset]
+    repro = dict((PD, getReproCfg(PD)) for PD in PDs)
+    skims = dict((PD, getSkimCfg(PD)) for PD in PDs)
+    cfgids = upload_configs([cfg for _, cfg in repro.values()] +
+            [cfg for cfg in skims.values() if cfg], options.workers)
+
+    # one DBS3 query per PD at most, all PDs at once
+    lastRun, firstRun = int(options.lastRun), int(options.firstRun)
+    if lastRun > 0:
+        runs = RunIndex().runs_many(rawdataset, firstRun if firstRun > 0 else -1, lastRun)
 
+    requests = []
+    for dataset, PD in zip(rawdataset, PDs):
         dsparameters = copy.copy(requestDefault)
         dsparameters["InputDataset"] = dataset
         dsparameters["RequestString"] += PD
-        if options.lastRun > 0:
-            if options.firstRun > 0:
-                dsparameters["RunWhitelist"] = runlistfromdbs('dataset = %s and run.number<=%s and run.number>=%s' % (
-                        dataset , options.lastRun, options.firstRun))
-
-            else:
-                dsparameters["RunWhitelist"] = runlistfromdbs('dataset = %s and run.number<=%s' % (
-                        dataset, options.lastRun))
-
-        #find the reprocessing configuration
-        scenario,reprocfg = getReproCfg(PD)
-        cfgid = wma.upload_to_couch(reprocfg,
-                dsparameters["RequestString"], dsparameters["RequestString"], g_dry_run)
+        if lastRun > 0:
+            dsparameters["RunWhitelist"] = runs[dataset]
 
+        scenario,reprocfg = repro[PD]
+        cfgid = cfgids[reprocfg]
         if cfgid:
             dsparameters["ProcConfigCacheID"] = cfgid
             dsparameters["Scenario"] = scenario
@@ -131,10 +152,8 @@ def prepareRequest(rawdataset, options):
             raise Exception("no id for" + PD + " " + reprocfg)
 
         dsparameters['NR_cfg'] = reprocfg
-        #find the skimming configuration
-        skim = getSkimCfg(PD)
-        if skim:
-            addSkimToRequest(dsparameters, skim)
+        if skims[PD]:
+            addSkimToRequest(dsparameters, skims[PD], cfgids[skims[PD]])
 
         requests.append(dsparameters)
 
@@ -227,88 +246,50 @@ def printRequest(requests):
 
 #-------------------------------------------------------------------------------
 
-def make_requests(requests):
+def make_requests(requests, journal, workers=4):
     print('Making the requests')
     global dry_run
     for request in requests:
         print(" ----------------- SENDING ----------------------")
         prettyPrint(request)
-        trimmedRequest = copy.copy(request)
-        for k in trimmedRequest.keys():
-            if k.startswith('NR_'):
-                trimmedRequest.pop(k)
-        if not dry_run:
-            workflow = wma.makeRequest(wma.WMAGENT_URL, trimmedRequest)
-            wma.approveRequest(wma.WMAGENT_URL, workflow)
+    if not dry_run:
+        status = BulkSubmitter(journal, wma.WMAGENT_URL, workers=workers).submit(requests)
+        failed = [key for key, value in status.items() if value != 'approved']
+        if failed:
+            print("Requests not approved:", ", ".join(failed))
 
 #-------------------------------------------------------------------------------
 
-def makerawdatsetfromdbs(query):
-    rawdataset = []
-    dbs = os.popen('dbs search --noheader --query "find dataset where %s"' % (query,))
-    for line in dbs:
-        dataset = line.split()[0]
-        rawdataset.append(dataset)
-
-    return rawdataset
+def makerawdatsetfromdbs(pattern):
+    """RAW datasets matching a DBS3 dataset pattern, e.g. /*/Run2012A-v1/RAW"""
+    return find_datasets(pattern)
 
 #-------------------------------------------------------------------------------
 
-def runlistfromdbs(query):
-    runlist = []
-    print("getting run list from dbs for the query:", query)
-
-    queryhash = hashlib.sha224(query).hexdigest()
-    runlist = "runList_%s.list" % (queryhash,)
-    try:
-        dbs = open(runlist,'r')
-        print(runlist, "opened for reading run list for query:", query)
-    except:
-        print("query never done doing it")
-        dbs = os.popen('dbs search --noheader --query "find run.number where %s"' % (query,))
-        store = open(runlist, 'w')
-        print(runlist, "opened for writing run list for query:", query)
-        store.write('QUERY: ' + query + '\n')
-        for line in dbs:
-            store.write(line)
-
-        store.close()
-        dbs = open(runlist,'r')
-
-    for line in dbs:
-        if 'QUERY' in line:
-            querystore = (line[7:]).replace('\n', '')
-            if query != querystore:
-                print("Problem:", end=' ')
-                print(query, "---")
-                print("different than")
-                print(querystore, "---")
-                sys.exit()
-            continue
-        runnumber = int(line.split()[0])
-        runlist.append(runnumber)
-    return runlist
+def runlistfromdbs(dataset, lastRun=-1, firstRun=-1):
+    """Runs of the dataset in [firstRun, lastRun], from the cached DBS3 run list"""
+    return RunIndex().runs(dataset, firstRun, lastRun)
+
+#-------------------------------------------------------------------------------
+def requests_journal(reprocfg_filename):
+    return RequestStore(DUMPED_REQUESTS_SCHELETON % (os.path.basename(reprocfg_filename)))
 
 #-------------------------------------------------------------------------------
-#fixme do not assume absence of abspath!!!
+
 def dump_requests(reprocfg_filename, requests):
-    ofilename = DUMPED_REQUESTS_SCHELETON % (os.path.basename(reprocfg_filename))
-    ofile = open(ofilename, "w")
-    pprint.pprint(requests, ofile)
-    ofile.close()
-    print("Requests dumped in %s" % (ofilename))
+    journal = requests_journal(reprocfg_filename)
+    journal.prepare(requests)
+    print("Requests dumped in %s" % (journal.path))
 
 #-------------------------------------------------------------------------------
 
-def read_requests(reprocfg_filename):
-  ifilename = DUMPED_REQUESTS_SCHELETON % (os.path.basename(reprocfg_filename))
-  ifile = open(ifilename, "r")
-  requests = ast.literal_eval(ifile.read())
-  pprint.pprint(requests)
-  ifile.close()
-  print("Requests read from %s" % (ifilename))
+def read_requests(reprocfg_filename, pds=None):
+    journal = requests_journal(reprocfg_filename)
+    requests = journal.requests(pds)
+    pprint.pprint(requests)
+    print("Requests read from %s" % (journal.path))
 
-  return requests
+    return requests
 
 #-------------------------------------------------------------------------------
 
@@ -317,18 +298,28 @@ def print_and_exec(command):
     os.system(command)
 
 #-------------------------------------------------------------------------------
-# FIXME: multiprocess for speedup
+
+def exec_parallel(commands, cwd=None):
+    """Run the commands concurrently and wait for all of them"""
+    processes = []
+    for command in commands:
+        print("Executing %s" % (command))
+        processes.append(subprocess.Popen(command, shell=True, cwd=cwd))
+    for command, process in zip(commands, processes):
+        if process.wait() != 0:
+            print("Command %s failed with status %d" % (command, process.returncode))
+
+#-------------------------------------------------------------------------------
+
 def prepare_configs(repromatrix_ver, skimmingMatrix_ver, globaltag):
     cmssw_base_src = "%s/src" % (os.environ["CMSSW_BASE"])
 
-    curdir = os.getcwd()
-    os.chdir(cmssw_base_src)
-    print_and_exec('cvs co -r %s Configuration/GlobalRuns/test/reProcessingMatrix.py\n' % (repromatrix_ver))
-    print_and_exec('cvs co -r %s Configuration/Skimming/test/skimmingMatrix.py\n' % (skimmingMatrix_ver))
-    print_and_exec('scram b python\n')
-    os.chdir(curdir)
-    print_and_exec('python %s/Configuration/Skimming/test/skimmingMatrix.py --GT %s\n' % (cmssw_base_src,globaltag))
-    print_and_exec('python %s/Configuration/GlobalRuns/test/reProcessingMatrix.py --GT %s' % (cmssw_base_src,globaltag))
+    exec_parallel(['cvs co -r %s Configuration/GlobalRuns/test/reProcessingMatrix.py' % (repromatrix_ver),
+            'cvs co -r %s Configuration/Skimming/test/skimmingMatrix.py' % (skimmingMatrix_ver)],
+            cwd=cmssw_base_src)
+    exec_parallel(['scram b python'], cwd=cmssw_base_src)
+    exec_parallel(['python %s/Configuration/Skimming/test/skimmingMatrix.py --GT %s' % (cmssw_base_src,globaltag),
+            'python %s/Configuration/GlobalRuns/test/reProcessingMatrix.py --GT %s' % (cmssw_base_src,globaltag)])
 
 #-------------------------------------------------------------------------------
 
@@ -342,8 +333,8 @@ def check_rawdataset(rawdataset):
 #-------------------------------------------------------------------------------
 
 def request(rawdataset, options):
-    global dry_run
-    dry_run = options.test
+    global dry_run, g_dry_run
+    dry_run = g_dry_run = options.test
 
     if options.upload:
         print('Ready for uploading configs to couchDB')
@@ -361,5 +352,6 @@ def request(rawdataset, options):
         dump_requests(options.reprocfg, requests)
 
     if options.request:
-        requests = read_requests(options.reprocfg)
-        make_requests(requests)
+        pds = [pd for pd in options.pds.split(',') if pd] or None
+        requests = read_requests(options.reprocfg, pds)
+        make_requests(requests, requests_journal(options.reprocfg), options.workers)
@@ -0,0 +1,201 @@
+"""
+Module that has InputDiscovery class
+
+Discovery of the input files of a run directly from DBS3, replacing the
+dasgoclient | das-selected-lumis.py pipeline of step1. The files of the run
+and their lumisections are fetched in bulk (one files call, filelumis calls
+of FILELUMIS_CHUNK files), the lumisections are matched against the merged
+lumi ranges with a binary search instead of expanding the ranges, and the
+smallest set of files covering the selected lumisections is kept. Every
+(dataset, run) of a validation is discovered concurrently.
+
+Usage (from the top directory of the repository):
+    python3 -m modules.input_discovery /ZeroBias/Run2022C-v1/RAW --runs 356381
+"""
+from __future__ import print_function
+import bisect
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from modules import wma
+
+# files per filelumis POST, DBS3 refuses much longer lists
+FILELUMIS_CHUNK = 500
+# (dataset, run) discovered at the same time, one DBS3 connection each
+WORKERS = 8
+
+
+def merge_lumi_ranges(lumi_ranges):
+    """Sort [[first, last], ...] and join the overlapping and adjacent ranges"""
+    merged = []
+    for first, last in sorted([int(f), int(l)] for f, l in lumi_ranges):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], last)
+        else:
+            merged.append([first, last])
+    return merged
+
+
+def select_lumis(file_lumis, lumi_ranges=None):
+    """Keep the lumisections of {lfn: {lumi: events}} in the lumi ranges, None for all of them.
+    The files without any selected lumisection are dropped"""
+    selected = dict()
+    ranges = merge_lumi_ranges(lumi_ranges) if lumi_ranges else None
+    starts = [first for first, _ in ranges] if ranges else None
+    for lfn, lumis in file_lumis.items():
+        if ranges is None:
+            kept = dict(lumis)
+        else:
+            kept = dict()
+            for lumi, events in lumis.items():
+                # the last range starting at or before the lumisection
+                i = bisect.bisect_right(starts, lumi) - 1
+                if i >= 0 and lumi <= ranges[i][1]:
+                    kept[lumi] = events
+        if kept:
+            selected[lfn] = kept
+    return selected
+
+
+def covering_files(file_lumis):
+    """Smallest set of files of {lfn: {lumi: events}} covering all their lumisections,
+    by greedy set cover: the file adding the most lumisections first, fewer lumisections
+    breaking ties. The gains only decrease, so they are re-evaluated lazily.
+    Returns the files in the order of their first lumisection"""
+    uncovered = set()
+    for lumis in file_lumis.values():
+        uncovered.update(lumis)
+    heap = [(-len(lumis), len(lumis), lfn) for lfn, lumis in file_lumis.items() if lumis]
+    heapq.heapify(heap)
+    files = []
+    while uncovered and heap:
+        gain, size, lfn = heapq.heappop(heap)
+        current = len(uncovered.intersection(file_lumis[lfn]))
+        if current == -gain:
+            files.append(lfn)
+            uncovered.difference_update(file_lumis[lfn])
+        elif current:
+            heapq.heappush(heap, (-current, size, lfn))
+    return sorted(files, key=lambda lfn: (min(file_lumis[lfn]), lfn))
+
+
+def map_pairs(function, pairs, workers=WORKERS):
+    """function(dataset, run) of every pair, concurrently, in the order of the pairs"""
+    if not pairs:
+        return []
+    with ThreadPoolExecutor(max_workers=min(workers, len(pairs))) as pool:
+        return list(pool.map(lambda pair: function(*pair), pairs))
+
+
+class InputDiscovery():
+
+    def __init__(self, dataset, run, lumi_ranges=None):
+        """Input files of a run of a dataset
+
+        Arguments
+        dataset -- dataset name
+        run -- run number
+        lumi_ranges -- list of [first, last] lumisection ranges, None for the full run
+        """
+        self.dataset = dataset
+        self.run = int(run)
+        self.lumi_ranges = lumi_ranges
+        self.DBS3 = wma.ConnectionWrapper()
+        self.selected = None
+
+    def get_files(self):
+        """Valid files of the run with their event count, as in GetNumberOfEvents"""
+        query = '%s&run_num=%d' % (self.dataset, self.run)
+        return [f for f in self.DBS3.api('files', 'dataset', query, detail=True) if f.get('is_file_valid', 1)]
+
+    def get_file_lumis(self, files):
+        """Returns {lfn: {lumi: events}} for the given DBS3 file records.
+        If DBS3 does not provide the events per lumi, the events of the
+        file are shared equally among its lumisections"""
+        events = dict((f['logical_file_name'], f['event_count']) for f in files)
+        file_lumis = dict((lfn, {}) for lfn in events)
+        lfns = sorted(events)
+        for i in range(0, len(lfns), FILELUMIS_CHUNK):
+            res = self.DBS3.api('filelumis', 'logical_file_name', lfns[i:i + FILELUMIS_CHUNK], post=True)
+            for r in res:
+                if int(r['run_num']) != self.run:
+                    continue
+                lumis = file_lumis[r['logical_file_name']]
+                counts = r.get('event_count')
+                if isinstance(counts, list) and len(counts) == len(r['lumi_section_num']):
+                    for lumi, count in zip(r['lumi_section_num'], counts):
+                        lumis[lumi] = count or 0
+                else:
+                    for lumi in r['lumi_section_num']:
+                        lumis[lumi] = 0
+        for lfn, lumis in file_lumis.items():
+            if lumis and not sum(lumis.values()):
+                share = float(events[lfn]) / len(lumis)
+                for lumi in lumis:
+                    lumis[lumi] = share
+        return file_lumis
+
+    def file_lumis(self):
+        """{lfn: {lumi: events}} of the selected lumisections, fetched once"""
+        if self.selected is None:
+            self.selected = select_lumis(self.get_file_lumis(self.get_files()), self.lumi_ranges)
+        return self.selected
+
+    def files(self):
+        """Smallest set of files covering the selected lumisections"""
+        file_lumis = self.file_lumis()
+        files = covering_files(file_lumis)
+        print(">> Input files of %s run %d: %d covering files of %d with selected lumisections" % (
+            self.dataset, self.run, len(files), len(file_lumis)))
+        return files
+
+
+def run_file_lumis(dataset, runs, workers=WORKERS):
+    """{run: {lfn: {lumi: events}}} of the selected lumisections of a dataset
+
+    Arguments
+    dataset -- dataset name
+    runs -- {run: [[first, last], ...]}, or {run: None} for the full runs
+    """
+    ordered = sorted(runs, key=int)
+    found = map_pairs(lambda d, r: InputDiscovery(d, r, runs[r]).file_lumis(),
+                      [(dataset, run) for run in ordered], workers)
+    return dict(zip(ordered, found))
+
+
+def discover(datasets, runs, workers=WORKERS):
+    """Covering files of every dataset and run, without duplicates, in the order of the datasets and runs
+
+    Arguments
+    datasets -- dataset names
+    runs -- {run: [[first, last], ...]}, or {run: None} for the full runs
+    """
+    pairs = [(dataset, run) for dataset in datasets for run in sorted(runs, key=int)]
+    files = []
+    seen = set()
+    for found in map_pairs(lambda d, r: InputDiscovery(d, r, runs[r]).files(), pairs, workers):
+        for lfn in found:
+            if lfn not in seen:
+                seen.add(lfn)
+                files.append(lfn)
+    return files
+
+
+if __name__ == '__main__':
+    import ast
+    from argparse import ArgumentParser
+    from modules.input_planner import write_file_list
+    parser = ArgumentParser(description='Write the input files of runs of datasets from DBS3')
+    parser.add_argument('datasets', help='Comma separated datasets')
+    parser.add_argument('--runs', default='', help='Comma separated runs')
+    parser.add_argument('--runLs', default='', help='Lumisections of the runs, e.g. "{356381: [[1, 500]]}"')
+    parser.add_argument('--output', default='step1_files.txt', help='File list (Default: step1_files.txt)')
+    options = parser.parse_args()
+    if options.runLs:
+        runs = dict((str(run), ranges) for run, ranges in ast.literal_eval(options.runLs).items())
+    else:
+        runs = dict((run, None) for run in options.runs.split(',') if run)
+    if not runs:
+        parser.error('one of --runs and --runLs is mandatory')
+    files = discover(options.datasets.split(','), runs)
+    write_file_list(files, options.output)
+    print(">> %d files written to %s" % (len(files), options.output))
@@ -0,0 +1,64 @@
+"""
+Module that has InputPlanner class
+
+The local tests run the cmsDriver configurations on 'filelist:step1_files.txt'
+with a fixed number of events. InputPlanner uses the DBS3 event counts of the
+files in a run to choose the smallest set of files, and the number of events,
+that are needed to process the requested lumisections. The files are found
+by InputDiscovery.
+"""
+from __future__ import print_function
+from collections import namedtuple
+from modules.input_discovery import InputDiscovery, covering_files
+
+Plan = namedtuple("Plan", ["files", "nevents", "lumis"])
+
+
+def select_files(usable, max_events=100):
+    """Choose the files to be read by the local test
+
+    Arguments
+    usable -- {lfn: {lumi: events}} of the selected lumisections, as given by InputDiscovery
+    max_events -- number of events needed, <= 0 to cover all selected lumis
+
+    Returns the list of files and the number of events to process
+    """
+    files = []
+    nevents = 0
+    if max_events > 0:
+        # the files richest in selected events first, fewer lumis breaking ties
+        ordered = sorted(usable.items(), key=lambda f: (-sum(f[1].values()), len(f[1]), f[0]))
+        for lfn, lumis in ordered:
+            if nevents >= max_events:
+                break
+            files.append(lfn)
+            nevents += sum(lumis.values())
+        return files, min(nevents, max_events)
+
+    # smallest set of files covering the selected lumisections
+    files = covering_files(usable)
+    # a lumisection can be split across files, all of its events are read
+    nevents = sum(sum(usable[lfn].values()) for lfn in files)
+    return files, nevents
+
+
+class InputPlanner(InputDiscovery):
+    """Plan the input of a local test, same arguments as InputDiscovery"""
+
+    def plan(self, max_events=100):
+        """Returns a Plan with the files and number of events to process"""
+        file_lumis = self.file_lumis()
+        files, nevents = select_files(file_lumis, max_events)
+        lumis = set()
+        for lfn in files:
+            lumis.update(file_lumis[lfn])
+        print(">> Input plan for %s run %d: %d of %d files with selected lumisections, %d events" % (
+            self.dataset, self.run, len(files), len(file_lumis), int(nevents)))
+        return Plan(files=files, nevents=int(nevents), lumis=sorted(lumis))
+
+
+def write_file_list(files, filename="step1_files.txt"):
+    """Write the planned LFNs in the format read by 'filelist:'"""
+    with open(filename, "w") as f:
+        for lfn in files:
+            f.write(lfn + "\n")
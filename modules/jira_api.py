@@ -2,8 +2,12 @@
 # Author : Pritam Kalbhor (physics.pritam@gmail.com)
 #
 
-from jira import JIRA
 import base64, os, sys, subprocess, time, json
+from pathlib import Path
+# also run as a script: python3 modules/jira_api.py
+sys.path.append(str(Path(os.path.abspath(__file__)).parent.parent))
+from modules.jira_index import LabelIndex
+from modules.jira_session import get_client
 
 class JiraAPI:
    CERN_CA_BUNDLE = '/etc/pki/tls/certs/ca-bundle.crt'
@@ -11,16 +15,12 @@ class JiraAPI:
       self.args = args
       self.username = username
       self.connection = self.get_jira_client(password)
+      self.index = LabelIndex(self.connection)
 
    def get_jira_client(self, password):
       host = 'http://its.cern.ch/jira'
       options={'check_update': False, 'verify': self.CERN_CA_BUNDLE}
-      if password is not None: 
-         return JIRA(host, basic_auth=(self.username, password), options=options)
-      else:
-         # Requires jira version >= 3.1.1
-         PAT = subprocess.getoutput("$HOME/private/.auth/.dec")
-         return JIRA(host, token_auth=PAT, options=options)
+      return get_client(host, self.username, password, options)
 
    def create_issue(self):
       """Create new JIRA ticket"""
@@ -30,18 +30,18 @@ class JiraAPI:
       new_issue.update(assignee={'name': 'tvami'})
       new_issue.update(fields={"labels": self.args['Labels']})
       new_issue.update(fields={"priority": {'name': 'Major'}})
+      self.index.add(self.args['Labels'], new_issue.key)
 
    def add_comment(self, text):
       issue = self.connection.issue('CMSALCA-{}'.format(self.args['Jira']))
       comment = self.connection.add_comment(issue.key, text)
 
    def check_duplicate(self):
-      # Summaries of my last 50 reported issues
-      for issue in self.connection.search_issues('project=CMSALCA order by created desc', maxResults=50):
-         labels = set(issue.fields.labels)
-         if labels == set(self.args['Labels']):
-            print(">> Labels ", labels, " matching with ticket: ", issue.key, "!")
-            return issue.key
+      """Key of the ticket with the same set of labels, False if there is none"""
+      key = self.index.find(self.args['Labels'])
+      if key:
+         print(">> Labels ", set(self.args['Labels']), " matching with ticket: ", key, "!")
+         return key
       return False
 
    def get_key(self):
@@ -50,20 +50,9 @@ class JiraAPI:
       return issue.key
 
 def get_workflow_id_names():
-   file = 'workflow_config.json'
-   if os.path.exists(file):
-      config = json.load(open(file))
-   else:
-      raise FileNotFoundError('Create %s by submitting relval for production' %file)
-   campIDs = {'HLT': set(), 'PR': set(), 'EXPR': set()}
-   workflow_names = dict()
-   for section in config.keys():
-      sec = section.split('_')[:3]
-      ctype = sec[0].strip()
-      wtype = '_'.join([sec[0], sec[1][:5], sec[2]]).strip()
-      campIDs[ctype].add(config[section]['Config']['Campaign'])
-      workflow_names[wtype] = config[section]['workflow_name']
-   return (campIDs, workflow_names)
+   from modules.twiki_render import load_workflows, campaign_ids, workflow_names
+   workflows = load_workflows('workflow_config.json')
+   return (campaign_ids(workflows), workflow_names(workflows))
 
 def submission_status(campIDs, args):
    dmytro = 'https://dmytro.web.cern.ch/dmytro/cmsprodmon/requests.php?campaign='
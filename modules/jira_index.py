@@ -0,0 +1,92 @@
+"""
+Module that has LabelIndex class
+
+The validation tickets are identified by their set of labels
+(e.g. Week49, 2021, Pixel). LabelIndex keeps a local label-set -> issue key
+map of the project, synchronised incrementally: only the issues created
+since the last synchronisation are downloaded, with the labels and the
+creation date as the only fields. The tickets are found with a JQL label
+search paged through all its results, the index is never synchronised
+implicitly: a failing search (authentication, network) would fail the
+download of the whole project the same way.
+"""
+from __future__ import print_function
+import os
+from datetime import datetime, timedelta
+from modules.local_store import JsonStore, cache_dir
+
+PAGE_SIZE = 100
+
+
+def label_key(labels):
+    """Key of a set of labels in the index"""
+    return ','.join(sorted(set(l.strip() for l in labels)))
+
+
+def labels_jql(project, labels):
+    """JQL matching the issues that have all the given labels"""
+    clauses = ['labels = "%s"' % l.strip().replace('"', '\\"') for l in sorted(set(labels))]
+    return 'project=%s AND %s order by created desc' % (project, ' AND '.join(clauses))
+
+
+class LabelIndex():
+
+    def __init__(self, connection, project='CMSALCA', path=None):
+        """Label-set index of the issues of a Jira project
+
+        Arguments
+        connection -- JIRA client
+        project -- Jira project key
+        path -- JSON store, jira_<project>_labels.json in the cache area by default
+        """
+        self.connection = connection
+        self.project = project
+        self.store = JsonStore(path or os.path.join(cache_dir(), 'jira_%s_labels.json' % project.lower()),
+                               default={'since': None, 'latest': None, 'latest_created': '', 'labels': {}})
+
+    def sync(self):
+        """Download the issues created after the last synchronisation"""
+        with self.store.update() as index:
+            jql = 'project=%s' % self.project
+            if index['since']:
+                jql += ' AND created >= "%s"' % index['since']
+            jql += ' order by created asc'
+            start = 0
+            while True:
+                issues = self.connection.search_issues(jql, startAt=start, maxResults=PAGE_SIZE,
+                                                       fields='labels,created')
+                for issue in issues:
+                    # in creation order, a label set points to its newest issue
+                    index['labels'][label_key(issue.fields.labels)] = issue.key
+                    if issue.fields.created >= index['latest_created']:
+                        index['latest'] = issue.key
+                        index['latest_created'] = issue.fields.created
+                start += len(issues)
+                if len(issues) < PAGE_SIZE:
+                    break
+            if index['latest_created']:
+                # one day of overlap covers the time zone of the Jira server
+                created = datetime.strptime(index['latest_created'][:10], '%Y-%m-%d')
+                index['since'] = (created - timedelta(days=1)).strftime('%Y-%m-%d')
+            return index
+
+    def add(self, labels, key):
+        """Record a newly created issue"""
+        with self.store.update() as index:
+            index['labels'][label_key(labels)] = key
+
+    def find(self, labels):
+        """Key of the newest issue with exactly these labels, None if there is none.
+        The issues with more labels are skipped, page after page. Errors of the search are raised"""
+        wanted = label_key(labels)
+        jql = labels_jql(self.project, labels)
+        start = 0
+        while True:
+            issues = self.connection.search_issues(jql, startAt=start, maxResults=PAGE_SIZE, fields='labels')
+            for issue in issues:
+                if label_key(issue.fields.labels) == wanted:
+                    self.add(labels, issue.key)
+                    return issue.key
+            start += len(issues)
+            if len(issues) < PAGE_SIZE:
+                return None
@@ -0,0 +1,97 @@
+"""
+Module with the shared authenticated Jira sessions
+
+A JIRA client is created once per process and user. Inside a Jenkins build
+the session cookies are also kept (readable by the owner only) in the cache
+area under the name of the build, so that the next stages of the same build
+reuse the login instead of decrypting the token and authenticating again.
+"""
+from __future__ import print_function
+import os
+import re
+import json
+import time
+import subprocess
+from jira import JIRA
+from modules.local_store import atomic_write, cache_dir
+
+PAT_COMMAND = '$HOME/private/.auth/.dec'
+MAX_AGE = 1800
+
+_clients = dict()
+_tokens = dict()
+
+
+def decrypt_pat(command=PAT_COMMAND):
+    """Personal access token, decrypted once per process"""
+    if command not in _tokens:
+        _tokens[command] = subprocess.getoutput(command)
+    return _tokens[command]
+
+
+def cookie_file(username):
+    """File with the cookies of the current Jenkins build, None outside Jenkins"""
+    tag = os.getenv('BUILD_TAG')
+    if not tag:
+        return None
+    directory = cache_dir('jira_sessions')
+    os.chmod(directory, 0o700)
+    return os.path.join(directory, re.sub(r'[^\w.-]', '_', '%s_%s' % (tag, username)) + '.json')
+
+
+def save_cookies(client, path):
+    if path is None:
+        return
+    # sessions of finished builds
+    directory = os.path.dirname(path)
+    for name in os.listdir(directory):
+        old = os.path.join(directory, name)
+        if time.time() - os.path.getmtime(old) > 86400:
+            os.remove(old)
+    cookies = dict((c.name, c.value) for c in client._session.cookies)
+    atomic_write(path, json.dumps({'saved_at': time.time(), 'cookies': cookies}), mode=0o600)
+
+
+def restore_client(host, options, path, max_age=MAX_AGE):
+    """JIRA client using the saved cookies, None if they are missing, too old or rejected"""
+    if path is None or not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            saved = json.load(f)
+        if time.time() - saved['saved_at'] > max_age:
+            return None
+        client = JIRA(host, options=options, get_server_info=False)
+        client._session.cookies.update(saved['cookies'])
+        client.myself()
+    except Exception as e:
+        print(">> Saved Jira session not usable, logging in again: %s" % e)
+        return None
+    print(">> Reusing the Jira session of this build")
+    return client
+
+
+def get_client(host, username, password=None, options=None, max_age=MAX_AGE):
+    """Authenticated JIRA client, shared by all the callers of the process
+
+    Arguments
+    host -- Jira server
+    username -- user name
+    password -- password, None to use the personal access token
+    options -- JIRA client options
+    max_age -- seconds after which the saved session of the build is not reused
+    """
+    key = (host, username, password is None)
+    if key in _clients:
+        return _clients[key]
+    path = cookie_file(username)
+    client = restore_client(host, options, path, max_age)
+    if client is None:
+        if password is not None:
+            client = JIRA(host, basic_auth=(username, password), options=options)
+        else:
+            # Requires jira version >= 3.1.1
+            client = JIRA(host, token_auth=decrypt_pat(), options=options)
+        save_cookies(client, path)
+    _clients[key] = client
+    return client
@@ -0,0 +1,192 @@
+"""
+Module that has SplittingTuner class
+
+Offline simulation of the LumiBased job splitting of the TaskChain tasks.
+From the lumisections selected in DBS with their number of events and an
+estimate of TimePerEvent, simulate() predicts the jobs that WMAgent creates
+for a LumisPerJob, their wall time and the turnaround of the task on a
+number of slots. SplittingTuner picks the LumisPerJob of a task giving jobs
+of the target length (2-4 hours by default), avoiding both thousands of
+tiny jobs and a few very long ones.
+
+Usage (from the top directory of the repository):
+    python3 -m modules.job_splitting /ZeroBias/Run2022C-v1/RAW --runs 356381 --time-event 2.5
+"""
+from __future__ import print_function
+import heapq
+from collections import namedtuple
+from modules.input_discovery import run_file_lumis
+from modules.resource_estimator import MULTICORE
+
+Lumi = namedtuple('Lumi', ['run', 'lumi', 'events', 'file'])
+Simulation = namedtuple('Simulation', ['lumis_per_job', 'jobs', 'min_time', 'median_time', 'max_time',
+                                       'core_hours', 'turnaround'])
+
+# seconds of a job spent out of the event loop (start up, conditions, stage out)
+OVERHEAD = 600
+# jobs of a validation workflow running at the same time
+SLOTS = 200
+# wall time of the jobs aimed at, in seconds
+TARGET = (2 * 3600, 4 * 3600)
+
+
+def lumis_from_file_lumis(file_lumis, run, selected=None):
+    """Lumi records of one run from {lfn: {lumi: events}}, in the order of the files.
+    A lumisection split across files is counted once, in its first file, with all its events"""
+    events = dict()
+    first_file = dict()
+    for lfn, lumis in sorted(file_lumis.items(), key=lambda f: (min(f[1]) if f[1] else 0, f[0])):
+        for lumi, count in lumis.items():
+            if selected is not None and lumi not in selected:
+                continue
+            events[lumi] = events.get(lumi, 0) + count
+            first_file.setdefault(lumi, lfn)
+    order = sorted(events, key=lambda l: (min(file_lumis[first_file[l]]), first_file[l], l))
+    return [Lumi(int(run), lumi, events[lumi], first_file[lumi]) for lumi in order]
+
+
+def dbs_lumis(dataset, runs):
+    """Selected lumisections of a dataset with their events
+
+    Arguments
+    dataset -- dataset name
+    runs -- {run: [[first, last], ...]}, or {run: None} for the full runs
+    """
+    lumis = []
+    found = run_file_lumis(dataset, runs)
+    for run in sorted(runs, key=int):
+        lumis.extend(lumis_from_file_lumis(found[run], run))
+    return lumis
+
+
+def job_events(lumis, lumis_per_job, file_boundaries=True):
+    """Events of the jobs of a LumiBased splitting: consecutive lumisections,
+    a job never spans two runs, nor two files with file_boundaries"""
+    jobs = []
+    events = count = 0
+    boundary = None
+    for lumi in lumis:
+        key = (lumi.run, lumi.file) if file_boundaries else lumi.run
+        if count and (count == lumis_per_job or key != boundary):
+            jobs.append(events)
+            events = count = 0
+        boundary = key
+        events += lumi.events
+        count += 1
+    if count:
+        jobs.append(events)
+    return jobs
+
+
+def turnaround(times, slots=SLOTS):
+    """Wall time to run jobs in their order on a number of slots"""
+    if not times:
+        return 0
+    free = [0.] * min(slots, len(times))
+    for t in times:
+        heapq.heapreplace(free, free[0] + t)
+    return max(free)
+
+
+def simulate(lumis, lumis_per_job, time_event, overhead=OVERHEAD, slots=SLOTS, cores=MULTICORE,
+             file_boundaries=True):
+    """Jobs, job wall times (s), core hours and turnaround (s) of a task
+
+    Arguments
+    lumis -- Lumi records of the input
+    lumis_per_job -- LumisPerJob of the task
+    time_event -- TimePerEvent of the task, wall seconds per event of a job
+    overhead -- seconds of every job out of the event loop
+    slots -- jobs running at the same time
+    cores -- Multicore of the task
+    file_boundaries -- whether the jobs stop at the end of the input files, as for the first task
+    """
+    times = [overhead + events * time_event for events in job_events(lumis, lumis_per_job, file_boundaries)]
+    if not times:
+        return Simulation(lumis_per_job, 0, 0, 0, 0, 0, 0)
+    ordered = sorted(times)
+    return Simulation(lumis_per_job, len(times), ordered[0], ordered[len(times) // 2], ordered[-1],
+                      sum(times) * cores / 3600., turnaround(times, slots))
+
+
+class SplittingTuner():
+
+    def __init__(self, lumis, target=TARGET, overhead=OVERHEAD, slots=SLOTS, cores=MULTICORE,
+                 file_boundaries=True):
+        """Choice of the LumisPerJob of a task
+
+        Arguments
+        lumis -- Lumi records of the input
+        target -- (shortest, longest) wall time of the jobs in seconds
+        overhead, slots, cores, file_boundaries -- as in simulate()
+        """
+        self.lumis = lumis
+        self.target = target
+        self.overhead = overhead
+        self.slots = slots
+        self.cores = cores
+        self.file_boundaries = file_boundaries
+
+    def candidates(self):
+        """LumisPerJob worth simulating, up to the largest group of lumisections a job can take"""
+        largest = max(len(job) for job in self.groups()) if self.lumis else 1
+        return range(1, largest + 1)
+
+    def groups(self):
+        groups = dict()
+        for lumi in self.lumis:
+            groups.setdefault((lumi.run, lumi.file) if self.file_boundaries else lumi.run, []).append(lumi)
+        return groups.values()
+
+    def simulations(self, time_event):
+        return [simulate(self.lumis, n, time_event, self.overhead, self.slots, self.cores, self.file_boundaries)
+                for n in self.candidates()]
+
+    def tune(self, time_event):
+        """The Simulation of the largest LumisPerJob whose longest job fits in the target,
+        1 if a single lumisection already takes longer"""
+        simulations = self.simulations(time_event)
+        fitting = [s for s in simulations if s.max_time <= self.target[1]]
+        return fitting[-1] if fitting else simulations[0]
+
+
+def describe(s):
+    return 'LumisPerJob %4d: %6d jobs of %.1f-%.1f h (median %.1f h), %.0f core hours, turnaround %.1f h' % (
+        s.lumis_per_job, s.jobs, s.min_time / 3600., s.max_time / 3600., s.median_time / 3600., s.core_hours,
+        s.turnaround / 3600.)
+
+
+if __name__ == '__main__':
+    import ast
+    from argparse import ArgumentParser
+    parser = ArgumentParser(description='Simulate the LumiBased splitting of a task and tune its LumisPerJob')
+    parser.add_argument('dataset', help='Input dataset')
+    parser.add_argument('--runs', default='', help='Comma separated runs')
+    parser.add_argument('--runLs', default='', help='Lumisections of the runs, e.g. "{356381: [[1, 500]]}"')
+    parser.add_argument('--time-event', dest='time_event', type=float, required=True,
+                        help='TimePerEvent of the task in seconds')
+    parser.add_argument('--target', default='2,4', help='Shortest and longest jobs in hours (Default: 2,4)')
+    parser.add_argument('--slots', type=int, default=SLOTS, help='Jobs running at the same time (Default: %d)' % SLOTS)
+    parser.add_argument('--overhead', type=float, default=OVERHEAD,
+                        help='Seconds of a job out of the event loop (Default: %d)' % OVERHEAD)
+    parser.add_argument('--no-file-boundaries', dest='file_boundaries', action='store_false',
+                        help='Jobs can span several input files, as for the tasks reading the output of another task')
+    options = parser.parse_args()
+    if options.runLs:
+        runs = ast.literal_eval(options.runLs)
+    else:
+        runs = dict((run, None) for run in options.runs.split(',') if run)
+    if not runs:
+        parser.error('one of --runs and --runLs is mandatory')
+    target = tuple(float(h) * 3600 for h in options.target.split(','))
+    lumis = dbs_lumis(options.dataset, runs)
+    print(">> %d lumisections, %d events" % (len(lumis), sum(l.events for l in lumis)))
+    tuner = SplittingTuner(lumis, target, options.overhead, options.slots, file_boundaries=options.file_boundaries)
+    simulations = tuner.simulations(options.time_event)
+    step = max(1, len(simulations) // 20)
+    for s in simulations[::step]:
+        print(">> %s" % describe(s))
+    best = tuner.tune(options.time_event)
+    print(">> Best %s" % describe(best))
+    if best.median_time < target[0]:
+        print(">> The selection is too small to make jobs of %.1f hours" % (target[0] / 3600.))
@@ -0,0 +1,80 @@
+"""
+Module with helpers for the small local stores (caches, indexes, journals)
+that are kept between runs of the validation scripts
+"""
+import os
+import json
+import fcntl
+import tempfile
+from contextlib import contextmanager
+
+CACHE_ENV = 'ALCAVAL_CACHE_DIR'
+
+
+def cache_dir(*subdirs):
+    """Returns (and creates) a directory below the user cache area.
+    The location can be moved with the ALCAVAL_CACHE_DIR variable"""
+    base = os.getenv(CACHE_ENV)
+    if not base:
+        xdg = os.getenv('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        base = os.path.join(xdg, 'alcaval')
+    path = os.path.join(base, *subdirs)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive lock on path + '.lock', shared by all processes of the node"""
+    with open(path + '.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def atomic_write(path, text, mode=0o644):
+    """Write text to path through a temporary file and a rename"""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix='.tmp_')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class JsonStore():
+    """
+    A JSON document on disk, read and written as a whole.
+    Use 'update' to modify it safely from concurrent processes
+    """
+    def __init__(self, path, default=None, mode=0o644):
+        self.path = path
+        self.default = default if default is not None else {}
+        self.mode = mode
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return json.loads(json.dumps(self.default))
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except ValueError:
+            print('>> Ignoring corrupted store %s' % self.path)
+            return json.loads(json.dumps(self.default))
+
+    def save(self, data):
+        atomic_write(self.path, json.dumps(data, indent=1, sort_keys=True), self.mode)
+
+    @contextmanager
+    def update(self):
+        """Lock the store, yield its content and save it back"""
+        with file_lock(self.path):
+            data = self.load()
+            yield data
+            self.save(data)
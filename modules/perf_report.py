@@ -0,0 +1,233 @@
+"""
+Module that has PerfComparison class
+
+Performance of the local cmsRun tests. perf_config() wraps a cmsRun
+configuration with the TimeReport (wantSummary) and SimpleMemoryCheck
+services, and perf_command() runs it with a FrameworkJobReport. The log and
+the job report of every step are parsed into a JSON summary (events/s,
+time per event of every module, peak RSS, output size per event), and the
+new conditions are compared to the reference ones step by step, flagging
+the regressions.
+
+Usage (from the top directory of the repository):
+    python3 -m modules.perf_report perf --tolerance 0.1
+"""
+from __future__ import print_function
+import os
+import re
+import json
+import xml.etree.ElementTree as ET
+
+PERF_DIR = 'perf'
+
+WRAPPER = """# cmsRun configuration %(cfg)s with the performance services, from modules/perf_report.py
+exec(open('%(cfg)s').read())
+import FWCore.ParameterSet.Config as cms
+process.options.wantSummary = cms.untracked.bool(True)
+process.SimpleMemoryCheck = cms.Service('SimpleMemoryCheck',
+                                        ignoreTotal=cms.untracked.int32(1),
+                                        moduleMemorySummary=cms.untracked.bool(True))
+"""
+
+TIME_REPORT = re.compile(r'^TimeReport\s+([-+.\deE]+)\s+([-+.\deE]+)\s+([-+.\deE]+)\s+(\S+)\s*$')
+PEAK_RSS = re.compile(r'MemoryReport> Peak rss size ([.\d]+) Mbytes')
+TOTAL_JOB = re.compile(r'Total job:\s+([.\d]+)')
+
+
+def perf_config(cfg):
+    """Name of the wrapper of cfg, e.g. perf_REFERENCE.py"""
+    return 'perf_' + os.path.basename(cfg)
+
+
+def write_perf_config(cfg, directory='.'):
+    """Write the wrapper of cfg, the cfg itself can be created later"""
+    path = os.path.join(directory, perf_config(cfg))
+    with open(path, 'w') as f:
+        f.write(WRAPPER % {'cfg': os.path.basename(cfg)})
+    return path
+
+
+def step_name(cfg):
+    """NEWCONDITIONS0.py/REFERENCE.py -> step1, recodqm_newco.py -> recodqm, step4_*_HARVESTING.py -> harvesting"""
+    if cfg.startswith('recodqm'):
+        return 'recodqm'
+    if 'HARVESTING' in cfg:
+        return 'harvesting'
+    return 'step1'
+
+
+def perf_command(cmsrun, cfg, label, directory=PERF_DIR):
+    """cmsRun command of a local test step with the performance services and a job report"""
+    prefix = '%s/%s_%s' % (directory, label, step_name(cfg))
+    return '(set -o pipefail; %s-j %s_fjr.xml %s 2>&1 | tee %s.log)' % (cmsrun, prefix, perf_config(cfg), prefix)
+
+
+def parse_fjr(path):
+    """Events, threads, throughput, timing, peak RSS and output files of a FrameworkJobReport"""
+    root = ET.parse(path).getroot()
+    metrics = dict()
+    for summary in root.iter('PerformanceSummary'):
+        for metric in summary.iter('Metric'):
+            metrics['%s/%s' % (summary.get('Metric'), metric.get('Name'))] = metric.get('Value')
+    outputs = []
+    for f in root.findall('File'):
+        pfn = (f.findtext('PFN') or '').strip()
+        outputs.append({'pfn': pfn.replace('file:', '', 1), 'module': (f.findtext('ModuleLabel') or '').strip(),
+                        'events': int(f.findtext('TotalEvents') or 0)})
+    events = max([o['events'] for o in outputs] + [0])
+    for source in root.findall('InputFile'):
+        events = max(events, int(source.findtext('EventsRead') or 0))
+
+    def number(key):
+        try:
+            return float(metrics[key])
+        except (KeyError, TypeError, ValueError):
+            return None
+    threads = number('ProcessingSummary/NumberOfThreads')
+    return {'events': events,
+            'threads': int(threads) if threads else 1,
+            'events_per_second': number('Timing/EventThroughput'),
+            'total_job_time': number('Timing/TotalJobTime'),
+            'avg_event_time': number('Timing/AvgEventTime'),
+            'peak_rss_mb': number('ApplicationMemory/PeakValueRss'),
+            'outputs': outputs}
+
+
+def parse_log(path):
+    """Time per event of the modules, peak RSS and total job time of a cmsRun log"""
+    modules = dict()
+    in_modules = False
+    peak_rss = total_job = None
+    with open(path, errors='replace') as f:
+        for line in f:
+            if line.startswith('TimeReport') and 'Summary' in line:
+                # only the Module Summary has one line per module
+                in_modules = 'Module Summary' in line
+                continue
+            match = TIME_REPORT.match(line)
+            if in_modules and match and match.group(4) != 'Name':
+                modules[match.group(4)] = float(match.group(1))
+            match = PEAK_RSS.search(line)
+            if match:
+                peak_rss = max(peak_rss or 0, float(match.group(1)))
+            match = TOTAL_JOB.search(line)
+            if match and total_job is None:
+                total_job = float(match.group(1))
+    return {'modules': modules, 'peak_rss_mb': peak_rss, 'total_job_time': total_job}
+
+
+def step_summary(prefix, label=''):
+    """Summary of one step from prefix.log and prefix_fjr.xml"""
+    summary = {'events': 0, 'threads': 1, 'events_per_second': None, 'total_job_time': None, 'peak_rss_mb': None,
+               'modules': {}, 'outputs': []}
+    if os.path.exists(prefix + '_fjr.xml'):
+        summary.update(parse_fjr(prefix + '_fjr.xml'))
+    if os.path.exists(prefix + '.log'):
+        log = parse_log(prefix + '.log')
+        summary['modules'] = log['modules']
+        for key in ('peak_rss_mb', 'total_job_time'):
+            if summary[key] is None:
+                summary[key] = log[key]
+    size = 0
+    for output in summary['outputs']:
+        # the concurrent tests run in a directory named after their label
+        top = os.path.join(os.path.dirname(prefix), '..')
+        for candidate in (output['pfn'], os.path.join(top, output['pfn']), os.path.join(top, label, output['pfn'])):
+            if output['pfn'] and os.path.exists(candidate):
+                size += os.path.getsize(candidate)
+                break
+    summary['output_kb_per_event'] = size / 1024. / summary['events'] if summary['events'] and size else None
+    if summary['events_per_second'] is None and summary['events'] and summary['total_job_time']:
+        summary['events_per_second'] = summary['events'] / summary['total_job_time']
+    return summary
+
+
+def summaries(directory=PERF_DIR):
+    """{label: {step: summary}} of the steps found in the directory"""
+    result = dict()
+    for name in sorted(os.listdir(directory)):
+        match = re.match(r'^(newco|refer)_(\w+?)(_fjr\.xml|\.log)$', name)
+        if match and match.group(2) not in result.get(match.group(1), {}):
+            result.setdefault(match.group(1), {})[match.group(2)] = step_summary(
+                os.path.join(directory, '%s_%s' % (match.group(1), match.group(2))), match.group(1))
+    return result
+
+
+def relative(new, ref):
+    if new is None or not ref:
+        return None
+    return new / ref - 1
+
+
+class PerfComparison():
+
+    def __init__(self, directory=PERF_DIR, tolerance=0.1, module_threshold=0.001, top=20):
+        """New vs reference performance of the local tests
+
+        Arguments
+        directory -- directory of the logs and job reports of the steps
+        tolerance -- relative change flagged as a regression
+        module_threshold -- seconds per event below which module changes are ignored
+        top -- modules with the largest increase reported per step
+        """
+        self.directory = directory
+        self.tolerance = tolerance
+        self.module_threshold = module_threshold
+        self.top = top
+
+    def compare_step(self, step, new, ref):
+        changes = {'events_per_second': relative(new['events_per_second'], ref['events_per_second']),
+                   'peak_rss_mb': relative(new['peak_rss_mb'], ref['peak_rss_mb']),
+                   'output_kb_per_event': relative(new['output_kb_per_event'], ref['output_kb_per_event'])}
+        flags = []
+        if changes['events_per_second'] is not None and changes['events_per_second'] < -self.tolerance:
+            flags.append('%s: throughput %.1f%%' % (step, 100 * changes['events_per_second']))
+        for key, what in (('peak_rss_mb', 'peak RSS'), ('output_kb_per_event', 'output size per event')):
+            if changes[key] is not None and changes[key] > self.tolerance:
+                flags.append('%s: %s +%.1f%%' % (step, what, 100 * changes[key]))
+        modules = []
+        for name, time in new['modules'].items():
+            before = ref['modules'].get(name)
+            if before is None or time - before < self.module_threshold:
+                continue
+            change = relative(time, before)
+            if change is None or change > self.tolerance:
+                modules.append({'module': name, 'new': time, 'reference': before, 'change': change})
+        modules.sort(key=lambda m: m['reference'] - m['new'])
+        for m in modules[:self.top]:
+            flags.append('%s: module %s %.4f -> %.4f s/event' % (step, m['module'], m['reference'], m['new']))
+        return {'new': new, 'reference': ref, 'changes': changes, 'slower_modules': modules[:self.top],
+                'flags': flags}
+
+    def run(self):
+        """Returns the report of every step run with both conditions"""
+        found = summaries(self.directory)
+        new, ref = found.get('newco', {}), found.get('refer', {})
+        steps = dict((step, self.compare_step(step, new[step], ref[step])) for step in sorted(set(new) & set(ref)))
+        return {'tolerance': self.tolerance, 'steps': steps,
+                'unmatched': sorted(set(new) ^ set(ref)),
+                'flags': [flag for s in steps.values() for flag in s['flags']]}
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+    parser = ArgumentParser(description='Compare the performance of the new and reference local tests')
+    parser.add_argument('directory', nargs='?', default=PERF_DIR, help='Logs and job reports (Default: perf)')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Relative change flagged (Default: 0.1)')
+    parser.add_argument('--module-threshold', dest='module_threshold', type=float, default=0.001,
+                        help='Seconds per event below which module changes are ignored (Default: 0.001)')
+    parser.add_argument('--output', default='perf_report.json', help='JSON report (Default: perf_report.json)')
+    parser.add_argument('--fail', action='store_true', help='Exit with an error if a regression is flagged')
+    options = parser.parse_args()
+    report = PerfComparison(options.directory, options.tolerance, options.module_threshold).run()
+    with open(options.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    for step, result in report['steps'].items():
+        new, ref = result['new'], result['reference']
+        print(">> %-10s %s events/s, %s MB peak RSS (reference %s events/s, %s MB)" % (
+            step, new['events_per_second'], new['peak_rss_mb'], ref['events_per_second'], ref['peak_rss_mb']))
+    for flag in report['flags']:
+        print(">> REGRESSION %s" % flag)
+    print(">> %d regressions flagged, report written to %s" % (len(report['flags']), options.output))
+    if options.fail and report['flags']:
+        raise SystemExit(1)
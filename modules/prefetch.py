@@ -0,0 +1,221 @@
+"""
+Module that has FileCache class
+
+The local tests read the same input files several times (new and reference
+conditions, HLT/Express/Prompt stages running on the same node). FileCache
+copies every LFN once to a node-local directory, verifies it against the
+DBS3 size and adler32 checksum and evicts the least recently used files
+when the size cap is reached. The size of a file is reserved in the index
+before its copy starts, so that concurrent copies stay within the cap, and
+the files of the list being prefetched are never evicted: a file that does
+not fit is read remotely. The files of a list stay pinned, for the other
+builds sharing the cache, until the local tests release them with
+--release (or for PIN_TIMEOUT if they never do).
+
+Usage (from the top directory of the repository):
+    python3 -m modules.prefetch step1_files.txt
+    python3 -m modules.prefetch --release step1_files.txt
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+import zlib
+import getpass
+import hashlib
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from modules import wma
+from modules.local_store import JsonStore, file_lock
+
+REDIRECTOR = 'root://cms-xrd-global.cern.ch/'
+DEFAULT_MAX_SIZE = 50 * 1024**3
+# a reservation older than this is left by a copy that died and can be evicted
+RESERVATION_TIMEOUT = 6 * 3600
+# a pin older than this is left by local tests that died before releasing it
+PIN_TIMEOUT = 24 * 3600
+
+
+def default_cache_dir():
+    """Node-local directory, ALCAVAL_PREFETCH_DIR overrides it"""
+    path = os.getenv('ALCAVAL_PREFETCH_DIR')
+    if not path:
+        path = os.path.join(os.getenv('TMPDIR', '/tmp'), 'alcaval_prefetch_%s' % getpass.getuser())
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def adler32(path, blocksize=4 * 1024**2):
+    """Adler32 checksum of a file as an integer"""
+    value = 1
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(blocksize), b''):
+            value = zlib.adler32(block, value)
+    return value & 0xffffffff
+
+
+class FileCache():
+
+    def __init__(self, cache_dir=None, max_size=DEFAULT_MAX_SIZE, redirector=REDIRECTOR):
+        """Node-local cache of input files
+
+        Arguments
+        cache_dir -- cache directory, node-local temporary area by default
+        max_size -- size cap of the cache in bytes
+        redirector -- xrootd redirector used to copy the files
+        """
+        self.cache_dir = cache_dir or default_cache_dir()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.max_size = max_size
+        self.redirector = redirector
+        self.index = JsonStore(os.path.join(self.cache_dir, 'index.json'))
+
+    def local_path(self, lfn):
+        name = hashlib.sha1(lfn.encode('utf-8')).hexdigest()[:16] + '_' + os.path.basename(lfn)
+        return os.path.join(self.cache_dir, name)
+
+    def get_metadata(self, lfn):
+        """Size and adler32 of the file according to DBS3"""
+        dbs = wma.ConnectionWrapper()
+        res = dbs.api('files', 'logical_file_name', lfn, detail=True)
+        if not res:
+            raise RuntimeError('File %s not found in DBS' % lfn)
+        return int(res[0]['file_size']), int(res[0]['adler32'], 16)
+
+    def lookup(self, lfn, owner=None):
+        """Returns the local path of a cached file, marks it as used and pins it for owner"""
+        with self.index.update() as index:
+            entry = index.get(lfn)
+            if entry and os.path.exists(entry['path']) and os.path.getsize(entry['path']) == entry['size']:
+                entry['last_used'] = time.time()
+                if owner:
+                    entry.setdefault('pins', {})[owner] = entry['last_used']
+                return entry['path']
+            index.pop(lfn, None)
+        return None
+
+    def reserve(self, lfn, size, pinned=()):
+        """Evict the least recently used files until 'size' bytes fit in the cap and reserve them
+        for the copy of lfn. The pinned files, those pinned by other file lists and the copies
+        in progress are not evicted.
+        Returns False, evicting nothing, if the file does not fit"""
+        if size > self.max_size:
+            return False
+        with self.index.update() as index:
+            now = time.time()
+            used = sum(e['size'] for e in index.values())
+            evictable = sorted((e['last_used'], l) for l, e in index.items() if l not in pinned and
+                               (not e.get('reserved') or now - e['last_used'] > RESERVATION_TIMEOUT) and
+                               not any(now - t < PIN_TIMEOUT for t in e.get('pins', {}).values()))
+            evicted = []
+            for _, other in evictable:
+                if used + size <= self.max_size:
+                    break
+                evicted.append(other)
+                used -= index[other]['size']
+            if used + size > self.max_size:
+                return False
+            for other in evicted:
+                print('>> Evicting %s from the cache' % other)
+                entry = index.pop(other)
+                if os.path.exists(entry['path']):
+                    os.remove(entry['path'])
+            index[lfn] = {'path': self.local_path(lfn), 'size': size, 'reserved': True, 'last_used': now}
+        return True
+
+    def release(self, lfn):
+        """Drop the reservation of a copy that failed"""
+        with self.index.update() as index:
+            if index.get(lfn, {}).get('reserved'):
+                index.pop(lfn)
+
+    def unpin(self, owner):
+        """Let the files pinned by owner be evicted again, returns their number"""
+        released = 0
+        with self.index.update() as index:
+            for entry in index.values():
+                if entry.get('pins', {}).pop(owner, None) is not None:
+                    released += 1
+        return released
+
+    def copy(self, lfn, path):
+        subprocess.check_call(['xrdcp', '--nopbar', '--force', self.redirector + lfn, path])
+
+    def fetch(self, lfn, pinned=(), owner=None):
+        """Returns the local path of lfn, copying it if it is not cached yet, pinned for owner.
+        Returns None if it does not fit in the cache without evicting the pinned files"""
+        path = self.local_path(lfn)
+        # only one process copies a given file, the others wait and reuse it
+        with file_lock(path):
+            cached = self.lookup(lfn, owner)
+            if cached:
+                print('>> Cache hit for %s' % lfn)
+                return cached
+            size, checksum = self.get_metadata(lfn)
+            if not self.reserve(lfn, size, pinned):
+                print('>> No room for %s in the cache, reading it remotely' % lfn)
+                return None
+            tmp = path + '.part'
+            print('>> Copying %s' % lfn)
+            try:
+                self.copy(lfn, tmp)
+                if os.path.getsize(tmp) != size or adler32(tmp) != checksum:
+                    raise RuntimeError('Size or checksum mismatch for %s' % lfn)
+            except Exception:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                self.release(lfn)
+                raise
+            os.replace(tmp, path)
+            with self.index.update() as index:
+                index[lfn] = {'path': path, 'size': size, 'adler32': '%08x' % checksum,
+                              'last_used': time.time()}
+                if owner:
+                    index[lfn]['pins'] = {owner: index[lfn]['last_used']}
+        return path
+
+    def prefetch_file_list(self, filelist='step1_files.txt', workers=4):
+        """Copy the LFNs of a file list and rewrite it with the local paths.
+        The files that do not fit keep their LFN. The original list is kept as <filelist>.remote.
+        The files stay pinned until release_file_list is called with the same list"""
+        with open(filelist) as f:
+            lines = [l.strip() for l in f if l.strip()]
+        lfns = [l for l in lines if l.startswith('/store/')]
+        # the files of the list do not evict each other
+        pinned = frozenset(lfns)
+        owner = os.path.abspath(filelist)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            paths = dict(zip(lfns, pool.map(lambda lfn: self.fetch(lfn, pinned, owner), lfns)))
+        os.replace(filelist, filelist + '.remote')
+        with open(filelist, 'w') as f:
+            for line in lines:
+                f.write(('file:' + paths[line] if paths.get(line) else line) + '\n')
+        print('>> %d files of %s read from %s, %d read remotely' % (
+            sum(1 for p in paths.values() if p), filelist, self.cache_dir, sum(1 for p in paths.values() if not p)))
+
+    def release_file_list(self, filelist='step1_files.txt'):
+        """Unpin the files of a prefetched list, once the local tests do not read them anymore"""
+        released = self.unpin(os.path.abspath(filelist))
+        print('>> %d files of %s released in %s' % (released, filelist, self.cache_dir))
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+    parser = ArgumentParser(description='Copy the input files of the local tests to a node-local cache')
+    parser.add_argument('filelist', nargs='?', default='step1_files.txt')
+    parser.add_argument('--cache-dir', dest='cache_dir', default=None, help='cache directory')
+    parser.add_argument('--max-size', dest='max_size', type=float, default=DEFAULT_MAX_SIZE / 1024.**3,
+                        help='size cap of the cache in GB')
+    parser.add_argument('--redirector', default=REDIRECTOR, help='xrootd redirector')
+    parser.add_argument('--release', action='store_true', help='Unpin the files of the list after the local tests')
+    options = parser.parse_args()
+    cache = FileCache(options.cache_dir, int(options.max_size * 1024**3), options.redirector)
+    if options.release:
+        cache.release_file_list(options.filelist)
+        sys.exit(0)
+    try:
+        cache.prefetch_file_list(options.filelist)
+    except Exception as e:
+        # the local test can still read the files remotely
+        print('>> Prefetch failed, keeping the remote file list: %s' % e)
+        sys.exit(0)
@@ -0,0 +1,138 @@
+"""
+Module that has RequestStore class
+
+A versioned JSON-Lines store of the requests of a campaign. The first line
+is a header with the format version, every other line is one entry of one
+request (the request itself, or a status update) with its primary dataset
+and a checksum. Entries are only appended, the state of a request is the
+merge of its entries, and the requests of some PDs can be reloaded without
+decoding the whole file.
+"""
+from __future__ import print_function
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+FORMAT = 'alcaval-requests'
+VERSION = 1
+
+PREPARED = 'prepared'
+SUBMITTING = 'submitting'
+INJECTED = 'injected'
+APPROVED = 'approved'
+FAILED = 'failed'
+
+
+def checksum(entry):
+    payload = dict((k, v) for k, v in entry.items() if k != 'checksum')
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def request_pd(request):
+    dataset = request.get('InputDataset') or ''
+    return dataset.split('/')[1] if dataset.count('/') == 3 else ''
+
+
+class RequestStore():
+
+    def __init__(self, path):
+        """Store of the requests of a campaign
+
+        Arguments
+        path -- JSON-Lines file, created with its header at the first append
+        """
+        self.path = path
+        self.lock = threading.Lock()
+
+    def check_header(self, line):
+        header = json.loads(line)
+        if header.get('format') != FORMAT or header.get('version') != VERSION:
+            raise ValueError("%s is not a version %d request store" % (self.path, VERSION))
+
+    def append(self, key, pd='', **entry):
+        """Append one entry of the request 'key'"""
+        entry.update({'key': key, 'pd': pd, 'time': time.time()})
+        entry['checksum'] = checksum(entry)
+        with self.lock:
+            size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            with open(self.path, 'a+') as f:
+                if size == 0:
+                    f.write(json.dumps({'format': FORMAT, 'version': VERSION, 'created': time.time()}) + '\n')
+                else:
+                    f.seek(size - 1)
+                    if f.read(1) != '\n':
+                        # do not glue the entry to a line truncated by a crash
+                        f.write('\n')
+                f.write(json.dumps(entry, sort_keys=True) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+    def entries(self, pds=None):
+        """Yields the valid entries, only those of the given PDs if any"""
+        if not os.path.exists(self.path):
+            return
+        needles = ['"pd": %s' % json.dumps(pd) for pd in pds] if pds else None
+        with open(self.path) as f:
+            header = f.readline()
+            if header:
+                self.check_header(header)
+            for number, line in enumerate(f, 2):
+                if not line.strip():
+                    continue
+                if needles and not any(n in line for n in needles):
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # last line of a crashed run
+                    print("Skipping truncated line %d of %s" % (number, self.path))
+                    continue
+                if entry.get('checksum') != checksum(entry):
+                    print("Skipping corrupted line %d of %s" % (number, self.path))
+                    continue
+                yield entry
+
+    def load(self, pds=None):
+        """Returns {key: merged state} in the order of first appearance"""
+        states = OrderedDict()
+        for entry in self.entries(pds):
+            states.setdefault(entry['key'], {}).update(entry)
+        return states
+
+    def prepare(self, requests):
+        """Record the requests to be submitted, keeping those already submitted"""
+        states = self.load()
+        for request in requests:
+            key = request['RequestString']
+            if states.get(key, {}).get('status', PREPARED) not in (PREPARED, FAILED):
+                print("Request %s is already %s, not preparing it again" % (key, states[key]['status']))
+                continue
+            self.append(key, request_pd(request), status=PREPARED, request=request)
+
+    def requests(self, pds=None):
+        """The prepared requests, only those of the given PDs if any"""
+        return [s['request'] for s in self.load(pds).values() if 'request' in s]
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+    parser = ArgumentParser(description='Show or update the requests of a campaign')
+    parser.add_argument('path', help='request store, e.g. requests_for_<cfg>_journal.jsonl')
+    parser.add_argument('--pds', default='', help='comma separated primary datasets to show')
+    parser.add_argument('--mark', nargs=2, metavar=('KEY', 'STATUS'), help='set the status of a request')
+    parser.add_argument('--workflow', default=None, help='workflow name of the request to mark')
+    options = parser.parse_args()
+    store = RequestStore(options.path)
+    if options.mark:
+        key, status = options.mark
+        states = store.load()
+        if key not in states:
+            raise ValueError("No request %s in %s" % (key, options.path))
+        extra = {'workflow': options.workflow} if options.workflow else {}
+        store.append(key, states[key]['pd'], status=status, **extra)
+    pds = [pd for pd in options.pds.split(',') if pd] or None
+    for key, state in store.load(pds).items():
+        print("%-60s %-12s %s" % (key, state.get('status'), state.get('workflow', '')))
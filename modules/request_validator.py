@@ -0,0 +1,197 @@
+"""
+Module that has RequestValidator class
+
+Checks all the sections of a wmcontrol request file offline, before any
+configuration is uploaded to CouchDB or any request is injected. The checks
+of every request type are compiled once from RULES, the cross-field rules
+of wmcontrol (processing string length, kept outputs, LumiList vs
+RunWhitelist, dataset names) are applied to every section, and all the
+problems are reported together.
+"""
+from __future__ import print_function
+import os
+import re
+import ast
+from collections import OrderedDict
+
+# wmcontrol refuses longer processing strings
+MAX_PROCESSING_STRING = 99
+
+DATASET = re.compile(r'^/[\w-]+/[\w.-]+/[A-Z-]+$')
+PROCESSING_STRING = re.compile(r'^\w*$')
+PROCESSING_STRINGS = ['processing_string', 'step1_processstring', 'step2_processstring', 'step3_processstring']
+
+# per request type: parameters that must be set, and the additional checks
+RULES = {
+    'ReReco': {'required': ['release', 'globaltag'], 'checks': ['config', 'input', 'lumis']},
+    'ReDigi': {'required': ['release', 'globaltag'], 'checks': ['config', 'input', 'lumis', 'redigi_output']},
+    'TaskChain': {'required': ['release'], 'checks': ['config', 'input', 'lumis', 'taskchain_output', 'task_globaltags']},
+    'MonteCarlo': {'required': ['release', 'globaltag', 'primary_dataset'], 'checks': ['config', 'events']},
+    'MonteCarloFromGEN': {'required': ['release', 'globaltag'], 'checks': ['config', 'input']},
+    'LHEStepZero': {'required': ['release', 'primary_dataset'], 'checks': ['config', 'events']},
+    'DQMHarvest': {'required': ['release', 'globaltag'], 'checks': ['harvest', 'input', 'lumis']},
+}
+
+
+def cfg_db_names(filename):
+    """cfg names of a file of 'cfg_name docid' lines"""
+    names = set()
+    with open(filename) as f:
+        for line in f:
+            line = line[:line.find('#')] if '#' in line else line
+            if line.strip():
+                names.add(line.split()[0])
+    return names
+
+
+class RequestValidator():
+
+    def __init__(self, cfg):
+        """Offline validation of the sections of a request file
+
+        Arguments
+        cfg -- wmcontrol.Configuration of the request file
+        """
+        self.cfg = cfg
+        self.checks = dict((request_type, [getattr(self, 'check_' + name) for name in rule['checks']])
+                           for request_type, rule in RULES.items())
+
+    def get(self, section, name, default=''):
+        return self.cfg.get_param(name, default, section)
+
+    def steps(self, p):
+        """(step, cfg, docID) of the configured steps"""
+        return [(1, p.step1_cfg or p.cfg_path, p.step1_docID or p.docID),
+                (2, p.step2_cfg, p.step2_docID),
+                (3, p.step3_cfg, p.step3_docID)]
+
+    def input_datasets(self, p):
+        """Input datasets and their runs, as get_dataset_runs_dict sees them"""
+        try:
+            return ast.literal_eval(p.dset_run_dict)
+        except (ValueError, SyntaxError):
+            return {p.input_name: []} if p.input_name else {}
+
+    def check_config(self, section, p):
+        known = cfg_db_names(p.cfg_db_file) if p.cfg_db_file and os.path.exists(p.cfg_db_file) else set()
+        steps = self.steps(p)
+        if not steps[0][1] and not steps[0][2]:
+            yield 'error', 'no step1 configuration: set step1_docID/docID or step1_cfg/cfg_path'
+        for step, cfg, docid in steps:
+            if cfg and not docid and cfg not in known and not os.path.exists(cfg):
+                yield 'error', 'step%d configuration %s does not exist' % (step, cfg)
+
+    def check_harvest(self, section, p):
+        if not p.harvest_docID and not p.harvest_cfg:
+            yield 'error', 'no harvesting configuration: set harvest_docID or harvest_cfg'
+        elif p.harvest_cfg and not p.harvest_docID and not os.path.exists(p.harvest_cfg):
+            yield 'error', 'harvesting configuration %s does not exist' % (p.harvest_cfg)
+
+    def check_input(self, section, p):
+        if not self.input_datasets(p):
+            yield 'error', 'no input dataset: set input_name or dset_run_dict'
+
+    def check_lumis(self, section, p):
+        if not p.lumi_list:
+            return
+        lumis = ast.literal_eval(p.lumi_list)
+        if not isinstance(lumis, dict) or not all(
+                isinstance(ranges, list) and all(len(r) == 2 and r[0] <= r[1] for r in ranges)
+                for ranges in lumis.values()):
+            yield 'error', 'lumi_list must be {run: [[first, last], ...]}'
+            return
+        if p.blocks:
+            yield 'warning', 'lumi_list is ignored because blocks are given'
+            return
+        for dataset, runs in self.input_datasets(p).items():
+            if isinstance(runs, list) and runs:
+                yield 'warning', ('both lumi_list and the runs of %s are given, only lumi_list is used' % (dataset))
+                missing = set(int(r) for r in lumis) - set(int(r) for r in runs if not isinstance(r, str))
+                if missing:
+                    yield 'warning', 'runs %s of lumi_list are not in the runs of %s' % (sorted(missing), dataset)
+
+    def check_events(self, section, p):
+        if p.number_events <= 0:
+            yield 'error', 'number_events must be positive'
+
+    def check_redigi_output(self, section, p):
+        # the rules of build_params_dict for ReDigi
+        if p.step2_cfg or p.step2_docID:
+            if not (p.step3_cfg or p.step3_docID) and not p.keep_step2:
+                yield 'error', 'second step, no third step and keep_step2 is not set: no output is kept'
+        elif not p.keep_step1:
+            yield 'error', 'one step and keep_step1 is not set: no output is kept'
+
+    def check_taskchain_output(self, section, p):
+        # check_keep_output: only Task1 sets KeepOutput, the others keep it by default
+        if not (p.step2_cfg or p.step2_docID) and not p.keep_step1:
+            yield 'error', 'workflow keeps no output: set keep_step1 or add a second task'
+
+    def check_task_globaltags(self, section, p):
+        for step, cfg, docid in self.steps(p):
+            if (cfg or docid) and not self.get(section, 'step%d_globaltag' % step, p.globaltag):
+                yield 'error', 'no global tag for task %d: set globaltag or step%d_globaltag' % (step, step)
+
+    def check_common(self, section, p):
+        for name in RULES[p.request_type]['required']:
+            if not getattr(p, name):
+                yield 'error', '%s is not set' % (name)
+        for name in PROCESSING_STRINGS:
+            value = self.get(section, name)
+            if len(value) > MAX_PROCESSING_STRING:
+                yield 'error', '%s has %d characters, the limit is %d' % (name, len(value), MAX_PROCESSING_STRING)
+            if not PROCESSING_STRING.match(value):
+                yield 'error', '%s %s has characters other than letters, digits and _' % (name, value)
+        if p.dset_run_dict:
+            try:
+                ast.literal_eval(p.dset_run_dict)
+            except (ValueError, SyntaxError):
+                yield 'warning', 'dset_run_dict is not a python literal, input_name is used instead'
+        datasets = list(self.input_datasets(p)) + [p.pu_dataset]
+        for dataset in datasets:
+            if dataset and not DATASET.match(dataset):
+                yield 'error', 'malformed dataset name %s' % (dataset)
+        for dataset, runs in self.input_datasets(p).items():
+            if isinstance(runs, str) and not os.path.exists(runs):
+                yield 'error', 'run JSON file %s of %s does not exist' % (runs, dataset)
+        if p.cfg_db_file and not os.path.exists(p.cfg_db_file):
+            yield 'error', 'cfg_db_file %s does not exist' % (p.cfg_db_file)
+        if not p.campaign and not p.request_id:
+            yield 'warning', 'campaign and request_id are not set'
+        elif not p.campaign and not re.match('.*-(.*)-.*', p.request_id):
+            yield 'error', 'no campaign and request_id %s is not <pwg>-<campaign>-<number>' % (p.request_id)
+        if not 0 <= p.priority < 1000000:
+            yield 'error', 'priority %d is out of [0, 999999]' % (p.priority)
+
+    def validate_section(self, section):
+        """Returns the list of (level, message) of a section"""
+        try:
+            p = self.cfg.params(section)
+            if p.url_dict:
+                # the request comes from a third party
+                return []
+            if p.request_type not in RULES:
+                return [('error', 'unknown request_type %s, expecting one of %s' % (
+                        p.request_type, ', '.join(sorted(RULES))))]
+            problems = list(self.check_common(section, p))
+            for check in self.checks[p.request_type]:
+                problems.extend(check(section, p))
+        except (ValueError, SyntaxError) as e:
+            problems = [('error', str(e).replace('Section %s: ' % (section), ''))]
+        return problems
+
+    def validate(self, sections=None):
+        """Returns {section: [(level, message)]} of all the sections"""
+        sections = sections or self.cfg.configparser.sections()
+        return OrderedDict((section, self.validate_section(section)) for section in sections)
+
+    def report(self, results=None):
+        """Prints the problems, returns the number of errors"""
+        results = self.validate() if results is None else results
+        errors = 0
+        for section, problems in results.items():
+            for level, message in problems:
+                print("%s in section %s: %s" % (level.upper(), section, message))
+                errors += level == 'error'
+        print("Checked %d requests: %d errors" % (len(results), errors))
+        return errors
@@ -0,0 +1,179 @@
+"""
+Module that has ResourceEstimator class
+
+TimePerEvent, SizePerEvent and Memory of the validation workflows, learnt
+from the local tests. The job reports of the local tests run with --perf
+are recorded in a history kept in the user cache, keyed by release,
+workflow type, primary dataset and scenario, and the parameters of every
+task of a new submission are estimated from the closest measurements:
+the same key, then the same workflow, dataset and scenario in any release,
+then the same workflow and scenario.
+
+Usage (from the top directory of the repository):
+    python3 -m modules.resource_estimator record perf --metadata metadata_HLT.json
+    python3 -m modules.resource_estimator estimate CMSSW_12_4_0 HLT+RECO /ZeroBias/Run2022C-v1/RAW
+"""
+from __future__ import print_function
+import os
+import json
+import math
+import time
+from modules.local_store import cache_dir, JsonStore
+from modules import perf_report
+
+# measurements kept per key and step
+HISTORY = 20
+# cores of the validation workflows
+MULTICORE = 4
+# the estimates are the median measurement times this margin
+MARGIN = 1.2
+# memory added per thread when running with more threads than the local test
+MEMORY_PER_THREAD = 500
+MIN_MEMORY = 2000
+
+
+def scenario(cosmics=False, hion=False):
+    if cosmics:
+        return 'cosmics'
+    if hion:
+        return 'HeavyIons'
+    return 'pp'
+
+
+def primary_dataset(ds):
+    """/ZeroBias/Run2022C-v1/RAW -> ZeroBias"""
+    return ds.strip('/').split('/')[0] if ds else ''
+
+
+def history_key(release, wtype, ds, scen):
+    return '|'.join([release, wtype, primary_dataset(ds), scen])
+
+
+def measurement(summary):
+    """Core-seconds per event, peak RSS and output size per event of a step summary"""
+    if not summary.get('events_per_second'):
+        return None
+    return {'core_time_event': summary['threads'] / summary['events_per_second'],
+            'peak_rss_mb': summary['peak_rss_mb'],
+            'size_event_kb': summary['output_kb_per_event'],
+            'threads': summary['threads'],
+            'events': summary['events'],
+            'recorded_at': time.time()}
+
+
+def median(values):
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2.
+
+
+class ResourceEstimator():
+
+    def __init__(self, path=None, margin=MARGIN, cores=MULTICORE):
+        """Estimates of TimePerEvent, Memory and SizePerEvent from the measured local tests
+
+        Arguments
+        path -- JSON history, resources/history.json in the user cache by default
+        margin -- factor applied to the measured values
+        cores -- Multicore of the tasks the estimates are made for
+        """
+        self.store = JsonStore(path or os.path.join(cache_dir('resources'), 'history.json'))
+        self.margin = margin
+        self.cores = cores
+        self.history = None
+
+    def record(self, key, step, summary):
+        """Add the measurement of a step to the history, returns it or None if nothing was measured"""
+        found = measurement(summary)
+        if found is None:
+            return None
+        with self.store.update() as history:
+            steps = history.setdefault(key, {})
+            steps[step] = (steps.get(step, []) + [found])[-HISTORY:]
+        self.history = None
+        return found
+
+    def record_directory(self, directory, key):
+        """Record every step of the local tests whose job reports are in directory"""
+        recorded = 0
+        for label, steps in perf_report.summaries(directory).items():
+            for step, summary in steps.items():
+                if self.record(key, step, summary):
+                    recorded += 1
+        return recorded
+
+    def measurements(self, release, wtype, ds, scen, step):
+        """The measurements of the closest key and where they come from"""
+        if self.history is None:
+            self.history = self.store.load()
+        pd = primary_dataset(ds)
+        matches = (lambda r, w, d, s: (r, w, d, s) == (release, wtype, pd, scen),
+                   lambda r, w, d, s: (w, d, s) == (wtype, pd, scen),
+                   lambda r, w, d, s: (w, s) == (wtype, scen))
+        for match in matches:
+            found = []
+            sources = []
+            for key, steps in sorted(self.history.items()):
+                if len(key.split('|')) == 4 and match(*key.split('|')) and steps.get(step):
+                    found.extend(steps[step])
+                    sources.append(key)
+            if found:
+                return found, sources
+        return [], []
+
+    def estimate(self, release, wtype, ds, scen, step='step1'):
+        """{'time_event', 'size_memory', 'size_event', 'source'} of a task, None if it was never measured.
+        The values that could not be measured are None"""
+        found, sources = self.measurements(release, wtype, ds, scen, step)
+        if not found:
+            return None
+        result = {'time_event': None, 'size_memory': None, 'size_event': None, 'source': ', '.join(sources)}
+        core_time = median(m['core_time_event'] for m in found)
+        rss = median(m['peak_rss_mb'] + MEMORY_PER_THREAD * max(self.cores - m['threads'], 0)
+                     for m in found if m['peak_rss_mb'])
+        size = median(m['size_event_kb'] for m in found)
+        if core_time:
+            # TimePerEvent is the wall time per event of a job running on all the cores
+            result['time_event'] = round(core_time * self.margin / self.cores, 3)
+        if rss:
+            result['size_memory'] = max(MIN_MEMORY, int(math.ceil(rss * self.margin / 100.)) * 100)
+        if size:
+            result['size_event'] = int(math.ceil(size * self.margin))
+        return result
+
+
+def metadata_key(metadata):
+    """History key of the Task1 of the workflows of a metadata file"""
+    options = metadata['options']
+    release = metadata.get('HLT_release') or metadata.get('Expr_release') or metadata.get('PR_release')
+    ds = options['ds'].split(',')[0] if not isinstance(options['ds'], list) else options['ds'][0]
+    return history_key(release, options['Type'], ds, scenario('cosmics' in options, 'HIon' in options))
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+    parser = ArgumentParser(description='Learn and estimate TimePerEvent, Memory and SizePerEvent of the workflows')
+    commands = parser.add_subparsers(dest='command')
+    record = commands.add_parser('record', help='Record the performance of the local tests')
+    record.add_argument('directory', nargs='?', default=perf_report.PERF_DIR,
+                        help='Logs and job reports (Default: perf)')
+    record.add_argument('--metadata', required=True, help='Metadata file of the validation')
+    estimate = commands.add_parser('estimate', help='Print the estimates of a workflow')
+    estimate.add_argument('release')
+    estimate.add_argument('Type')
+    estimate.add_argument('ds')
+    estimate.add_argument('--scenario', default='pp', choices=['pp', 'cosmics', 'HeavyIons'])
+    estimate.add_argument('--cores', type=int, default=MULTICORE, help='Multicore (Default: %d)' % MULTICORE)
+    options = parser.parse_args()
+    if options.command == 'record':
+        key = metadata_key(json.load(open(options.metadata)))
+        print(">> %d steps recorded for %s" % (ResourceEstimator().record_directory(options.directory, key), key))
+    elif options.command == 'estimate':
+        estimator = ResourceEstimator(cores=options.cores)
+        for step in ('step1', 'recodqm'):
+            result = estimator.estimate(options.release, options.Type, options.ds, options.scenario, step)
+            print(">> %-8s %s" % (step, result or 'never measured'))
+    else:
+        parser.print_help()
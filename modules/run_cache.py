@@ -0,0 +1,83 @@
+"""
+Module that has RunCache class
+
+The attributes of a run read by the validation (CMSSW version, magnetic
+field, start time, HLT key and run class) do not change once the run is
+closed. RunCache keeps them in a local store, so Run Registry is queried
+only for unknown or still open runs, and all of them in one request.
+"""
+from __future__ import print_function
+import os
+import time
+from modules.local_store import JsonStore, cache_dir
+
+FIELDS = ('cmssw_version', 'b_field', 'start_time', 'hlt_key', 'class')
+
+
+def run_record(run):
+    """Reduce a Run Registry run to the cached attributes"""
+    oms = run['oms_attributes']
+    return {'cmssw_version': oms['cmssw_version'],
+            'b_field': float(oms['b_field']),
+            'start_time': oms['start_time'],
+            'hlt_key': oms['hlt_key'],
+            'class': run['class'],
+            'closed': bool(oms.get('end_time')),
+            'source': 'runregistry',
+            'fetched_at': time.time()}
+
+
+class RunCache():
+
+    def __init__(self, path=None, max_age=3600):
+        """Run metadata cache
+
+        Arguments
+        path -- JSON store, runs.json in the cache area by default
+        max_age -- seconds after which an open run is fetched again
+        """
+        self.store = JsonStore(path or os.path.join(cache_dir(), 'runs.json'))
+        self.max_age = max_age
+
+    def is_fresh(self, record):
+        return record['closed'] or time.time() - record['fetched_at'] < self.max_age
+
+    def fetch(self, runs):
+        """Query Run Registry for all the runs at once"""
+        import runregistry
+        res = runregistry.get_runs(filter={'run_number': {'or': [int(r) for r in runs]}})
+        return dict((str(r['run_number']), run_record(r)) for r in res)
+
+    def seed(self, run, b_field, run_class, hlt_key, cmssw_version=None):
+        """Store the values of the template fallback fields for a run that is
+        not cached yet. They are used only if Run Registry cannot be reached"""
+        with self.store.update() as runs:
+            if str(run) in runs:
+                return
+            runs[str(run)] = {'cmssw_version': cmssw_version, 'b_field': float(b_field),
+                              'start_time': None, 'hlt_key': hlt_key, 'class': run_class,
+                              'closed': False, 'source': 'template', 'fetched_at': 0}
+
+    def get_runs(self, runs):
+        """Returns {run: attributes} for a list of run numbers"""
+        runs = [str(r) for r in runs]
+        cached = self.store.load()
+        missing = [r for r in runs if r not in cached or not self.is_fresh(cached[r])]
+        if missing:
+            try:
+                fetched = self.fetch(missing)
+            except Exception as e:
+                print(">> Run Registry is not accessible, using the cached run attributes: %s" % e)
+                fetched = dict()
+            if fetched:
+                with self.store.update() as store:
+                    store.update(fetched)
+                cached.update(fetched)
+        unknown = [r for r in runs if r not in cached]
+        if unknown:
+            raise RuntimeError("Attributes of runs %s are not available. Fill b_field, class and hlt_key "
+                               "in the template if Run Registry is down" % ', '.join(unknown))
+        return dict((r, cached[r]) for r in runs)
+
+    def get_run(self, run):
+        return self.get_runs([run])[str(run)]
@@ -0,0 +1,111 @@
+"""
+Module that has TWikiClient class
+
+Appends a section to a TWiki topic with plain HTTP requests: CERN SSO login
+with the grid certificate, one request for the edit form (topic text and
+the hidden fields, including the validation key) and one request to the
+save script. A section already in the topic is not appended again, and the
+errors after the save request are raised as SaveAttempted, since the topic
+may have been saved anyway.
+"""
+from __future__ import print_function
+import requests
+from html.parser import HTMLParser
+from cernrequests import certs
+from cernrequests.cookies import get_sso_cookies
+
+BUTTONS = '%MyButtons%'
+
+
+class SaveAttempted(RuntimeError):
+    """The save request was sent, the topic may be updated despite the error"""
+    pass
+
+
+class EditFormParser(HTMLParser):
+    """Collects the hidden fields and the topic text of the TWiki edit form"""
+    def __init__(self):
+        HTMLParser.__init__(self)
+        self.fields = dict()
+        self.text = None
+        self.in_topic = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'input' and attrs.get('type') == 'hidden' and attrs.get('name'):
+            self.fields[attrs['name']] = attrs.get('value') or ''
+        elif tag == 'textarea' and attrs.get('name') == 'text':
+            self.in_topic = True
+            self.text = ''
+
+    def handle_endtag(self, tag):
+        if tag == 'textarea':
+            self.in_topic = False
+
+    def handle_data(self, data):
+        if self.in_topic:
+            self.text += data
+
+
+def has_section(text, section):
+    return section.strip() in text
+
+
+def append_section(text, section):
+    """Topic text with the section appended before the buttons"""
+    text = text.strip()
+    if text.endswith(BUTTONS):
+        text = text[:-len(BUTTONS)]
+    return text + section
+
+
+class TWikiClient():
+
+    def __init__(self, url, cert=None):
+        """Client of one TWiki topic
+
+        Arguments
+        url -- view URL of the topic, e.g. https://twiki.cern.ch/twiki/bin/viewauth/CMS/Topic
+        cert -- (certificate, key) paths, the grid certificate of the user by default
+        """
+        base, path = url.split('/bin/', 1)
+        self.bin = base + '/bin'
+        self.topic = '/'.join(path.split('/')[1:])
+        self.url = url
+        self.session = requests.Session()
+        self.session.verify = certs.where()
+        self.cert = cert
+
+    def script_url(self, script):
+        return '%s/%s/%s' % (self.bin, script, self.topic)
+
+    def login(self):
+        """CERN SSO login with the certificate"""
+        self.session.cookies.update(get_sso_cookies(self.url, self.cert))
+
+    def edit_form(self):
+        """Returns the hidden fields and the raw text of the topic"""
+        res = self.session.get(self.script_url('edit'), params={'nowysiwyg': 1})
+        res.raise_for_status()
+        form = EditFormParser()
+        form.feed(res.text)
+        if form.text is None:
+            raise RuntimeError('No edit form in %s, check the login and the topic lock' % res.url)
+        return form.fields, form.text
+
+    def append_section(self, section):
+        """Append a section to the topic and save it, returns False if it was already there"""
+        fields, text = self.edit_form()
+        if has_section(text, section):
+            print(">> The section is already in %s" % self.topic)
+            return False
+        fields.update({'text': append_section(text, section), 'action_save': 'Save'})
+        try:
+            res = self.session.post(self.script_url('save'), data=fields)
+            res.raise_for_status()
+        except Exception as e:
+            raise SaveAttempted('Saving %s failed: %s' % (self.topic, e))
+        if '/oops/' in res.url:
+            raise SaveAttempted('TWiki refused to save the topic: %s' % res.url)
+        print(">> Topic %s updated" % self.topic)
+        return True
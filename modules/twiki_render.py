@@ -0,0 +1,206 @@
+"""
+Module that has SectionRenderer class
+
+workflow_config.json and envs.json are loaded once into a Submission model,
+and the TWiki section of a validation week is rendered row by row from
+precompiled templates.
+
+Usage (from the top directory of the repository):
+    python3 -m modules.twiki_render envs_w48.json:workflow_config_w48.json ...
+"""
+from __future__ import print_function
+import os
+import json
+from string import Template
+from collections import namedtuple, OrderedDict
+
+DMYTRO = 'https://dmytro.web.cern.ch/dmytro/cmsprodmon/requests.php?campaign='
+CONDDB = 'https://cms-conddb.cern.ch/cmsDbBrowser/list/Prod/gts/'
+GTDIFF = 'https://cms-conddb.cern.ch/cmsDbBrowser/diff/Prod/gts'
+REQMGR = 'https://cmsweb.cern.ch/reqmgr2/fetch?rid='
+DASLINK = 'https://cmsweb.cern.ch/das/request?view=list&limit=50&instance=prod/global&input=summary+dataset='
+DQMGUI = 'https://cmsweb.cern.ch/dqm/relval/start?runnr='
+
+# (condition, key of the workflow type) in the order of the workflow table
+CONDITIONS = [('HLT', 'HLT'), ('Express', 'EXPR'), ('Prompt', 'PR')]
+
+Workflow = namedtuple('Workflow', ['wtype', 'campaign', 'name', 'cmssw', 'processing_string', 'pd'])
+Submission = namedtuple('Submission', ['envs', 'workflows'])
+
+TEMPLATES = dict((name, Template(text)) for name, text in [
+    ('header', '\n\n---++ Week ${week}\n---+++ ${title}\n\n*Description*: ${subject}\n\n%StartTwisty%'
+               '\n*Campaign IDs and JIRA link*: '),
+    ('campaign', '\n   * *${wf} Campaign*: [[${dmytro}${campaign}][${campaign}]]'),
+    ('links', '\n   * *Jira*: [[https://its.cern.ch/jira/browse/CMSALCA-${jira}][CMSALCA-${jira}]]\n'
+              '\n*Hypernews links*: '
+              '\n   * *New tag validation request*: [[${request}][${request}]]'
+              '\n   * *Request email with full details about validation*: [[][]]'
+              '\n   * *Email after the new tag is deployed*: [[][]]'
+              '\n\n*Details for the workflows*:  \n   * *Dataset*: ${dataset}'),
+    ('run', '\n   * *Run/s*: ${run}, LS: ${lumis} recorded on ${date} with B-field ${b_field}T'),
+    ('release', '\n   * *HLT Key*: ${hlt_key}\n   * *CMSSW*: ${release}\n'),
+    ('gt_table', '%TABLE{ caption="Conditions Table" valign="middle" headeralign="center"}%'
+                 '${c1}${c2}${c3}${c4}${c5}'),
+    ('wf_header', '%TABLE{ caption="Workflows Table" valign="middle" headeralign="center" '
+                  'dataalign="center,left,left,left,center,center"}%'
+                  '\n\n| *Index* | *PD* | *Description* | *Workflow name* | *DQM Plots* | *Overlay* |'),
+    ('wf_row', '\n|WF${index}| ${pd} | ${condition} ${type} | ${workflow} | ${dqm} | ${overlay} |'),
+    ('footer', '\n%ENDTWISTY%\n%MyButtons%'),
+])
+
+
+def workflow_type(section):
+    """HLT_newconditions_ZeroBias_... -> HLT_newco_ZeroBias"""
+    sec = section.split('_')[:3]
+    return '_'.join([sec[0], sec[1][:5], sec[2]]).strip()
+
+
+_workflows = dict()
+
+
+def load_workflows(path='workflow_config.json'):
+    """Returns {workflow type: Workflow}, parsed once per content of the file"""
+    if not os.path.exists(path):
+        raise FileNotFoundError('Create %s by submitting relval for production' % path)
+    key = (os.path.abspath(path), os.path.getmtime(path))
+    if key not in _workflows:
+        config = json.load(open(path))
+        workflows = OrderedDict()
+        for section, values in config.items():
+            cfg = values['Config']
+            wtype = workflow_type(section)
+            workflows[wtype] = Workflow(wtype=wtype, campaign=cfg['Campaign'], name=values['workflow_name'],
+                                        cmssw=cfg['CMSSWVersion'], processing_string=cfg['ProcessingString'],
+                                        pd=cfg['Task1']['InputDataset'].split('/')[1].strip())
+        _workflows[key] = workflows
+    return _workflows[key]
+
+
+def load_submission(envs='envs.json', config='workflow_config.json'):
+    """Submission model of a validation"""
+    return Submission(envs=json.load(open(envs)), workflows=load_workflows(config))
+
+
+def campaign_ids(workflows):
+    campIDs = {'HLT': set(), 'PR': set(), 'EXPR': set()}
+    for wf in workflows.values():
+        campIDs[wf.wtype.split('_')[0]].add(wf.campaign)
+    return campIDs
+
+
+def workflow_names(workflows):
+    return dict((wf.wtype, wf.name) for wf in workflows.values())
+
+
+def dqm_dataset(wf):
+    return '/' + wf.pd + '/' + wf.cmssw + '-' + wf.processing_string + '-v1/DQMIO'
+
+
+def run_numbers(envs):
+    """Sorted runs of a validation, envs.json written before several runs were supported has only run_number"""
+    return sorted(envs.get('run_numbers') or [envs['run_number']], key=int)
+
+
+def das_runs(envs):
+    """run=N, or run in [N,M] for several runs"""
+    runs = run_numbers(envs)
+    return 'run=%s' % runs[0] if len(runs) == 1 else 'run+in+[%s]' % ','.join(runs)
+
+
+def dqm_links(envs, workflows):
+    """DQM GUI links of every workflow and the new vs reference overlays,
+    as {key: [(run, link), ...]} with one link per run (the GUI shows one run)"""
+    s3 = 'workspace=Everything'
+    s4 = 'referencepos=ratiooverlay;referenceshow=all;referencenorm=True;'
+    runs = run_numbers(envs)
+    links = dict((wtype, [(run, '%s%s;dataset=%s;%s' % (DQMGUI, run, dqm_dataset(wf), s3)) for run in runs])
+                 for wtype, wf in workflows.items())
+    for ds in envs['Dataset'].split(','):
+        dname = ds.split('/')[1].strip()
+        for wf, key in CONDITIONS:
+            if not wf in envs['WorkflowsToSubmit']: continue
+            s2 = 'dataset=%s;' % dqm_dataset(workflows[key + '_newco_' + dname])
+            s5 = 'referenceobj1=other%3A%3A{}%3A%3A;'.format(dqm_dataset(workflows[key + '_refer_' + dname]))
+            links[wf + '_' + dname] = [(run, '%s%s;' % (DQMGUI, run) + s2 + s4 + s5 + s3) for run in runs]
+    return links
+
+
+def gui_links(links, text):
+    """TWiki links of the runs of a workflow, labelled with the run when there are several"""
+    if len(links) == 1:
+        return '[[%s][%s]]' % (links[0][1], text)
+    return ' '.join('[[%s][%s %s]]' % (link, text, run) for run, link in links)
+
+
+def section_rows(campID, wf_names, envs, dqm):
+    """Yields (row id, template name, values) for all the rows of a section"""
+    submitted = envs['WorkflowsToSubmit']
+    campaigns = [('HLT', str(*campID['HLT'])), ('Prompt', str(*campID['PR'])), ('Express', str(*campID['EXPR']))]
+    yield 'header', 'header', {'week': envs['Week'].strip('Week').strip(), 'title': envs['Title'],
+                               'subject': envs['emailSubject']}
+    for wf, campaign in campaigns:
+        if not wf in submitted.split('/'): continue
+        yield 'campaign_' + wf, 'campaign', {'wf': wf, 'dmytro': DMYTRO, 'campaign': campaign}
+    yield 'links', 'links', {'jira': envs['Jira'], 'request': envs['ValidationRequest'], 'dataset': envs['Dataset']}
+    runs = envs.get('LumiMask') or dict((run, 'all') for run in run_numbers(envs))
+    for run in sorted(runs, key=int):
+        LS = runs[run]
+        yield 'run_%s' % run, 'run', {'run': run, 'lumis': LS, 'date': envs['start_date'], 'b_field': envs['b_field']}
+    yield 'release', 'release', {'hlt_key': envs['hlt_key'], 'release': envs['HLT_release']}
+
+    c1 = '\n| *Conditions Type* |'; c2 = '\n| Target |'; c3 = '\n| Reference |'; c4 = '\n| Common |'; c5 = '\n| |'
+    for wf, campaign in campaigns:
+        if not wf in submitted: continue
+        c1 += ' *%s* |' % wf
+        c2 += ' [[{0}{1}][{1}]] |'.format(CONDDB, envs['TargetGT_%s' % wf])
+        c3 += ' [[{0}{1}][{1}]] |'.format(CONDDB, envs['ReferenceGT_%s' % wf])
+        c4 += ' [[{0}{1}][{1}]] |'.format(CONDDB, envs['TargetGT_Prompt']) if wf == 'HLT' else ' |'
+        c5 += ' [[{0}][{1}]] |'.format('%s/%s/%s' % (GTDIFF, envs['TargetGT_%s' % wf], envs['ReferenceGT_%s' % wf]),
+                                       'Target vs Reference')
+    yield 'gt_table', 'gt_table', {'c1': c1, 'c2': c2, 'c3': c3, 'c4': c4 if 'HLT' in submitted else '', 'c5': c5}
+
+    yield 'wf_header', 'wf_header', {}
+    count = 1; pd_sect = len(submitted.split('/')) * 2
+    for dataset in envs['Dataset'].split(','):
+        dname = dataset.split('/')[1].strip()
+        for condition, ckey in CONDITIONS:
+            if not condition in submitted: continue
+            for Type in ('New Conditions', 'Reference Conditions'):
+                wtype = ckey + '_' + Type.replace(' ', '').lower()[:5] + '_' + dname
+                yield 'wf_%s' % wtype, 'wf_row', {
+                    'index': count,
+                    'pd': '[[{0}{1}+{2}][{1}]]'.format(DASLINK, dataset, das_runs(envs)) if count % pd_sect == 1 else '^',
+                    'condition': condition,
+                    'type': Type,
+                    'workflow': '[[{0}{1}][{1}]]'.format(REQMGR, wf_names[wtype]),
+                    'dqm': gui_links(dqm[wtype], 'DQM'),
+                    'overlay': gui_links(dqm[condition + '_' + dname], 'Overlay plots') if count % 2 == 1 else '^'}
+                count += 1
+    yield 'footer', 'footer', {}
+
+
+class SectionRenderer():
+
+    def render(self, campID, wf_names, envs, dqm):
+        """Returns the TWiki section of a validation week"""
+        return ''.join(TEMPLATES[name].substitute(values) for _, name, values in section_rows(campID, wf_names, envs, dqm))
+
+    def render_submission(self, submission):
+        workflows = submission.workflows
+        return self.render(campaign_ids(workflows), workflow_names(workflows), submission.envs,
+                           dqm_links(submission.envs, workflows))
+
+    def render_many(self, submissions):
+        """Sections of many weeks, e.g. to rebuild the historical ones"""
+        return [self.render_submission(s) for s in submissions]
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+    parser = ArgumentParser(description='Render the TWiki sections of validation weeks')
+    parser.add_argument('pairs', nargs='*', default=['envs.json:workflow_config.json'],
+                        help='envs.json:workflow_config.json pairs, one per week')
+    options = parser.parse_args()
+    submissions = [load_submission(*pair.split(':')) for pair in options.pairs]
+    for section in SectionRenderer().render_many(submissions):
+        print(section)
@@ -0,0 +1,128 @@
+"""
+Module with the loader of the validation templates (Validations/*)
+
+A template is a list of 'Key : value' lines, lines starting with '#' and
+empty lines are ignored. The loader finds the most recently committed
+template with a single 'git log' pass, parses and validates it and adds the
+typed values (labels, lumi mask, releases and GTs) to the raw fields.
+"""
+import os
+import ast
+import glob
+import subprocess
+
+WORKFLOWS = ('HLT', 'Prompt', 'Express')
+RELEASE_KEYS = {'HLT': 'HLT_release', 'Prompt': 'PR_release', 'Express': 'Expr_release'}
+REQUIRED = ('ValidationRequest', 'Title', 'Subsystem', 'Labels', 'Dataset', 'Run',
+            'WorkflowsToSubmit', 'HLT_release', 'PR_release', 'Expr_release')
+
+
+def commit_times(directory='Validations'):
+    """Returns {path: last commit time} for the files of a directory,
+    using one 'git log' for the whole directory"""
+    output = subprocess.run(['git', 'log', '--relative', '--name-only', '--pretty=format:@%ct', '--', directory],
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True).stdout
+    times = dict()
+    current = None
+    for line in output.splitlines():
+        line = line.strip()
+        if line.startswith('@'):
+            current = int(line[1:])
+        elif line and current is not None:
+            # the log is ordered from the newest commit, keep the first time seen
+            times.setdefault(os.path.normpath(line), current)
+    return times
+
+
+def latest_template(directory='Validations'):
+    """Path of the most recently edited template. Files that are not
+    committed yet are dated by their modification time"""
+    files = [os.path.normpath(f) for f in glob.glob(os.path.join(directory, '*')) if os.path.isfile(f)]
+    if not files:
+        raise RuntimeError('No validation template found in %s' % directory)
+    times = commit_times(directory)
+    dated = [(times.get(f, os.path.getmtime(f)), f) for f in files]
+    return max(dated)[1]
+
+
+def parse_template(lines, path='<template>'):
+    """Returns the raw 'Key : value' fields of a template as strings"""
+    fields = dict()
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if ':' not in line:
+            raise ValueError('%s:%d: expected "Key : value", got "%s"' % (path, number, line))
+        key, value = line.split(':', 1)
+        fields[key.strip()] = value.strip()
+    return fields
+
+
+def parse_runs(run):
+    """Returns the sorted run numbers and the lumi mask ({run: [[first, last], ...]},
+    None for full runs) of the 'Run' field: a run number, comma separated run
+    numbers or {run: [[first, last], ...], ...}"""
+    try:
+        value = ast.literal_eval(run)
+    except (ValueError, SyntaxError):
+        raise ValueError('Run must be run numbers or {"run": [[first, last]], ...}, got "%s"' % run)
+    if isinstance(value, dict):
+        if not value:
+            raise ValueError('No run in "%s"' % run)
+        mask = dict()
+        for run_number, ranges in value.items():
+            if not ranges or not all(len(r) == 2 and int(r[0]) <= int(r[1]) for r in ranges):
+                raise ValueError('Invalid lumisection ranges in "%s"' % run)
+            mask[str(int(run_number))] = [[int(f), int(l)] for f, l in ranges]
+        return sorted(mask, key=int), mask
+    runs = [str(int(r)) for r in (value if isinstance(value, (tuple, list)) else [value])]
+    if len(set(runs)) != len(runs):
+        raise ValueError('Repeated run numbers in "%s"' % run)
+    return sorted(runs, key=int), None
+
+
+def parse_run(run):
+    """Returns the first run number, its lumi selection string and the lumi mask
+    ({run: [[first, last], ...]}, None for full runs) of the 'Run' field"""
+    runs, mask = parse_runs(run)
+    return runs[0], str(mask[runs[0]]) if mask else '', mask
+
+
+def validate(fields, path='<template>'):
+    """Raise ValueError if a mandatory field is missing or malformed"""
+    missing = [k for k in REQUIRED if k not in fields]
+    workflows = fields.get('WorkflowsToSubmit', '').split('/')
+    unknown = [wf for wf in workflows if wf not in WORKFLOWS]
+    if unknown:
+        raise ValueError('%s: unknown workflows %s in WorkflowsToSubmit' % (path, unknown))
+    for wf in workflows:
+        missing += [k for k in ('TargetGT_' + wf, 'ReferenceGT_' + wf) if fields.get(k, 'None') == 'None']
+    if 'HLT' in workflows and fields.get('TargetGT_Prompt', 'None') == 'None':
+        missing.append('TargetGT_Prompt')
+    if missing:
+        raise ValueError('%s: missing fields %s' % (path, ', '.join(sorted(set(missing)))))
+    for dataset in fields['Dataset'].split(','):
+        if len(dataset.strip().split('/')) != 4:
+            raise ValueError('%s: invalid dataset name "%s"' % (path, dataset))
+    labels = [v.strip() for v in fields['Labels'].split(',')]
+    if not [v for v in labels if 'Week' in v] or not [v for v in labels if '202' in v]:
+        raise ValueError('%s: Labels must contain the week and the year, got "%s"' % (path, fields['Labels']))
+
+
+def load_template(path):
+    """Returns the arguments of a template: the raw fields plus
+    Labels, run_number, run_numbers, LumiSec, LumiMask, Week, Year, Label, Releases and GTs"""
+    with open(path) as f:
+        args = parse_template(f, path)
+    validate(args, path)
+    args['Labels'] = [v.strip() for v in args['Labels'].split(',')]
+    args['run_number'], args['LumiSec'], args['LumiMask'] = parse_run(args['Run'])
+    args['run_numbers'] = parse_runs(args['Run'])[0]
+    args['Week'] = [v for v in args['Labels'] if 'Week' in v][0]
+    args['Year'] = [v for v in args['Labels'] if '202' in v][0]
+    args['Label'] = "_".join(args['Labels'])
+    args['Releases'] = dict((wf, args[key]) for wf, key in RELEASE_KEYS.items())
+    args['GTs'] = dict((wf, {'target': args.get('TargetGT_' + wf), 'reference': args.get('ReferenceGT_' + wf)})
+                       for wf in WORKFLOWS)
+    return args
@@ -11,6 +11,10 @@ try:
     import httplib
 except ImportError:
     import http.client as httplib
+try:
+    from urllib import urlencode
+except ImportError:
+    from urllib.parse import urlencode
 
 import imp
 import sys
@@ -19,6 +23,7 @@ import json
 # Lightweight helpers for upload to ReqMgr2
 from modules.tweak_maker_lite import TweakMakerLite
 from modules.config_cache_lite import ConfigCacheLite
+from modules import credentials
 print('Using TweakMakerLite and ConfigCacheLite!')
 
 
@@ -31,6 +36,11 @@ WMAGENT_URL = 'cmsweb.cern.ch'
 DBS3_URL = "/dbs/prod/global/DBSReader/"
 
 
+class NotSentError(Exception):
+    """The request could not be sent at all, it can safely be sent again"""
+    pass
+
+
 class ConnectionWrapper():
     """
     Wrapper class to re-use existing connection to DBS3Reader
@@ -93,9 +103,7 @@ def testbed(to_url):
 
 
 def init_connection(url):
-    return httplib.HTTPSConnection(url, port=443,
-            cert_file=os.getenv('X509_USER_PROXY'),
-            key_file=os.getenv('X509_USER_PROXY'))
+    return credentials.https_connection(url)
 
 def httpget(conn, query):
     conn.request("GET", query.replace('#', '%23'))
@@ -148,8 +156,7 @@ def approveRequest(url, workflow, encodeDict=False):
     headers = {"Content-type": "application/json",
             "Accept": "application/json"}
 
-    conn = httplib.HTTPSConnection(url, cert_file=os.getenv('X509_USER_PROXY'),
-            key_file=os.getenv('X509_USER_PROXY'))
+    conn = credentials.https_connection(url)
 
     conn.request("PUT", "/reqmgr2/data/request/%s" % workflow, json.dumps(params), headers)
     response = conn.getresponse()
@@ -173,8 +180,7 @@ def approveRequest(url, workflow, encodeDict=False):
 def getWorkflowStatus(url, workflow):
     headers = {"Content-type": "application/json",
             "Accept": "application/json"}
-    conn = httplib.HTTPSConnection(url, cert_file=os.getenv('X509_USER_PROXY'),
-            key_file=os.getenv('X509_USER_PROXY'))
+    conn = credentials.https_connection(url)
     conn.request("GET", "/reqmgr2/data/request/%s" % workflow, {}, headers)
     response = conn.getresponse().read()
     workflow_status = ''
@@ -188,6 +194,35 @@ def getWorkflowStatus(url, workflow):
 
 #-------------------------------------------------------------------------------
 
+def getWorkflowsStatus(url, workflows, batch=50):
+    """
+    Status of many workflows, {workflow: status}, with a single connection
+    and one query per batch of workflows. Missing workflows are not returned.
+    """
+    headers = {"Content-type": "application/json",
+            "Accept": "application/json"}
+    workflows = list(workflows)
+    statuses = dict()
+    conn = init_connection(url)
+    try:
+        for first in range(0, len(workflows), batch):
+            query = urlencode([('mask', 'RequestStatus')] + [('name', w) for w in workflows[first:first + batch]])
+            conn.request("GET", "/reqmgr2/data/request?%s" % query, headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+            if response.status != 200:
+                print('Could not get the status of %d workflows: %s %s' % (
+                        len(workflows[first:first + batch]), response.status, response.reason))
+                continue
+            for result in json.loads(data)['result']:
+                for workflow, info in result.items():
+                    statuses[workflow] = info['RequestStatus'] if isinstance(info, dict) else info
+    finally:
+        conn.close()
+    return statuses
+
+#-------------------------------------------------------------------------------
+
 def __loadConfig(configPath):
     """
     _loadConfig_
@@ -213,8 +248,11 @@ def makeRequest(url, params, encodeDict=False):
     headers = {"Content-type": "application/json",
             "Accept": "application/json"}
 
-    conn = httplib.HTTPSConnection(url, cert_file=os.getenv('X509_USER_PROXY'),
-            key_file=os.getenv('X509_USER_PROXY'))
+    conn = credentials.https_connection(url)
+    try:
+        conn.connect()
+    except (IOError, OSError, httplib.HTTPException) as e:
+        raise NotSentError("Could not connect to %s: %s" % (url, e))
 
     ##TO-DO do we move it to top of file?
     __service_url  = "/reqmgr2/data/request"
@@ -3,10 +3,13 @@
 # Author : Pritam Kalbhor (physics.pritam@gmail.com)
 #
 
-import glob, os, sys, json, ast
-import runregistry, subprocess
+import os, sys, json, ast
 from datetime import datetime
-from collections import namedtuple
+from modules.validation_template import latest_template, load_template
+from modules.run_cache import RunCache
+
+# OMS report of one run, one link per run of the validation
+OMS_RUN = 'https://cmsoms.cern.ch/cms/runs/report?cms_run=%s&cms_run_sequence=GLOBAL-RUN'
 
 from argparse import ArgumentParser
 from getpass import getpass, getuser
@@ -20,68 +23,32 @@ parsedArgs = parser.parse_known_args()[0]
 
 def GetNumberOfEvents(DataSet, RunNumber, LumiSec=''):
     """Returns number of events for given Dataset, RunNumber"""
-    if not os.popen('voms-proxy-info -path').read().strip():
-        os.system('voms-proxy-init --rfc --voms cms')
-    os.environ["X509_USER_PROXY"] = os.popen('voms-proxy-info -path').read().strip()
-    if LumiSec == '':
-        query=DataSet+'&run_num='+RunNumber
-    else:
-        query=DataSet+'&run_num='+RunNumber+'&lumi_list='+LumiSec
-    from modules import wma
-    dbs = wma.ConnectionWrapper()
-    output = dbs.api('files', 'dataset', query, detail=True)
-    nEvent = 0
-    for nFile in output: nEvent += nFile['event_count']
-    return int(nEvent)
+    from modules.event_counts import get_event_counts
+    return get_event_counts([DataSet], RunNumber, LumiSec)[DataSet.strip()]
 
 def get_input():
 	"""Retrieve most recently edited input template. 
 	   Commit time will be recorded.
 	   Avoid commiting more than one templates"""
-	files = glob.glob("Validations/*")
-
-	File = namedtuple("File", ["path", "time"])
-	commit_dates = list()
-	for f in files:
-		raw_time = subprocess.getoutput("git log -n 1 --pretty=format:%cd {}".format(f))
-		if raw_time == '':
-			Time = datetime.fromtimestamp(os.path.getmtime(f)).strftime('%Y-%m-%d %H:%M:%S')
-		else:
-			Time = datetime.strptime(raw_time, '%a %b %d %H:%M:%S %Y %z').strftime('%Y-%m-%d %H:%M:%S')
-		pair = File(path=f, time=Time)
-		commit_dates.append(pair)
-	commit_dates.sort(key=lambda file: file.time)
-	return commit_dates[-1].path
+	return latest_template("Validations")
 
 def get_run(run_number):
-	"""Returns run configuration in json format. Input param: run number"""
-	# import urllib3; urllib3.disable_warnings()
-	run = runregistry.get_run(run_number=int(run_number))
-	return run
+	"""Returns the cached run attributes. Input param: run number"""
+	return RunCache().get_run(run_number)
 
 def get_arguments():
 	"""Returns input arguments after processing input template in dictionary format"""
-	print(">> We will be processing lastly edited template: ", get_input())
-	file="_NewValidation.txt"
+	template = get_input()
+	print(">> We will be processing lastly edited template: ", template)
+	return load_template(template)
 
-	# Ignore lines starting with hash #. Delete empty lines
-	os.system("""sed '/^#.*$/d' "%s" > %s""" %(get_input(), file))
-	os.system("""sed -i '/^[[:space:]]*$/d' %s""" %(file))
-	
-	iFile = open(file, 'r')
-	args = dict()
-	for line in iFile:
-		args[line.split(':')[0].strip()] = ":".join(line.split(':')[1:]).strip()
-	args['Labels'] = [v.strip() for v in args['Labels'].split(',')]
-	args['run_number'] = args['Run'].split(":")[0].strip("{").strip("'")
-	args['LumiSec'] = args['Run'].split(":")[1].strip("}").strip() if ':' in args['Run'] else ''
-	week = [v for v in args['Labels'] if 'Week' in v]
-	year = [v for v in args['Labels'] if '202' in v]
-	args['Week']  = "{}".format(week[0])
-	args['Year']  = "{}".format(year[0])
-	args['Label'] = "{}".format("_".join(args['Labels']))
-	iFile.close()
-	return args
+def run_option(args):
+	"""Run selection of the condDatasetSubmitter options: runLs with the lumi mask
+	   of all the runs, otherwise run with one run number or the list of them"""
+	if args['LumiMask']:
+		return {'runLs': args['LumiMask']}
+	runs = [int(r) for r in args['run_numbers']]
+	return {'run': runs[0] if len(runs) == 1 else runs}
 
 def build_HLT_workflow(args):
 	hlt_dict = dict()
@@ -99,8 +66,10 @@ def build_HLT_workflow(args):
 	options['basegt']		 = args['TargetGT_Prompt']
 	options['gt']			 = args['ReferenceGT_HLT']
 	options['newgt']		 = args['TargetGT_HLT']
-	options['runLs' if ':' in args['Run'] else 'run'] = ast.literal_eval(args['Run'])
+	options.update(run_option(args))
 	options['jira']		 	 = args['Jira']
+	options['planInput']	 = ""
+	options['prefetch']		 = ""
 	return hlt_dict
 
 def build_Express_workflow(args):
@@ -113,9 +82,11 @@ def build_Express_workflow(args):
 	options['ds']			 = args['Dataset']
 	options['gt']			 = args['ReferenceGT_Express']
 	options['newgt']		 = args['TargetGT_Express']
-	options['runLs' if ':' in args['Run'] else 'run'] = ast.literal_eval(args['Run'])
+	options.update(run_option(args))
 	options['jira']		 	 = args['Jira']
 	options['two_WFs']		 = ""
+	options['planInput']	 = ""
+	options['prefetch']		 = ""
 	return express_dict
 
 def build_Prompt_workflow(args):
@@ -128,9 +99,11 @@ def build_Prompt_workflow(args):
 	options['ds']			 = args['Dataset']
 	options['gt']			 = args['ReferenceGT_Prompt']
 	options['newgt']		 = args['TargetGT_Prompt']
-	options['runLs' if ':' in args['Run'] else 'run'] = ast.literal_eval(args['Run'])
+	options.update(run_option(args))
 	options['jira']		 	 = str(args['Jira'])
 	options['two_WFs']		 = ""
+	options['planInput']	 = ""
+	options['prefetch']		 = ""
 	return prompt_dict
 
 def compose_email(args):
@@ -149,7 +122,7 @@ def compose_email(args):
 We are going to perform full track validation of {title_text}.
 Request email for this validation is [0].
 Details of the workflow: {GTList}
-- Run: {run_number} recorded on {start_date} with magnetic field {b_field}T [1]
+- Run: {run_list} recorded on {start_date} with magnetic field {b_field}T [1]
 - HLT Menu: {hlt_key}
 - CMSSW version: {HLT_release} for {WorkflowsToSubmit} {datasetList}
 
@@ -161,11 +134,12 @@ Best regards,
 Pritam, Amandeep, Tamas, Francesco, Helena (for AlCa/DB)
 
 [0] {ValidationRequest}
-[1] https://cmsoms.cern.ch/cms/runs/report?cms_run={run_number}&cms_run_sequence=GLOBAL-RUN
+[1] {oms_links}
 [2] %s
 [3] https://twiki.cern.ch/twiki/bin/view/CMS/PdmVTriggerConditionValidation2021
 [4] https://its.cern.ch/jira/browse/CMSALCA-{Jira}
-""".format(title_text=title_text, GTList=GTList, datasetList=datasetList, **args)
+""".format(title_text=title_text, GTList=GTList, datasetList=datasetList, run_list=', '.join(args['run_numbers']),
+	           oms_links='\n    '.join(OMS_RUN %run for run in args['run_numbers']), **args)
 	args['emailSubject'] = emailSubject
 	args['emailBody'] = emailBody
 	return args
@@ -191,26 +165,45 @@ def check_requirements():
 		if not pkg in packages:
 			os.system("pip3 install {} --user".format(pkg))
 
+def check_runs(args, first):
+	"""The other runs are processed with the scenario and the menu of the first one"""
+	others = [r for r in args['run_numbers'] if r != args['run_number']]
+	if not others: return
+	for number, run in RunCache().get_runs(others).items():
+		if round(run['b_field']) != round(first['b_field']) or run['class'] != first['class']:
+			raise ValueError("Run %s (%sT, %s) and run %s (%sT, %s) cannot be validated together" %(number,
+				run['b_field'], run['class'], args['run_number'], first['b_field'], first['class']))
+		for key in ('hlt_key', 'cmssw_version'):
+			if run[key] != first[key]:
+				print(">> Run %s has %s %s, the one of run %s (%s) is used" %(number, key, run[key], args['run_number'], first[key]))
+
 def extract_keys(args):
 	"""Extract keys from run-registry"""
 	def get_date(raw_time):
 		return datetime.strptime(raw_time, '%Y-%m-%dT%H:%M:%SZ').strftime('%b-%d %Y')
+	if all(args.get(k, 'None') != 'None' for k in ('b_field', 'class', 'hlt_key')):
+		# template fallback values, used only if run-registry is down
+		for run_number in args['run_numbers']:
+			RunCache().seed(run_number, args['b_field'], args['class'], args['hlt_key'],
+				cmssw_version=args['HLT_release'] if 'CMSSW' in args['HLT_release'] else None)
 	run = get_run(args['run_number'])
-	oms = run['oms_attributes']
-	args['cmssw_version'] = oms['cmssw_version']
-	args['b_field']     = float(oms['b_field'])
-	args['start_time']  = oms['start_time']
-	args['start_date']  = get_date(oms['start_time'])
+	check_runs(args, run)
+	if run['cmssw_version'] is None and not all('CMSSW' in args[r] for r in ('HLT_release', 'PR_release', 'Expr_release')):
+		raise ValueError("CMSSW version of run %s is unknown. Put HLT_release, PR_release and Expr_release in the template" %args['run_number'])
+	args['cmssw_version'] = run['cmssw_version']
+	args['b_field']     = float(run['b_field'])
+	args['start_time']  = run['start_time']
+	args['start_date']  = get_date(run['start_time']) if run['start_time'] else 'unknown date'
 	args['class']		= run['class']
-	if not 'CMSSW' in args['HLT_release'] : args['HLT_release'] = oms['cmssw_version']
-	if not 'CMSSW' in args['PR_release']  : args['PR_release']  = oms['cmssw_version']
-	if not 'CMSSW' in args['Expr_release']: args['Expr_release']  = oms['cmssw_version']
-	if args['HLT_release'] != oms['cmssw_version']: 
+	if not 'CMSSW' in args['HLT_release'] : args['HLT_release'] = run['cmssw_version']
+	if not 'CMSSW' in args['PR_release']  : args['PR_release']  = run['cmssw_version']
+	if not 'CMSSW' in args['Expr_release']: args['Expr_release']  = run['cmssw_version']
+	if args['HLT_release'] != run['cmssw_version']: 
 		args['HLT_Type'] = "GRun"
 		args['hlt_key']  = "the GRun menu for %s" %args['HLT_release']
 	else:
 		args['HLT_Type'] = "Custom"
-		args['hlt_key']  = oms['hlt_key']
+		args['hlt_key']  = run['hlt_key']
 	return args
 
 def get_user():
@@ -225,9 +218,14 @@ if __name__ == '__main__':
 	get_user()					# set user and password for Jira
 	args = get_arguments()
 	args = extract_keys(args)
-	for dataset in args['Dataset'].split(','):
-		nEvents = GetNumberOfEvents(dataset.strip(), args['run_number'], LumiSec=args['LumiSec'].replace(' ', ''))
-		print('Dataset', dataset, 'has', nEvents, 'Events', 'for run', args['run_number'], 'and LumiSection', args['LumiSec'])
+	from modules.event_counts import get_selection_event_counts
+	datasets = [d.strip() for d in args['Dataset'].split(',') if d.strip()]
+	mask = args['LumiMask'] or {}
+	runs = dict((r, str(mask[r]).replace(' ', '') if r in mask else '') for r in args['run_numbers'])
+	counts = get_selection_event_counts(datasets, runs)
+	for dataset in datasets:
+		nEvents = counts[dataset]
+		print('Dataset', dataset, 'has', nEvents, 'Events', 'for runs', args['Run'])
 		args.update({'nEvents_'+dataset.split('/')[1]: nEvents})
 	try:
 		api = JiraAPI(args, parsedArgs.user, parsedArgs.password)
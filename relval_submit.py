@@ -20,6 +20,8 @@ import json
 import errno
 import ast
 from modules import wma
+from modules import perf_report
+from modules import credentials
 
 def execme(command, dryrun=False):
     '''Wrapper for executing commands.
@@ -97,6 +99,99 @@ def checkStat(DataSet, nEvents):
       checkStat_out = 'LOW_STAT'
   return checkStat_out
 
+def localTestConfigs(metadata, label):
+    '''cmsRun configurations of the local test of one set of conditions.
+    '''
+    cfgs = ['NEWCONDITIONS0.py' if label == 'newco' else 'REFERENCE.py',
+            'step4_%s_HARVESTING.py' % (label)]
+    if metadata['options']['Type'] in ['EXPR+RECO', 'HLT+RECO']:
+        cfgs.append('recodqm_%s.py' % (label))
+    return cfgs
+
+def metadataRuns(metadata):
+    '''Runs of the validation, from the run (number or list) or runLs option.
+    '''
+    options = metadata['options']
+    runs = options['runLs'] if 'runLs' in options else options.get('run', [])
+    if not isinstance(runs, (list, tuple, dict)):
+        runs = [runs]
+    return sorted(str(run) for run in runs)
+
+def dqmOutput(metadata, label, run=None):
+    '''Name of the DQM output of a local test, one per run when there are several runs.
+    '''
+    wtype = metadata['options']['Type'].split('+')[0]
+    if run is None:
+        return '%s_%s_DQMoutput.root' % (wtype, label)
+    return '%s_%s_R%s_DQMoutput.root' % (wtype, label, run)
+
+def localTestCommands(metadata, label, top=None, threads=None, perf=False):
+    '''Commands running the local test of one set of conditions.
+    label is 'newco' or 'refer', top is the directory holding the releases
+    when the test does not run in the current directory. With perf, the
+    steps run with the performance services and leave their logs and job
+    reports in the perf directory. The data harvesting saves one DQM file
+    per run, with several runs each of them becomes <TYPE>_<label>_R<run>_DQMoutput.root.
+    '''
+    def at(name):
+        return '%s/%s' % (top, name) if top else name
+
+    def run(cmsrun, cfg):
+        return perf_report.perf_command(cmsrun, cfg, label, at(perf_report.PERF_DIR)) if perf else cmsrun + cfg
+
+    wtype = metadata['options']['Type']
+    cfgname = 'NEWCONDITIONS0.py' if label == 'newco' else 'REFERENCE.py'
+    cmsrun = 'cmsRun --numThreads %d ' % (threads) if threads else 'cmsRun '
+    commands = []
+    if perf:
+        commands.append('mkdir -p %s' % at(perf_report.PERF_DIR))
+    if wtype in ['EXPR+RECO', 'HLT+RECO']:
+        switch = metadata['PR_release'] != metadata['HLT_release']
+        if switch:
+            commands.append("cd %s; eval `scramv1 runtime -sh`; cd -" % at(metadata['HLT_release']))
+        commands.append(run(cmsrun, cfgname))
+        if switch:
+            commands.append("cd %s; eval `scramv1 runtime -sh`; cd -" % at(metadata['PR_release']))
+        commands.append(run(cmsrun, 'recodqm_%s.py' % (label)))
+    else:
+        commands.append(run(cmsrun, cfgname))
+    commands.append(run('cmsRun ', 'step4_%s_HARVESTING.py' % (label)))
+    if len(metadataRuns(metadata)) > 1:
+        # DQM_V0001_R000346512__Global__CMSSW_12_0_3__RECO.root, only the runs read by the test
+        commands.append("for dqm in DQM*_R*.root; do run=$(echo $dqm | sed 's/.*_R0*\\([0-9][0-9]*\\)__.*/\\1/'); "
+                        "mv $dqm %s; done" % at(dqmOutput(metadata, label, '${run}')))
+    else:
+        commands.append('mv DQM*.root %s' % at(dqmOutput(metadata, label)))
+    return commands
+
+def releasePrefetched(metadata, commands):
+    '''With --prefetch, the inputs stay pinned in the shared cache while the local
+    tests read them: the commands are grouped and followed by the release of the
+    pins, which runs even if the tests fail.
+    '''
+    if not commands or 'prefetch' not in metadata['options']:
+        return commands
+    return ['{ %s; rc=$?; python3 -m modules.prefetch --release step1_files.txt; [ $rc -eq 0 ]; }' % (
+            ' && '.join(commands))]
+
+def concurrentLocalTests(metadata, threads=None, perf=False):
+    '''Single command running the new and reference local tests at the same time.
+    Each chain runs in its own directory, sharing the configs and the step1 input,
+    with at most 'threads' threads per cmsRun.
+    '''
+    if not threads:
+        threads = max(1, (os.cpu_count() or 2) // 2)
+    chains = []
+    for label in ('newco', 'refer'):
+        cfgs = localTestConfigs(metadata, label)
+        if perf:
+            cfgs += [perf_report.perf_config(cfg) for cfg in cfgs]
+        chain = ' && '.join(['cd %s' % (label)] + localTestCommands(metadata, label, '..', threads, perf))
+        chains.append('rm -rf {0} && mkdir {0} && cp {1} step1_*.txt {0}/ && ({2}) > {0}.log 2>&1'.format(
+            label, ' '.join(cfgs), chain))
+    return ('{ %s & newpid=$!; %s & refpid=$!; wait $newpid; newrc=$?; wait $refpid; refrc=$?; '
+            'tail -n 50 newco.log refer.log; [ $newrc -eq 0 ] && [ $refrc -eq 0 ]; }') % tuple(chains)
+
 def main():
     '''Entry point.
     '''
@@ -112,6 +207,11 @@ def main():
     workflowGroup = parser.add_mutually_exclusive_group()
     workflowGroup.add_argument('--new', help='Perform a local test on new conditions (Default: False)', action='store_true')
     workflowGroup.add_argument('--refer', help='Perform a local test on reference conditions (Default: False)', action='store_true')
+    workflowGroup.add_argument('--both', help='Perform the local tests on new and reference conditions concurrently (Default: False)', action='store_true')
+    parser.add_argument('--threads', type=int, default=None,
+                  help='Threads per cmsRun with --both (Default: half of the cores for each chain)')
+    parser.add_argument('--perf', action='store_true', default=False,
+                  help='Run the local tests with TimeReport, SimpleMemoryCheck and job reports, and compare their performance (Default: False)')
     arguments = parser.parse_args()
     
     try:
@@ -186,7 +286,7 @@ I will ask you some questions to fill the metadata file. For some of the questio
                 Lumisec_forcheck = ''
 
                 os.system("export SCRAM_ARCH=slc7_amd64_gcc900") 
-                os.environ["X509_USER_PROXY"] = os.popen('voms-proxy-info -path').read().strip()
+                credentials.ensure_proxy()
                 execme("source /cvmfs/cms.cern.ch/common/crab-setup.sh")
                 # do some type recognition and set run or runLs accordingly
                 try:
@@ -393,55 +493,28 @@ I will ask you some questions to fill the metadata file. For some of the questio
         else:
             commands.append('chmod +x cmsDrivers.sh')
             commands.append('./cmsDrivers.sh')
-            if metadata['options']['Type']=='EXPR+RECO' or metadata['options']['Type']=='HLT+RECO':
-                commands.append('cp cmsDrivers.sh cmsDrivers_{}.sh'.format(metadata['options']['Type'].split('+')[0]))
-                if arguments.new:
-                    if metadata['PR_release'] != metadata['HLT_release']:
-                        commands.append("cd %s; eval `scramv1 runtime -sh`; cd -" % metadata['HLT_release'])
-                        commands.append('cmsRun NEWCONDITIONS0.py')
-                        commands.append("cd %s; eval `scramv1 runtime -sh`; cd -" % metadata['PR_release'])
-                        commands.append('cmsRun recodqm_newco.py')
-                        commands.append('cmsRun step4_newco_HARVESTING.py')
-                    else:
-                        commands.append('cmsRun NEWCONDITIONS0.py')
-                        commands.append('cmsRun recodqm_newco.py')
-                        commands.append('cmsRun step4_newco_HARVESTING.py')
-                    commands.append('mv DQM*.root {}_newco_DQMoutput.root'.format(metadata['options']['Type'].split('+')[0]))
-                elif arguments.refer:
-                    commands.append('rm -f step*.root')
-                    if metadata['PR_release'] != metadata['HLT_release']:
-                        commands.append("cd %s; eval `scramv1 runtime -sh`; cd -" % metadata['HLT_release'])
-                        commands.append('cmsRun REFERENCE.py')
-                        commands.append("cd %s; eval `scramv1 runtime -sh`; cd -" % metadata['PR_release'])
-                        commands.append('cmsRun recodqm_refer.py')
-                        commands.append('cmsRun step4_refer_HARVESTING.py')
-                    else:
-                        commands.append('cmsRun REFERENCE.py')
-                        commands.append('cmsRun recodqm_refer.py')
-                        commands.append('cmsRun step4_refer_HARVESTING.py')
-                    commands.append('mv DQM*.root {}_refer_DQMoutput.root'.format(metadata['options']['Type'].split('+')[0]))
-            elif metadata['options']['Type'] == 'EXPR':
-                commands.append('cp cmsDrivers.sh cmsDrivers_EXPR.sh')
-                if arguments.new:
-                    commands.append('cmsRun NEWCONDITIONS0.py')
-                    commands.append('cmsRun step4_newco_HARVESTING.py')
-                    commands.append('mv DQM*.root EXPR_newco_DQMoutput.root')
-                elif arguments.refer:
-                    commands.append('rm -f step*.root')
-                    commands.append('cmsRun REFERENCE.py')
-                    commands.append('cmsRun step4_refer_HARVESTING.py')
-                    commands.append('mv DQM*.root EXPR_refer_DQMoutput.root')
-            elif metadata['options']['Type']=='PR':
-                commands.append('cp cmsDrivers.sh cmsDrivers_PR.sh')
+            wtype = metadata['options']['Type']
+            if wtype in ['EXPR+RECO', 'HLT+RECO', 'EXPR', 'PR']:
+                commands.append('cp cmsDrivers.sh cmsDrivers_{}.sh'.format(wtype.split('+')[0]))
+                if arguments.perf:
+                    for label in ('newco', 'refer'):
+                        for cfg in localTestConfigs(metadata, label):
+                            perf_report.write_perf_config(cfg)
+                localTests = []
                 if arguments.new:
-                    commands.append('cmsRun NEWCONDITIONS0.py')
-                    commands.append('cmsRun step4_newco_HARVESTING.py')
-                    commands.append('mv DQM*.root PR_newco_DQMoutput.root')
+                    localTests.extend(localTestCommands(metadata, 'newco', perf=arguments.perf))
                 elif arguments.refer:
-                    commands.append('rm -f step*.root')
-                    commands.append('cmsRun REFERENCE.py')
-                    commands.append('cmsRun step4_refer_HARVESTING.py')
-                    commands.append('mv DQM*.root PR_refer_DQMoutput.root')
+                    localTests.append('rm -f step*.root')
+                    localTests.extend(localTestCommands(metadata, 'refer', perf=arguments.perf))
+                elif arguments.both:
+                    localTests.append(concurrentLocalTests(metadata, arguments.threads, arguments.perf))
+                commands.extend(releasePrefetched(metadata, localTests))
+                if arguments.perf and (arguments.new or arguments.refer or arguments.both):
+                    commands.append('python3 -m modules.perf_report %s --output %s_perf_report.json' % (
+                            perf_report.PERF_DIR, wtype.split('+')[0]))
+                    # the measurements give TimePerEvent, Memory and SizePerEvent of the next submissions
+                    commands.append('python3 -m modules.resource_estimator record %s --metadata %s' % (
+                            perf_report.PERF_DIR, metadataFilename))
 
         dryrun = True
         # now execute commands
@@ -0,0 +1,80 @@
+import unittest, os, sys, tempfile
+from pathlib import Path
+directory = os.path.abspath(__file__)
+sys.path.append(str(Path(directory).parent.parent))
+
+from modules import wma
+from modules.bulk_submit import BulkSubmitter
+from modules.request_store import RequestStore, APPROVED, FAILED, INJECTED, SUBMITTING
+
+REQUESTS = [{'RequestString': 'AlCa_%d' % i, 'InputDataset': '/ZeroBias/Run2022C-v1/RAW'} for i in range(2)]
+
+
+class FakeReqMgr():
+    """makeRequest and approveRequest failing with the given errors first"""
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.posted = []
+        self.approved = []
+
+    def makeRequest(self, url, params):
+        self.posted.append(params['RequestString'])
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'wf_' + params['RequestString']
+
+    def approveRequest(self, url, workflow):
+        self.approved.append(workflow)
+
+
+class TestBulkSubmitter(unittest.TestCase):
+    def setUp(self):
+        self.journal = RequestStore(os.path.join(tempfile.mkdtemp(), 'journal.jsonl'))
+        self.journal.prepare(REQUESTS)
+        self.original = wma.makeRequest, wma.approveRequest
+
+    def tearDown(self):
+        wma.makeRequest, wma.approveRequest = self.original
+
+    def submit(self, reqmgr, requests=REQUESTS):
+        wma.makeRequest, wma.approveRequest = reqmgr.makeRequest, reqmgr.approveRequest
+        return BulkSubmitter(self.journal, 'cmsweb', workers=1, retries=2, backoff=0).submit(requests)
+
+    def test_retry_not_sent(self):
+        reqmgr = FakeReqMgr([wma.NotSentError('connection refused')])
+        self.assertEqual(self.submit(reqmgr), {'AlCa_0': APPROVED, 'AlCa_1': APPROVED})
+        self.assertEqual(reqmgr.posted, ['AlCa_0', 'AlCa_0', 'AlCa_1'])
+        self.assertEqual(self.journal.load()['AlCa_0']['workflow'], 'wf_AlCa_0')
+
+    def test_not_sent_exhausted(self):
+        reqmgr = FakeReqMgr([wma.NotSentError('no route')] * 2)
+        self.assertEqual(self.submit(reqmgr)['AlCa_0'], FAILED)
+        # nothing was sent, the failed request is posted again
+        reqmgr = FakeReqMgr()
+        self.assertEqual(self.submit(reqmgr), {'AlCa_0': APPROVED, 'AlCa_1': APPROVED})
+        self.assertEqual(reqmgr.posted, ['AlCa_0'])
+
+    def test_sent_not_retried(self):
+        # the connection dropped while reading the response, or a 5xx after the creation
+        reqmgr = FakeReqMgr([ConnectionResetError('reset by peer'), SystemExit(1)])
+        self.assertEqual(self.submit(reqmgr), {'AlCa_0': SUBMITTING, 'AlCa_1': SUBMITTING})
+        self.assertEqual(reqmgr.posted, ['AlCa_0', 'AlCa_1'])
+        self.assertEqual(self.journal.load()['AlCa_0']['status'], SUBMITTING)
+        # a resumed submission does not post them again either
+        reqmgr = FakeReqMgr()
+        self.assertEqual(self.submit(reqmgr), {'AlCa_0': SUBMITTING, 'AlCa_1': SUBMITTING})
+        self.assertEqual(reqmgr.posted, [])
+
+    def test_resume(self):
+        self.journal.append('AlCa_0', 'ZeroBias', status=INJECTED, workflow='wf_AlCa_0')
+        reqmgr = FakeReqMgr()
+        self.assertEqual(self.submit(reqmgr), {'AlCa_0': APPROVED, 'AlCa_1': APPROVED})
+        self.assertEqual(reqmgr.posted, ['AlCa_1'])
+        self.assertEqual(sorted(reqmgr.approved), ['wf_AlCa_0', 'wf_AlCa_1'])
+        reqmgr = FakeReqMgr()
+        self.submit(reqmgr)
+        self.assertEqual((reqmgr.posted, reqmgr.approved), ([], []))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest, os, sys, shutil, subprocess, tempfile, time
+from pathlib import Path
+directory = os.path.abspath(__file__)
+sys.path.append(str(Path(directory).parent.parent))
+
+from modules import credentials
+from modules.credentials import CHECKED, Credentials, certificate_expiry
+
+
+class TestCredentials(unittest.TestCase):
+    def setUp(self):
+        if not shutil.which('openssl'):
+            self.skipTest('openssl is needed to create a test certificate')
+        self.tmp = tempfile.mkdtemp()
+        cert, key = os.path.join(self.tmp, 'cert.pem'), os.path.join(self.tmp, 'key.pem')
+        subprocess.check_call(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '2',
+                               '-subj', '/CN=test', '-keyout', key, '-out', cert], stderr=subprocess.DEVNULL)
+        # a proxy file is the certificate followed by its key
+        self.proxy = os.path.join(self.tmp, 'x509up_test')
+        with open(self.proxy, 'w') as f:
+            f.write(open(cert).read() + open(key).read())
+        self.environ = dict(os.environ)
+        os.environ.pop(CHECKED, None)
+        os.environ['X509_USER_PROXY'] = self.proxy
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.environ)
+        shutil.rmtree(self.tmp)
+
+    def test_expiry(self):
+        remaining = certificate_expiry(self.proxy) - time.time()
+        self.assertTrue(47 * 3600 < remaining <= 48 * 3600)
+        found = Credentials()
+        self.assertEqual(found.cert_file, self.proxy)
+        self.assertFalse(found.warned)
+        found.check()
+        self.assertFalse(found.warned)
+        # the checked proxy is exported to the child processes
+        self.assertEqual(os.environ[CHECKED], '%s:%d' % (self.proxy, found.expiry))
+        soon = Credentials(warn_hours=72)
+        soon.check()
+        self.assertTrue(soon.warned)
+
+    def test_expiry_without_cryptography(self):
+        x509 = credentials.x509
+        credentials.x509 = None
+        try:
+            remaining = certificate_expiry(self.proxy) - time.time()
+        finally:
+            credentials.x509 = x509
+        self.assertTrue(47 * 3600 < remaining <= 48 * 3600)
+
+    def test_exported_check(self):
+        os.environ[CHECKED] = '%s:%d' % (self.proxy, time.time() - 1)
+        found = Credentials()
+        self.assertLess(found.remaining(), 0)
+        self.assertRaises(Exception, found.check)
+
+    def test_shared_context(self):
+        found = Credentials()
+        self.assertIs(found.ssl_context(), found.ssl_context())
+        self.assertIs(credentials.ssl_context(self.proxy), found.ssl_context())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest, os, sys, tempfile
+from pathlib import Path
+directory = os.path.abspath(__file__)
+sys.path.append(str(Path(directory).parent.parent))
+
+from modules.dbs_runs import RunIndex, filter_runs
+
+RUNS = [346508, 346509, 346512, 346515, 346520]
+
+class OfflineIndex(RunIndex):
+    calls = []
+    def fetch(self, dataset):
+        self.calls.append(dataset)
+        return list(RUNS)
+
+class TestRunIndex(unittest.TestCase):
+    def test_filter(self):
+        self.assertEqual(filter_runs(RUNS, 346509, 346515), [346509, 346512, 346515])
+        self.assertEqual(filter_runs(RUNS, maxrun=346510), [346508, 346509])
+        self.assertEqual(filter_runs(RUNS, minrun=346516), [346520])
+        self.assertEqual(filter_runs(RUNS), RUNS)
+
+    def test_one_query_per_dataset(self):
+        index = OfflineIndex(tempfile.mkdtemp())
+        datasets = ['/ZeroBias/Run2021-v1/RAW', '/MinimumBias/Run2021-v1/RAW']
+        index.runs_many(datasets, 346509, 346512)
+        runs = index.runs_many(datasets, maxrun=346509)
+        self.assertEqual(sorted(index.calls), sorted(datasets))
+        self.assertEqual(runs['/ZeroBias/Run2021-v1/RAW'], [346508, 346509])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest, os, sys
+from pathlib import Path
+directory = os.path.abspath(__file__)
+sys.path.append(str(Path(directory).parent.parent))
+
+from modules.input_discovery import covering_files, merge_lumi_ranges, select_lumis
+
+FILE_LUMIS = {
+    '/store/a.root': {1: 10, 2: 10, 3: 10},
+    '/store/b.root': {3: 50, 4: 50},
+    '/store/c.root': {5: 5, 6: 5},
+    '/store/d.root': {4: 1, 5: 1},
+}
+
+class TestInputDiscovery(unittest.TestCase):
+    def test_merge_lumi_ranges(self):
+        self.assertEqual(merge_lumi_ranges([[7, 9], [1, 3], [4, 5], [8, 12]]), [[1, 5], [7, 12]])
+
+    def test_select_lumis(self):
+        self.assertEqual(select_lumis(FILE_LUMIS), FILE_LUMIS)
+        # unsorted and overlapping ranges
+        selected = select_lumis(FILE_LUMIS, [[5, 5], [2, 3], [3, 3]])
+        self.assertEqual(selected, {'/store/a.root': {2: 10, 3: 10}, '/store/b.root': {3: 50},
+                                    '/store/c.root': {5: 5}, '/store/d.root': {5: 1}})
+
+    def test_large_ranges(self):
+        file_lumis = dict(('/store/%d.root' % i, dict((l, 1) for l in range(100 * i + 1, 100 * i + 101)))
+                          for i in range(1000))
+        selected = select_lumis(file_lumis, [[150, 100000000]])
+        self.assertEqual(len(selected), 999)
+        self.assertEqual(min(selected['/store/1.root']), 150)
+
+    def test_covering_files(self):
+        self.assertEqual(covering_files(FILE_LUMIS), ['/store/a.root', '/store/b.root', '/store/c.root'])
+        selected = select_lumis(FILE_LUMIS, [[4, 5]])
+        self.assertEqual(covering_files(selected), ['/store/d.root'])
+        self.assertEqual(covering_files({}), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest, os, sys, json, shutil, tempfile
+from pathlib import Path
+directory = os.path.abspath(__file__)
+sys.path.append(str(Path(directory).parent.parent))
+
+try:
+    import numpy as np
+    from modules.dqm_compare import DQMComparison, compare_batch, compare_profiles, subsystem_folders, write_report
+except ImportError:
+    np = None
+
+
+@unittest.skipIf(np is None, 'numpy and uproot are needed by modules.dqm_compare')
+class TestCompareBatch(unittest.TestCase):
+    def test_metrics(self):
+        new = np.array([[10, 20, 30, 40], [10, 20, 30, 40], [0, 0, 0, 0], [0, 0, 0, 0], [1, 2, 3, 4]])
+        ref = np.array([[10, 20, 30, 40], [40, 30, 20, 10], [0, 0, 0, 0], [5, 5, 0, 0], [2, 4, 6, 8]])
+        result = compare_batch(new, ref)
+        # identical, both empty, and same shape with different normalization
+        for i in (0, 2, 4):
+            self.assertAlmostEqual(result['ks'][i], 0)
+            self.assertAlmostEqual(result['chi2ndf'][i], 0)
+        self.assertAlmostEqual(result['ks'][1], 0.4)
+        self.assertAlmostEqual(result['maxdev'][1], 0.3)
+        self.assertGreater(result['chi2ndf'][1], 10)
+        # one empty histogram
+        self.assertEqual(result['ks'][3], 1)
+        self.assertEqual(result['chi2ndf'][3], np.inf)
+        self.assertEqual(list(result['entries_ref']), [100, 100, 0, 10, 20])
+
+    def test_profiles(self):
+        # the means of the bins, not counts: a different number of entries with the same means is identical
+        new = np.array([[1., 2., 3.], [1., 2., 3.], [1., 2., 0.]])
+        ref = np.array([[1., 2., 3.], [1., 2.2, 3.], [1., 2., 3.]])
+        err = np.full((3, 3), 0.1)
+        new_counts = np.array([[10, 10, 10], [10, 10, 10], [10, 10, 0]])
+        ref_counts = np.array([[40, 40, 40], [10, 10, 10], [10, 10, 10]])
+        result = compare_profiles(new, ref, err, err, new_counts, ref_counts)
+        self.assertEqual(result['maxdev'][0], 0)
+        self.assertEqual(result['pull'][0], 0)
+        self.assertAlmostEqual(result['maxdev'][1], 0.2 / 2.2)
+        self.assertAlmostEqual(result['pull'][1], 0.2 / np.sqrt(0.02))
+        # a bin filled in one file only
+        self.assertEqual(result['maxdev'][2], 1)
+        self.assertEqual(result['pull'][2], np.inf)
+        self.assertEqual(list(result['entries_ref']), [120, 30, 30])
+
+    def test_profiles_not_ranked_with_histograms(self):
+        comparison = DQMComparison('new.root', 'ref.root')
+        records = [{'path': 'A/h', 'class': 'TH1F', 'status': 'compared', 'ks': 0.1, 'chi2ndf': 2., 'maxdev': 0.1},
+                   {'path': 'A/p1', 'class': 'TProfile', 'status': 'compared', 'pull': 1., 'maxdev': 0.5},
+                   {'path': 'A/p2', 'class': 'TProfile', 'status': 'compared', 'pull': 5., 'maxdev': 0.1}]
+        comparison.run = lambda: (records, [], [])
+        report = comparison.report()
+        self.assertEqual([r['path'] for r in report['histograms']], ['A/h'])
+        self.assertEqual([r['path'] for r in report['profiles']], ['A/p2', 'A/p1'])
+
+    def test_report_is_valid_json(self):
+        comparison = DQMComparison('new.root', 'ref.root')
+        records = [{'path': 'A/empty', 'class': 'TH1F', 'status': 'compared', 'ks': 1., 'chi2ndf': float('inf'),
+                    'maxdev': float('nan')},
+                   {'path': 'A/p', 'class': 'TProfile', 'status': 'rebinned', 'pull': float('inf'), 'maxdev': 1.}]
+        comparison.run = lambda: (records, [], [])
+        tmp = tempfile.mkdtemp()
+        try:
+            output = os.path.join(tmp, 'HLT_dqm_comparison')
+            write_report(comparison.report(), output)
+            with open(output + '.json') as f:
+                # strict parsers refuse Infinity and NaN
+                report = json.load(f, parse_constant=lambda c: self.fail('%s in the JSON report' % c))
+        finally:
+            shutil.rmtree(tmp)
+        self.assertIsNone(report['histograms'][0]['chi2ndf'])
+        self.assertIsNone(report['histograms'][0]['maxdev'])
+        self.assertIsNone(report['profiles'][0]['pull'])
+        self.assertEqual(report['profiles'][0]['maxdev'], 1)
+
+    def test_folders(self):
+        folders = ['AlCaReco', 'PixelPhase1', 'SiStrip', 'Tracking']
+        self.assertEqual(subsystem_folders(folders, 'Pixel'), ['PixelPhase1'])
+        self.assertEqual(subsystem_folders(folders, 'Tracker'), ['PixelPhase1', 'SiStrip', 'Tracking'])
+        self.assertEqual(subsystem_folders(folders, 'Beamspot'), folders)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest, os, sys, shutil, tempfile
+from unittest import mock
+from pathlib import Path
+directory = os.path.abspath(__file__)
+sys.path.append(str(Path(directory).parent.parent))
+
+try:
+    import numpy as np
+    import uproot
+    from modules.dqm_plots import OverlayRenderer, image_name
+except ImportError:
+    np = None
+
+
+def write_dqm(path, rebinned_bins):
+    edges = np.linspace(0, 4, 5)
+    with uproot.recreate(path) as f:
+        f['DQMData/Run 1/PixelPhase1/Run summary/same'] = (np.array([1., 2., 3., 4.]), edges)
+        f['DQMData/Run 1/PixelPhase1/Run summary/rebinned'] = (np.ones(rebinned_bins), np.linspace(0, 4, rebinned_bins + 1))
+
+
+@unittest.skipIf(np is None, 'numpy, uproot and matplotlib are needed by modules.dqm_plots')
+class TestOverlayRenderer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.environ = mock.patch.dict(os.environ, {'ALCAVAL_CACHE_DIR': os.path.join(self.tmp, 'cache')})
+        self.environ.start()
+        self.new = os.path.join(self.tmp, 'new.root')
+        self.ref = os.path.join(self.tmp, 'ref.root')
+        write_dqm(self.new, 4)
+        write_dqm(self.ref, 8)
+
+    def tearDown(self):
+        self.environ.stop()
+        shutil.rmtree(self.tmp)
+
+    def test_index(self):
+        output = os.path.join(self.tmp, 'plots')
+        renderer = OverlayRenderer(self.new, self.ref, ['PixelPhase1'], output=output, workers=1)
+        images, rendered = renderer.run()
+        # the rebinned histogram has no image, nor a link in the index
+        self.assertEqual(images, {'PixelPhase1': [image_name('PixelPhase1', 'Run summary/same')]})
+        self.assertEqual(rendered, 1)
+        for image in images['PixelPhase1']:
+            self.assertTrue(os.path.exists(os.path.join(output, image)))
+        with open(os.path.join(output, 'index.html')) as f:
+            self.assertNotIn('rebinned', f.read())
+        # the second time the image comes from the cache
+        self.assertEqual(renderer.run()[1], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
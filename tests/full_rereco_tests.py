@@ -0,0 +1,86 @@
+import unittest, os, sys, shutil, tempfile, multiprocessing
+from pathlib import Path
+from argparse import Namespace
+directory = os.path.abspath(__file__)
+sys.path.append(str(Path(directory).parent.parent))
+sys.path.append(os.path.join(str(Path(directory).parent.parent), 'modules'))
+
+for name, value in [('WMCONTROL_USER', 'alcauser'), ('WMCONTROL_GROUP', 'ppd'),
+                    ('CMSSW_VERSION', 'CMSSW_12_0_3'), ('SCRAM_ARCH', 'slc7_amd64_gcc900')]:
+    os.environ.setdefault(name, value)
+
+import full_rereco
+
+UPLOADS = 'uploads.txt'
+
+
+def fake_upload(cfg, label, user, group, test_mode=False):
+    """Records the upload in the working directory, also from the worker processes"""
+    with open(UPLOADS, 'a') as f:
+        f.write('%s %s\n' % (cfg, label))
+    return 'couch_' + os.path.splitext(cfg)[0]
+
+
+@unittest.skipIf(multiprocessing.get_start_method() != 'fork', 'the stubbed uploader reaches the workers by fork')
+class TestUploads(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.mkdtemp()
+        os.chdir(self.tmp)
+        for cfg in ('rereco_pp.py', 'rereco_cosmics.py', 'skim_ZeroBias.py'):
+            open(cfg, 'w').close()
+        self.upload = full_rereco.wma.upload_to_couch
+        full_rereco.wma.upload_to_couch = fake_upload
+        full_rereco.requestDefault['RequestString'] = 'ReReco_Test_'
+
+    def tearDown(self):
+        full_rereco.wma.upload_to_couch = self.upload
+        full_rereco.requestDefault['RequestString'] = None
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmp)
+
+    def uploads(self):
+        with open(UPLOADS) as f:
+            return sorted(l.split()[0] for l in f)
+
+    def test_upload_configs(self):
+        ids = full_rereco.upload_configs(['rereco_pp.py', 'rereco_cosmics.py', 'rereco_pp.py'], workers=2)
+        self.assertEqual(ids, {'rereco_pp.py': 'couch_rereco_pp', 'rereco_cosmics.py': 'couch_rereco_cosmics'})
+        self.assertEqual(self.uploads(), ['rereco_cosmics.py', 'rereco_pp.py'])
+
+    def test_shared_configs(self):
+        datasets = ['/ZeroBias/Run2022C-v1/RAW', '/MinimumBias/Run2022C-v1/RAW', '/Cosmics/Run2022C-v1/RAW']
+        requests = full_rereco.prepareRequest(datasets, Namespace(lastRun=-1, firstRun=-1, workers=2))
+        # every configuration is uploaded once
+        self.assertEqual(self.uploads(), ['rereco_cosmics.py', 'rereco_pp.py', 'skim_ZeroBias.py'])
+        ids = dict((r['InputDataset'].split('/')[1], r['ProcConfigCacheID']) for r in requests)
+        self.assertEqual(ids['ZeroBias'], 'couch_rereco_pp')
+        self.assertEqual(ids['MinimumBias'], ids['ZeroBias'])
+        self.assertEqual(ids['Cosmics'], 'couch_rereco_cosmics')
+        self.assertEqual(requests[0]['Skim1ConfigCacheID'], 'couch_skim_ZeroBias')
+        self.assertNotIn('NR_skim', requests[1])
+
+    def test_upload_workers(self):
+        calls = []
+        upload_configs = full_rereco.upload_configs
+        full_rereco.upload_configs = lambda cfgs, workers=4: calls.append(workers) or dict((c, 'id') for c in cfgs)
+        try:
+            full_rereco.prepareRequest(['/ZeroBias/Run2022C-v1/RAW'], Namespace(lastRun=-1, firstRun=-1, workers=7))
+        finally:
+            full_rereco.upload_configs = upload_configs
+        self.assertEqual(calls, [7])
+
+
+class TestExecParallel(unittest.TestCase):
+    def test_exec_parallel(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            # all the commands run in cwd, a failure does not stop the others
+            full_rereco.exec_parallel(['echo a > a.txt', 'exit 3', 'echo b > b.txt'], cwd=tmp)
+            self.assertEqual(sorted(os.listdir(tmp)), ['a.txt', 'b.txt'])
+        finally:
+            shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest, os, sys, tempfile
+from pathlib import Path
+directory = os.path.abspath(__file__)
+sys.path.append(str(Path(directory).parent.parent))
+
+from modules.jira_index import PAGE_SIZE, LabelIndex, label_key, labels_jql
+
+
+class Issue():
+    def __init__(self, key, labels, created):
+        self.key = key
+        self.fields = type('Fields', (), {'labels': labels, 'created': created})
+
+
+class FakeJira():
+    """search_issues on a list of issues, understanding only the JQL of LabelIndex"""
+    def __init__(self, issues, labels_search=True):
+        self.issues = issues
+        self.labels_search = labels_search
+        self.queries = []
+
+    def search_issues(self, jql, startAt=0, maxResults=50, fields=None):
+        self.queries.append(jql)
+        if 'labels' in jql:
+            if not self.labels_search:
+                raise RuntimeError('JQL not supported')
+            wanted = [c.split('"')[1] for c in jql.split('labels = ')[1:]]
+            found = [i for i in self.issues if all(l in i.fields.labels for l in wanted)]
+            return sorted(found, key=lambda i: i.fields.created, reverse=True)[startAt:startAt + maxResults]
+        found = sorted(self.issues, key=lambda i: i.fields.created)
+        if 'created >=' in jql:
+            since = jql.split('created >= "')[1][:10]
+            found = [i for i in found if i.fields.created[:10] >= since]
+        return found[startAt:startAt + maxResults]
+
+
+ISSUES = [Issue('CMSALCA-%d' % n, ['Week%d' % (n % 52), '2021', 'Pixel'], '2021-%02d-%02dT10:00:00.000+0100' % (1 + n // 28, 1 + n % 28))
+          for n in range(1, 250)]
+
+
+class TestLabelIndex(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'labels.json')
+
+    def test_jql(self):
+        self.assertEqual(label_key([' Pixel', '2021', 'Pixel']), '2021,Pixel')
+        self.assertEqual(labels_jql('CMSALCA', ['Week"49', '2021']),
+                         'project=CMSALCA AND labels = "2021" AND labels = "Week\\"49" order by created desc')
+
+    def test_find(self):
+        jira = FakeJira(ISSUES + [Issue('CMSALCA-300', ['Week49', '2021', 'Pixel', 'Extra'], '2021-12-01T10:00:00.000+0100')])
+        index = LabelIndex(jira, path=self.path)
+        # the issue with more labels is not a duplicate
+        self.assertEqual(index.find(['Pixel', '2021', 'Week49']), 'CMSALCA-205')
+        self.assertIsNone(index.find(['Pixel', '2021', 'Week53']))
+        self.assertTrue(all('labels' in q for q in jira.queries))
+
+    def test_find_past_the_first_page(self):
+        # more than a page of newer issues with more labels before the exact match
+        extra = [Issue('CMSALCA-%d' % n, ['Week49', '2021', 'Pixel', 'Extra%d' % n], '2022-01-01T10:00:00.000+0100')
+                 for n in range(300, 300 + 2 * PAGE_SIZE)]
+        jira = FakeJira(ISSUES + extra)
+        index = LabelIndex(jira, path=self.path)
+        self.assertEqual(index.find(['Pixel', '2021', 'Week49']), 'CMSALCA-205')
+        self.assertEqual(len(jira.queries), 3)
+
+    def test_search_error(self):
+        jira = FakeJira(ISSUES, labels_search=False)
+        index = LabelIndex(jira, path=self.path)
+        self.assertRaises(RuntimeError, index.find, ['Pixel', '2021', 'Week49'])
+        # the whole project is not downloaded
+        self.assertEqual(len(jira.queries), 1)
+
+    def test_sync(self):
+        jira = FakeJira(ISSUES)
+        index = LabelIndex(jira, path=self.path)
+        self.assertEqual(index.sync()['labels'][label_key(['Pixel', '2021', 'Week49'])], 'CMSALCA-205')
+        # three pages of the whole project the first time
+        self.assertEqual(len(jira.queries), 3)
+        jira.issues = ISSUES + [Issue('CMSALCA-250', ['Week50', '2021', 'Tracker'], '2021-09-30T10:00:00.000+0100')]
+        jira.queries = []
+        self.assertEqual(index.sync()['labels'][label_key(['Tracker', '2021', 'Week50'])], 'CMSALCA-250')
+        # then only the issues since the day before the newest one
+        self.assertIn('created >= "2021-09-', jira.queries[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest, os, sys, json, tempfile, time
+from pathlib import Path
+directory = os.path.abspath(__file__)
+sys.path.append(str(Path(directory).parent.parent))
+
+try:
+    from modules import jira_session
+except ImportError:
+    jira_session = None
+
+
+class Cookie():
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+
+
+class FakeJIRA():
+    """JIRA client counting the logins, accepting the cookies of a login"""
+    logins = 0
+
+    def __init__(self, host, basic_auth=None, token_auth=None, options=None, get_server_info=True):
+        self._session = type('Session', (), {})()
+        if basic_auth or token_auth:
+            FakeJIRA.logins += 1
+            self._session.cookies = [Cookie('JSESSIONID', 'login%d' % FakeJIRA.logins)]
+        else:
+            self._session.cookies = CookieJar()
+
+    def myself(self):
+        if not dict(self._session.cookies.items()).get('JSESSIONID', '').startswith('login'):
+            raise RuntimeError('401')
+
+
+class CookieJar(list):
+    def update(self, cookies):
+        self.extend(Cookie(k, v) for k, v in cookies.items())
+
+    def items(self):
+        return [(c.name, c.value) for c in self]
+
+
+@unittest.skipIf(jira_session is None, 'jira is needed by modules.jira_session')
+class TestJiraSession(unittest.TestCase):
+    def setUp(self):
+        self.environ = dict(os.environ)
+        os.environ['ALCAVAL_CACHE_DIR'] = tempfile.mkdtemp()
+        os.environ['BUILD_TAG'] = 'jenkins-AlCaVal-42'
+        self.original = jira_session.JIRA
+        jira_session.JIRA = FakeJIRA
+        FakeJIRA.logins = 0
+        jira_session._clients.clear()
+
+    def tearDown(self):
+        jira_session.JIRA = self.original
+        jira_session._clients.clear()
+        os.environ.clear()
+        os.environ.update(self.environ)
+
+    def test_shared_in_process(self):
+        client = jira_session.get_client('host', 'alcauser', 'secret')
+        self.assertIs(jira_session.get_client('host', 'alcauser', 'secret'), client)
+        self.assertEqual(FakeJIRA.logins, 1)
+
+    def test_reused_by_next_stage(self):
+        jira_session.get_client('host', 'alcauser', 'secret')
+        path = jira_session.cookie_file('alcauser')
+        self.assertEqual(oct(os.stat(path).st_mode & 0o777), oct(0o600))
+        # a new process of the same build
+        jira_session._clients.clear()
+        jira_session.get_client('host', 'alcauser', 'secret')
+        self.assertEqual(FakeJIRA.logins, 1)
+        # too old, logging in again
+        jira_session._clients.clear()
+        with open(path) as f:
+            saved = json.load(f)
+        saved['saved_at'] = time.time() - 2 * jira_session.MAX_AGE
+        with open(path, 'w') as f:
+            json.dump(saved, f)
+        jira_session.get_client('host', 'alcauser', 'secret')
+        self.assertEqual(FakeJIRA.logins, 2)
+
+    def test_outside_jenkins(self):
+        del os.environ['BUILD_TAG']
+        self.assertIsNone(jira_session.cookie_file('alcauser'))
+        jira_session.get_client('host', 'alcauser', 'secret')
+        self.assertEqual(FakeJIRA.logins, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
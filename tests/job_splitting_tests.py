@@ -0,0 +1,45 @@
+import unittest, os, sys
+from pathlib import Path
+directory = os.path.abspath(__file__)
+sys.path.append(str(Path(directory).parent.parent))
+
+from modules.job_splitting import Lumi, SplittingTuner, job_events, lumis_from_file_lumis, simulate, turnaround
+
+# two runs, 100 lumisections of 1000 events in files of 10 lumisections
+LUMIS = [Lumi(run, lumi, 1000, '/store/%d_%d.root' % (run, (lumi - 1) // 10))
+         for run in (356381, 356382) for lumi in range(1, 101)]
+
+
+class TestJobSplitting(unittest.TestCase):
+    def test_job_events(self):
+        # jobs stop at the end of the files
+        self.assertEqual(job_events(LUMIS, 4), [4000, 4000, 2000] * 20)
+        # and at the end of the runs
+        self.assertEqual(job_events(LUMIS, 40, file_boundaries=False), [40000, 40000, 20000] * 2)
+
+    def test_simulate(self):
+        s = simulate(LUMIS, 10, time_event=1.0, overhead=0, slots=5, cores=4)
+        self.assertEqual(s.jobs, 20)
+        self.assertEqual(s.max_time, 10000)
+        self.assertEqual(s.core_hours, 20 * 10000 * 4 / 3600.)
+        self.assertEqual(s.turnaround, 4 * 10000)
+        self.assertEqual(turnaround([5, 1, 1, 1], slots=2), 5)
+
+    def test_tune(self):
+        # 1 s/event: 3 lumisections per job make 3000 s jobs, the longest under one hour
+        tuner = SplittingTuner(LUMIS, target=(1800, 3600), overhead=0, file_boundaries=False)
+        self.assertEqual(tuner.tune(1.0).lumis_per_job, 3)
+        # files of 10 lumisections are the longest jobs of the first task
+        self.assertEqual(SplittingTuner(LUMIS, overhead=0).tune(0.1).lumis_per_job, 10)
+        # a single lumisection is already too long
+        self.assertEqual(SplittingTuner(LUMIS, target=(10, 100), overhead=0).tune(1.0).lumis_per_job, 1)
+
+    def test_file_lumis(self):
+        file_lumis = {'/store/b.root': {3: 5, 4: 10}, '/store/a.root': {1: 10, 2: 10, 3: 5}}
+        lumis = lumis_from_file_lumis(file_lumis, '356381', {2, 3, 4})
+        self.assertEqual([(l.lumi, l.events, l.file) for l in lumis],
+                         [(2, 10, '/store/a.root'), (3, 10, '/store/a.root'), (4, 10, '/store/b.root')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest, os, sys, tempfile
+from pathlib import Path
+directory = os.path.abspath(__file__)
+sys.path.append(str(Path(directory).parent.parent))
+
+from modules.perf_report import PerfComparison, parse_log
+
+LOG = """Begin processing the 1st record.
+TimeReport ---------- Event  Summary ---[sec]----
+TimeReport       per event     per exec    per visit  Name
+TimeReport ---------- Module Summary ---[Real sec]----
+TimeReport  per event     per exec    per visit  Name
+TimeReport   %f     %f     %f  siPixelClusters
+TimeReport   0.002000     0.002000     0.002000  hltGetRaw
+TimeReport  per event     per exec    per visit  Name
+MemoryReport> Peak rss size %.1f Mbytes
+ - Total job: %.1f
+"""
+
+FJR = """<FrameworkJobReport>
+<File><PFN>file:step2.root</PFN><ModuleLabel>RECOoutput</ModuleLabel><TotalEvents>100</TotalEvents></File>
+<PerformanceReport>
+<PerformanceSummary Metric="Timing">
+<Metric Name="EventThroughput" Value="%f"/>
+<Metric Name="TotalJobTime" Value="%f"/>
+</PerformanceSummary>
+<PerformanceSummary Metric="ApplicationMemory">
+<Metric Name="PeakValueRss" Value="%f"/>
+</PerformanceSummary>
+</PerformanceReport>
+</FrameworkJobReport>
+"""
+
+
+class TestPerfReport(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        for label, pixel, rss, throughput in (('newco', 0.050, 2400, 8.0), ('refer', 0.010, 2000, 10.0)):
+            with open(os.path.join(self.tmp, '%s_step1.log' % label), 'w') as f:
+                f.write(LOG % (pixel, pixel, pixel, rss, 100 / throughput))
+            with open(os.path.join(self.tmp, '%s_step1_fjr.xml' % label), 'w') as f:
+                f.write(FJR % (throughput, 100 / throughput, rss))
+
+    def test_log(self):
+        log = parse_log(os.path.join(self.tmp, 'refer_step1.log'))
+        self.assertEqual(log['modules'], {'siPixelClusters': 0.01, 'hltGetRaw': 0.002})
+        self.assertEqual(log['peak_rss_mb'], 2000)
+        self.assertEqual(log['total_job_time'], 10)
+
+    def test_compare(self):
+        report = PerfComparison(self.tmp, tolerance=0.1).run()
+        step = report['steps']['step1']
+        self.assertAlmostEqual(step['changes']['events_per_second'], -0.2)
+        self.assertAlmostEqual(step['changes']['peak_rss_mb'], 0.2)
+        self.assertEqual([m['module'] for m in step['slower_modules']], ['siPixelClusters'])
+        self.assertEqual(len(report['flags']), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest, os, sys
+from pathlib import Path
+directory = os.path.abspath(__file__)
+sys.path.append(str(Path(directory).parent.parent))
+
+from modules.input_discovery import select_lumis
+from modules.input_planner import select_files
+
+FILE_LUMIS = {
+    '/store/a.root': {1: 10, 2: 10, 3: 10},
+    '/store/b.root': {3: 50, 4: 50},
+    '/store/c.root': {5: 5, 6: 5},
+}
+
+class TestInputPlanner(unittest.TestCase):
+    def test_event_budget(self):
+        files, nevents = select_files(FILE_LUMIS, 80)
+        self.assertEqual(files, ['/store/b.root'])
+        self.assertEqual(nevents, 80)
+
+    def test_budget_larger_than_selection(self):
+        files, nevents = select_files(select_lumis(FILE_LUMIS, [[1, 2], [5, 5]]), 100)
+        self.assertEqual(sorted(files), ['/store/a.root', '/store/c.root'])
+        self.assertEqual(nevents, 25)
+
+    def test_cover_selection(self):
+        files, nevents = select_files(select_lumis(FILE_LUMIS, [[2, 4]]), -1)
+        self.assertEqual(sorted(files), ['/store/a.root', '/store/b.root'])
+        self.assertEqual(nevents, 120)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest, os, sys, time, tempfile
+from pathlib import Path
+directory = os.path.abspath(__file__)
+sys.path.append(str(Path(directory).parent.parent))
+
+from modules.prefetch import FileCache, adler32
+
+SIZE = 40
+
+
+class FakeCache(FileCache):
+    """Copies files of SIZE bytes instead of reading them from xrootd"""
+    def __init__(self, cache_dir, max_size):
+        FileCache.__init__(self, cache_dir, max_size)
+        self.copied = []
+
+    def get_metadata(self, lfn):
+        data = lfn.encode('utf-8').ljust(SIZE, b'x')
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(data)
+            f.flush()
+            return SIZE, adler32(f.name)
+
+    def copy(self, lfn, path):
+        self.copied.append(lfn)
+        with open(path, 'wb') as f:
+            f.write(lfn.encode('utf-8').ljust(SIZE, b'x'))
+
+
+class TestFileCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache = FakeCache(os.path.join(self.dir, 'cache'), max_size=2 * SIZE)
+
+    def write_list(self, lfns):
+        path = os.path.join(self.dir, 'step1_files.txt')
+        with open(path, 'w') as f:
+            f.write('\n'.join(lfns) + '\n')
+        return path
+
+    def test_files_of_the_list_are_not_evicted(self):
+        # an older file of another list is evicted, the third file of the list is read remotely
+        self.cache.fetch('/store/old.root')
+        lfns = ['/store/a.root', '/store/b.root', '/store/c.root']
+        filelist = self.write_list(lfns)
+        self.cache.prefetch_file_list(filelist, workers=1)
+        with open(filelist) as f:
+            lines = f.read().split()
+        self.assertEqual(lines[:2], ['file:' + self.cache.local_path(l) for l in lfns[:2]])
+        self.assertEqual(lines[2], '/store/c.root')
+        for lfn in lfns[:2]:
+            self.assertTrue(os.path.exists(self.cache.local_path(lfn)))
+        self.assertFalse(os.path.exists(self.cache.local_path('/store/old.root')))
+        self.assertEqual(sorted(self.cache.index.load()), lfns[:2])
+        with open(filelist + '.remote') as f:
+            self.assertEqual(f.read().split(), lfns)
+
+    def test_files_stay_pinned_until_released(self):
+        lfns = ['/store/a.root', '/store/b.root']
+        filelist = self.write_list(lfns)
+        self.cache.prefetch_file_list(filelist, workers=1)
+        # another build sharing the cache cannot evict them while the local tests read them
+        other = FakeCache(self.cache.cache_dir, max_size=2 * SIZE)
+        self.assertIsNone(other.fetch('/store/other.root'))
+        for lfn in lfns:
+            self.assertTrue(os.path.exists(self.cache.local_path(lfn)))
+        self.cache.release_file_list(filelist)
+        self.assertEqual(other.fetch('/store/other.root'), other.local_path('/store/other.root'))
+
+    def test_copies_in_progress_count_against_the_cap(self):
+        self.assertTrue(self.cache.reserve('/store/a.root', SIZE))
+        self.assertTrue(self.cache.reserve('/store/b.root', SIZE))
+        # both copies are in progress, there is no room and nothing to evict
+        self.assertFalse(self.cache.reserve('/store/c.root', SIZE))
+        self.assertIsNone(self.cache.fetch('/store/c.root'))
+        # a failed copy gives its room back
+        self.cache.release('/store/a.root')
+        self.assertTrue(self.cache.reserve('/store/c.root', SIZE))
+
+    def test_stale_reservation(self):
+        self.assertTrue(self.cache.reserve('/store/a.root', 2 * SIZE))
+        with self.cache.index.update() as index:
+            index['/store/a.root']['last_used'] = time.time() - 7 * 3600
+        self.assertEqual(self.cache.fetch('/store/b.root'), self.cache.local_path('/store/b.root'))
+        self.assertEqual(list(self.cache.index.load()), ['/store/b.root'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest, os, sys
+from pathlib import Path
+directory = os.path.abspath(__file__)
+sys.path.append(str(Path(directory).parent.parent))
+
+from relval_submit import metadataRuns, dqmOutput, localTestCommands, concurrentLocalTests, releasePrefetched
+
+
+def metadata(**runs):
+    options = {'Type': 'HLT+RECO'}
+    options.update(runs)
+    return {'options': options, 'HLT_release': 'CMSSW_12_0_3', 'PR_release': 'CMSSW_12_0_3'}
+
+
+class TestLocalTestCommands(unittest.TestCase):
+    def test_runs(self):
+        self.assertEqual(metadataRuns(metadata(run=346512)), ['346512'])
+        self.assertEqual(metadataRuns(metadata(run=[346513, 346512])), ['346512', '346513'])
+        self.assertEqual(metadataRuns(metadata(runLs={'346513': [[1, 20]], '346512': [[1, 500]]})), ['346512', '346513'])
+
+    def test_one_run(self):
+        commands = localTestCommands(metadata(runLs={'346512': [[1, 500]]}), 'newco', '..')
+        self.assertEqual(commands[-1], 'mv DQM*.root ../HLT_newco_DQMoutput.root')
+
+    def test_two_runs(self):
+        two_runs = metadata(runLs={'346512': [[1, 500]], '346513': [[1, 20], [40, 90]]})
+        self.assertEqual(dqmOutput(two_runs, 'refer', '346513'), 'HLT_refer_R346513_DQMoutput.root')
+        commands = localTestCommands(two_runs, 'newco', '..')
+        self.assertEqual(commands[:3], ['cmsRun NEWCONDITIONS0.py', 'cmsRun recodqm_newco.py',
+                                        'cmsRun step4_newco_HARVESTING.py'])
+        # the harvesting saves one DQM file per run, each one is kept under the name of its run
+        self.assertNotIn('mv DQM*.root', ' '.join(commands))
+        self.assertTrue(commands[-1].startswith('for dqm in DQM*_R*.root; do run='))
+        self.assertIn('mv $dqm ../HLT_newco_R${run}_DQMoutput.root; done', commands[-1])
+        both = concurrentLocalTests(two_runs, threads=2)
+        for label in ('newco', 'refer'):
+            self.assertIn('mv $dqm ../HLT_%s_R${run}_DQMoutput.root' % label, both)
+
+    def test_release_prefetched(self):
+        commands = ['cmsRun NEWCONDITIONS0.py', 'mv DQM*.root HLT_newco_DQMoutput.root']
+        self.assertEqual(releasePrefetched(metadata(run=346512), commands), commands)
+        # the release runs even if the local test fails, and the failure is kept
+        self.assertEqual(releasePrefetched(metadata(run=346512, prefetch=''), commands),
+                         ['{ cmsRun NEWCONDITIONS0.py && mv DQM*.root HLT_newco_DQMoutput.root; rc=$?; '
+                          'python3 -m modules.prefetch --release step1_files.txt; [ $rc -eq 0 ]; }'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest, os, sys, tempfile
+from pathlib import Path
+directory = os.path.abspath(__file__)
+sys.path.append(str(Path(directory).parent.parent))
+
+from modules.request_store import RequestStore, APPROVED, PREPARED
+
+REQUESTS = [{'RequestString': 'AlCa_ZeroBias', 'InputDataset': '/ZeroBias/Run2022C-v1/RAW'},
+            {'RequestString': 'AlCa_JetMET', 'InputDataset': '/JetMET/Run2022C-v1/RAW'}]
+
+
+class TestRequestStore(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'journal.jsonl')
+        self.store = RequestStore(self.path)
+        self.store.prepare(REQUESTS)
+
+    def test_merge(self):
+        self.store.append('AlCa_ZeroBias', 'ZeroBias', status=APPROVED, workflow='wf')
+        states = self.store.load()
+        self.assertEqual(list(states), ['AlCa_ZeroBias', 'AlCa_JetMET'])
+        self.assertEqual((states['AlCa_ZeroBias']['status'], states['AlCa_ZeroBias']['workflow']), (APPROVED, 'wf'))
+        self.assertEqual(states['AlCa_JetMET']['status'], PREPARED)
+        self.assertEqual(self.store.requests(['JetMET']), REQUESTS[1:])
+        # the submitted requests are not prepared again
+        self.store.prepare(REQUESTS)
+        self.assertEqual(self.store.load()['AlCa_ZeroBias']['status'], APPROVED)
+
+    def test_crash(self):
+        with open(self.path, 'a') as f:
+            f.write('{"key": "AlCa_ZeroBias", "pd": "ZeroBias", "status": "appr')
+        self.store.append('AlCa_JetMET', 'JetMET', status=APPROVED)
+        with open(self.path) as f:
+            lines = f.readlines()
+        lines[1] = lines[1].replace('"prepared"', '"approved"')
+        with open(self.path, 'w') as f:
+            f.writelines(lines)
+        states = self.store.load()
+        # truncated and corrupted entries are skipped
+        self.assertNotIn('AlCa_ZeroBias', states)
+        self.assertEqual(states['AlCa_JetMET']['status'], APPROVED)
+
+    def test_header(self):
+        with open(self.path, 'w') as f:
+            f.write('{"format": "other", "version": 1}\n')
+        self.assertRaises(ValueError, self.store.load)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest, os, sys, tempfile
+from pathlib import Path
+directory = os.path.abspath(__file__)
+sys.path.append(str(Path(directory).parent.parent))
+
+import wmcontrol
+from modules.request_validator import RequestValidator
+
+CONF = """[DEFAULT]
+request_type= TaskChain
+priority = 900000
+release=CMSSW_13_0_3
+globaltag =130X_dataRun3_HLT_v2
+campaign=CMSSW_13_0_3__ALCA_w16
+lumi_list={355100: [[1, 100]]}
+
+[HLT_reference_ZeroBias]
+input_name = /ZeroBias/Run2023B-v1/RAW
+keep_step1 = True
+step1_docID = 0123456789abcdef
+processing_string = HLTref_130X_dataRun3_HLT_v2
+
+[HLT_newco_ZeroBias]
+input_name = ZeroBias/Run2023B-v1/RAW
+step1_cfg = missing_HLT.py
+processing_string = HLT-newco
+dset_run_dict = {"/ZeroBias/Run2023B-v1/RAW": [355101]}
+
+[Harvesting]
+request_type = DQMHarvest
+input_name = /ZeroBias/Run2023B-v1/DQMIO
+"""
+
+
+class TestRequestValidator(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        path = os.path.join(self.tmp, 'request.conf')
+        with open(path, 'w') as f:
+            f.write(CONF)
+        argv = sys.argv
+        sys.argv = ['wmcontrol.py', '--test', '--req_file', path]
+        try:
+            self.validator = RequestValidator(wmcontrol.Configuration(wmcontrol.build_parser()))
+        finally:
+            sys.argv = argv
+
+    def errors(self, problems):
+        return [message for level, message in problems if level == 'error']
+
+    def test_valid(self):
+        self.assertEqual(self.validator.validate_section('HLT_reference_ZeroBias'), [])
+
+    def test_invalid(self):
+        results = self.validator.validate()
+        errors = self.errors(results['HLT_newco_ZeroBias'])
+        self.assertEqual(len(errors), 3)
+        self.assertTrue(any('processing_string' in e for e in errors))
+        self.assertTrue(any('missing_HLT.py' in e for e in errors))
+        self.assertTrue(any('keeps no output' in e for e in errors))
+        warnings = [m for level, m in results['HLT_newco_ZeroBias'] if level == 'warning']
+        self.assertTrue(any('[355100]' in w for w in warnings))
+        self.assertEqual(self.errors(results['Harvesting']),
+                         ['no harvesting configuration: set harvest_docID or harvest_cfg'])
+        self.assertEqual(self.validator.report(results), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest, os, sys, tempfile
+from pathlib import Path
+directory = os.path.abspath(__file__)
+sys.path.append(str(Path(directory).parent.parent))
+
+from modules.resource_estimator import ResourceEstimator, history_key, metadata_key
+
+FJR = """<FrameworkJobReport>
+<File><PFN>file:%s</PFN><ModuleLabel>RECOoutput</ModuleLabel><TotalEvents>100</TotalEvents></File>
+<PerformanceReport>
+<PerformanceSummary Metric="Timing">
+<Metric Name="EventThroughput" Value="%f"/>
+</PerformanceSummary>
+<PerformanceSummary Metric="ApplicationMemory">
+<Metric Name="PeakValueRss" Value="%f"/>
+</PerformanceSummary>
+<PerformanceSummary Metric="ProcessingSummary">
+<Metric Name="NumberOfThreads" Value="2"/>
+</PerformanceSummary>
+</PerformanceReport>
+</FrameworkJobReport>
+"""
+
+KEY = history_key('CMSSW_12_4_0', 'HLT+RECO', '/ZeroBias/Run2022C-v1/RAW', 'pp')
+
+
+class TestResourceEstimator(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.perf = os.path.join(self.tmp, 'perf')
+        os.makedirs(self.perf)
+        for label, throughput, rss in (('newco', 0.5, 3000), ('refer', 0.5, 3000)):
+            output = os.path.join(self.tmp, '%s_step1.root' % label)
+            with open(output, 'wb') as f:
+                f.write(b'\0' * 100 * 1024 * 100)
+            with open(os.path.join(self.perf, '%s_step1_fjr.xml' % label), 'w') as f:
+                f.write(FJR % (output, throughput, rss))
+        self.estimator = ResourceEstimator(os.path.join(self.tmp, 'history.json'), margin=1.0, cores=4)
+
+    def test_estimate(self):
+        self.assertIsNone(self.estimator.estimate('CMSSW_12_4_0', 'HLT+RECO', '/ZeroBias/Run2022C-v1/RAW', 'pp'))
+        self.assertEqual(self.estimator.record_directory(self.perf, KEY), 2)
+        estimate = self.estimator.estimate('CMSSW_12_4_0', 'HLT+RECO', '/ZeroBias/Run2022C-v1/RAW', 'pp')
+        # 2 threads at 0.5 events/s: 4 core-seconds per event, 1 s per event on 4 cores
+        self.assertAlmostEqual(estimate['time_event'], 1.0)
+        # two more threads than the local test
+        self.assertEqual(estimate['size_memory'], 4000)
+        self.assertEqual(estimate['size_event'], 100)
+        self.assertIsNone(self.estimator.estimate('CMSSW_12_4_0', 'HLT+RECO', '/ZeroBias/Run2022C-v1/RAW', 'pp',
+                                                  'recodqm'))
+
+    def test_fallback(self):
+        self.estimator.record_directory(self.perf, KEY)
+        other_release = self.estimator.estimate('CMSSW_12_5_0', 'HLT+RECO', '/ZeroBias/Run2022D-v1/RAW', 'pp')
+        self.assertEqual(other_release['source'], KEY)
+        other_pd = self.estimator.estimate('CMSSW_12_5_0', 'HLT+RECO', '/JetMET/Run2022D-v1/RAW', 'pp')
+        self.assertEqual(other_pd['source'], KEY)
+        self.assertIsNone(self.estimator.estimate('CMSSW_12_4_0', 'HLT+RECO', '/Cosmics/Run2022C-v1/RAW', 'cosmics'))
+        self.assertIsNone(self.estimator.estimate('CMSSW_12_4_0', 'PR', '/ZeroBias/Run2022C-v1/RAW', 'pp'))
+
+    def test_metadata_key(self):
+        metadata = {'HLT_release': 'CMSSW_12_4_0', 'PR_release': 'CMSSW_12_4_0',
+                    'options': {'Type': 'HLT+RECO', 'ds': '/ZeroBias/Run2022C-v1/RAW,/JetMET/Run2022C-v1/RAW'}}
+        self.assertEqual(metadata_key(metadata), KEY)
+
+
+if __name__ == '__main__':
+    unittest.main()
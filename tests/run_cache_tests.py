@@ -0,0 +1,40 @@
+import unittest, os, sys, time, tempfile
+from pathlib import Path
+directory = os.path.abspath(__file__)
+sys.path.append(str(Path(directory).parent.parent))
+
+from modules.run_cache import RunCache
+
+RECORD = {'cmssw_version': 'CMSSW_12_1_1', 'b_field': 3.8, 'start_time': '2021-10-29T10:00:00Z',
+          'hlt_key': '/cdaq/test/v1', 'class': 'Collisions21', 'closed': True, 'source': 'runregistry'}
+
+class OfflineCache(RunCache):
+    """Run Registry is down"""
+    def fetch(self, runs):
+        raise RuntimeError('service unavailable')
+
+class CountingCache(RunCache):
+    calls = []
+    def fetch(self, runs):
+        self.calls.append(list(runs))
+        return dict((r, dict(RECORD, fetched_at=time.time())) for r in runs)
+
+class TestRunCache(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'runs.json')
+
+    def test_closed_runs_are_not_fetched_again(self):
+        cache = CountingCache(self.path)
+        cache.get_runs([346512, 346513])
+        cache.get_runs([346512, 346513])
+        self.assertEqual(cache.calls, [['346512', '346513']])
+
+    def test_seed_used_when_service_is_down(self):
+        cache = OfflineCache(self.path)
+        self.assertRaises(RuntimeError, cache.get_run, 346512)
+        cache.seed(346512, '0', 'Cosmics21', '/cdaq/cosmic/v2')
+        run = cache.get_run(346512)
+        self.assertEqual((run['b_field'], run['class'], run['source']), (0.0, 'Cosmics21', 'template'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest, os, sys, shutil, tempfile
+from pathlib import Path
+directory = os.path.abspath(__file__)
+sys.path.append(str(Path(directory).parent.parent))
+
+from modules.validation_template import parse_template, parse_run, parse_runs, validate, load_template
+
+TEMPLATE = """# comment : with a colon
+Title                   : the new pixel quality condition
+Subsystem               : Pixel
+ValidationRequest       : https://hypernews.cern.ch/HyperNews/CMS/get/calibrations/4557/2.html
+
+Labels                  : Week49, 2021, Pixel
+TargetGT_Prompt         : 121X_dataRun3_PromptNew_v1
+ReferenceGT_Prompt      : 121X_dataRun3_Prompt_v11
+Dataset                 : /MinimumBias/Commissioning2021-v1/RAW,/ZeroBias/Commissioning2021-v1/RAW
+Run                     : {'346512': [[1, 500]]}
+WorkflowsToSubmit       : Prompt
+HLT_release             : None
+PR_release              : CMSSW_12_1_1
+Expr_release            : None
+"""
+
+class TestValidationTemplate(unittest.TestCase):
+    def test_parse(self):
+        fields = parse_template(TEMPLATE.splitlines())
+        self.assertEqual(fields['ValidationRequest'], 'https://hypernews.cern.ch/HyperNews/CMS/get/calibrations/4557/2.html')
+        self.assertNotIn('# comment', fields)
+        self.assertRaises(ValueError, parse_template, ['Title the title'])
+
+    def test_run(self):
+        self.assertEqual(parse_run("{'346512': [[1, 500]]}"), ('346512', '[[1, 500]]', {'346512': [[1, 500]]}))
+        self.assertEqual(parse_run("346512"), ('346512', '', None))
+        self.assertRaises(ValueError, parse_run, "{'346512': [[500, 1]]}")
+
+    def test_runs(self):
+        self.assertEqual(parse_runs("346513,346512"), (['346512', '346513'], None))
+        self.assertEqual(parse_runs("{346513: [[1, 20]], '346512': [[1, 10], [15, 30]]}"),
+                         (['346512', '346513'], {'346512': [[1, 10], [15, 30]], '346513': [[1, 20]]}))
+        self.assertEqual(parse_run("{'346513': [[1, 20]], '346512': [[1, 10], [15, 30]]}")[:2],
+                         ('346512', '[[1, 10], [15, 30]]'))
+        self.assertRaises(ValueError, parse_runs, "346512,346512")
+        self.assertRaises(ValueError, parse_runs, "{'346512': []}")
+
+    def test_validate(self):
+        fields = parse_template(TEMPLATE.splitlines())
+        fields['WorkflowsToSubmit'] = 'HLT/Prompt'
+        self.assertRaises(ValueError, validate, fields)
+
+    def test_load(self):
+        tmp = tempfile.mkdtemp()
+        path = os.path.join(tmp, 'template_test.txt')
+        with open(path, 'w') as f:
+            f.write(TEMPLATE)
+        try:
+            args = load_template(path)
+        finally:
+            shutil.rmtree(tmp)
+        self.assertEqual(args['Labels'], ['Week49', '2021', 'Pixel'])
+        self.assertEqual(args['Label'], 'Week49_2021_Pixel')
+        self.assertEqual((args['Week'], args['Year'], args['run_number']), ('Week49', '2021', '346512'))
+        self.assertEqual(args['run_numbers'], ['346512'])
+        self.assertEqual(args['Releases']['Prompt'], 'CMSSW_12_1_1')
+        self.assertEqual(args['GTs']['Prompt'], {'target': '121X_dataRun3_PromptNew_v1', 'reference': '121X_dataRun3_Prompt_v11'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest, os, sys
+from pathlib import Path
+directory = os.path.abspath(__file__)
+sys.path.append(str(Path(directory).parent.parent))
+
+try:
+    from modules import twiki_client
+except ImportError:
+    twiki_client = None
+
+EDIT_PAGE = """<html><body><form name="main" action="save">
+<input type="hidden" name="validation_key" value="abc123">
+<input type="hidden" name="originalrev" value="42">
+<input type="text" name="topicparent" value="WebHome">
+<textarea name="text" rows="22">---+ Validations
+| Week | Run |
+%MyButtons%</textarea>
+</form></body></html>"""
+
+
+class Response():
+    def __init__(self, text='', url='https://twiki.cern.ch/twiki/bin/view/CMS/Topic', status=200):
+        self.text = text
+        self.url = url
+        self.status = status
+
+    def raise_for_status(self):
+        if self.status != 200:
+            raise IOError('HTTP %d' % self.status)
+
+
+class FakeSession():
+    def __init__(self, text, save_response):
+        self.text = text
+        self.save_response = save_response
+        self.saved = []
+
+    def get(self, url, params=None):
+        return Response(EDIT_PAGE.replace('%MyButtons%', self.text + '%MyButtons%'))
+
+    def post(self, url, data=None):
+        self.saved.append(data['text'])
+        return self.save_response
+
+
+@unittest.skipIf(twiki_client is None, 'requests and cernrequests are needed by modules.twiki_client')
+class TestTWikiClient(unittest.TestCase):
+    def client(self, text='', save_response=None):
+        client = twiki_client.TWikiClient('https://twiki.cern.ch/twiki/bin/viewauth/CMS/Topic')
+        client.session = FakeSession(text, save_response or Response())
+        return client
+
+    def test_edit_form(self):
+        form = twiki_client.EditFormParser()
+        form.feed(EDIT_PAGE)
+        self.assertEqual(form.fields, {'validation_key': 'abc123', 'originalrev': '42'})
+        self.assertEqual(form.text, '---+ Validations\n| Week | Run |\n%MyButtons%')
+
+    def test_append_section(self):
+        self.assertEqual(twiki_client.append_section('Intro\n%MyButtons%\n', '\n---++ Week49'), 'Intro\n\n---++ Week49')
+        client = self.client()
+        self.assertTrue(client.append_section('\n---++ Week49\n'))
+        self.assertEqual(client.session.saved, ['---+ Validations\n| Week | Run |\n\n---++ Week49\n'])
+
+    def test_no_duplicate(self):
+        client = self.client(text='\n---++ Week49\n')
+        self.assertFalse(client.append_section('\n---++ Week49\n'))
+        self.assertEqual(client.session.saved, [])
+
+    def test_save_attempted(self):
+        for response in (Response(status=500), Response(url='https://twiki.cern.ch/twiki/bin/oops/CMS/Topic')):
+            client = self.client(save_response=response)
+            self.assertRaises(twiki_client.SaveAttempted, client.append_section, '\n---++ Week49\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest, os, sys, json, tempfile
+from pathlib import Path
+directory = os.path.abspath(__file__)
+sys.path.append(str(Path(directory).parent.parent))
+
+from modules.twiki_render import SectionRenderer, load_submission
+
+ENVS = {'WorkflowsToSubmit': 'HLT', 'Week': 'Week49', 'Year': '2021', 'Title': 'Pixel alignment',
+        'emailSubject': 'New pixel alignment', 'Jira': '42', 'ValidationRequest': 'https://hn/1',
+        'Dataset': '/ZeroBias/Run2021A-v1/RAW', 'run_number': '346512', 'start_date': '2021-11-01',
+        'b_field': '3.8', 'hlt_key': '/cdaq/physics/v1', 'HLT_release': 'CMSSW_12_0_3',
+        'TargetGT_HLT': 'NEW_HLT', 'ReferenceGT_HLT': 'REF_HLT', 'TargetGT_Prompt': 'NEW_PR'}
+
+
+def workflow(label):
+    return {'workflow_name': 'user_AlCaVal_%s' % label,
+            'Config': {'Campaign': 'CMSSW_12_0_3__AlCaVal_HLT', 'CMSSWVersion': 'CMSSW_12_0_3',
+                       'ProcessingString': label, 'Task1': {'InputDataset': '/ZeroBias/Run2021A-v1/RAW'}}}
+
+
+class TestSectionRenderer(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.envs = os.path.join(tmp, 'envs.json')
+        self.config = os.path.join(tmp, 'workflow_config.json')
+        with open(self.envs, 'w') as f:
+            json.dump(ENVS, f)
+        with open(self.config, 'w') as f:
+            json.dump({'HLT_newconditions_ZeroBias_0': workflow('newco'),
+                       'HLT_referenceconditions_ZeroBias_0': workflow('refer')}, f)
+
+    def test_render(self):
+        section = SectionRenderer().render_submission(load_submission(self.envs, self.config))
+        self.assertTrue(section.startswith('\n\n---++ Week 49\n---+++ Pixel alignment\n'))
+        self.assertTrue(section.endswith('\n%ENDTWISTY%\n%MyButtons%'))
+        self.assertIn('\n   * *HLT Campaign*: [[https://dmytro.web.cern.ch/dmytro/cmsprodmon/requests.php?campaign='
+                      'CMSSW_12_0_3__AlCaVal_HLT][CMSSW_12_0_3__AlCaVal_HLT]]', section)
+        self.assertIn('\n   * *Run/s*: 346512, LS: all recorded on 2021-11-01 with B-field 3.8T', section)
+        self.assertIn('\n| Target | [[https://cms-conddb.cern.ch/cmsDbBrowser/list/Prod/gts/NEW_HLT][NEW_HLT]] |', section)
+        self.assertIn('|WF1| [[https://cmsweb.cern.ch/das/request?view=list&limit=50&instance=prod/global&input='
+                      'summary+dataset=/ZeroBias/Run2021A-v1/RAW+run=346512][/ZeroBias/Run2021A-v1/RAW]] | HLT New Conditions '
+                      '| [[https://cmsweb.cern.ch/reqmgr2/fetch?rid=user_AlCaVal_newco][user_AlCaVal_newco]] |', section)
+        self.assertIn('|WF2| ^ | HLT Reference Conditions |', section)
+        self.assertNotIn('Express', section)
+
+    def test_several_runs(self):
+        with open(self.envs, 'w') as f:
+            json.dump(dict(ENVS, run_numbers=['346513', '346512'],
+                           LumiMask={'346512': [[1, 500]], '346513': [[1, 20], [40, 90]]}), f)
+        section = SectionRenderer().render_submission(load_submission(self.envs, self.config))
+        self.assertIn('\n   * *Run/s*: 346512, LS: [[1, 500]] recorded on', section)
+        self.assertIn('\n   * *Run/s*: 346513, LS: [[1, 20], [40, 90]] recorded on', section)
+        self.assertIn('summary+dataset=/ZeroBias/Run2021A-v1/RAW+run+in+[346512,346513]]', section)
+        # one DQM GUI link per run
+        for run in ('346512', '346513'):
+            self.assertIn('[[https://cmsweb.cern.ch/dqm/relval/start?runnr=%s;dataset=/ZeroBias/CMSSW_12_0_3-newco-v1/'
+                          'DQMIO;workspace=Everything][DQM %s]]' % (run, run), section)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest, os, sys, tempfile
+from pathlib import Path
+directory = os.path.abspath(__file__)
+sys.path.append(str(Path(directory).parent.parent))
+
+import wmcontrol
+
+CONF = """[DEFAULT]
+group=ppd
+user=alcaval
+request_type= TaskChain
+priority = 900000
+release=CMSSW_13_0_3
+globaltag =130X_dataRun3_HLT_v2
+multicore = 4
+size_memory = 7.8e3
+enableharvesting = True
+dqmuploadurl = https://cmsweb.cern.ch/dqm/relval
+subreq_type = RelVal
+
+[HLT_newconditions_ZeroBias]
+step1_docID = 0123456789abcdef
+step1_lumisperjob = 10
+keep_step1 = True
+step2_docID = fedcba9876543210
+step2_globaltag = 130X_dataRun3_Prompt_v2
+harvest_docID = 00aa
+processing_string = HLTnewco
+campaign = CMSSW_13_0_3__ALCA_w16
+input_name = /ZeroBias/Run2023B-v1/RAW
+
+[HLT_refer_ZeroBias]
+step1_docID = 0123456789abcdef
+keep_step1 = 1
+"""
+
+
+class TestConfiguration(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        path = os.path.join(self.tmp, 'request.conf')
+        with open(path, 'w') as f:
+            f.write(CONF)
+        argv = sys.argv
+        sys.argv = ['wmcontrol.py', '--test', '--req_file', path]
+        try:
+            self.cfg = wmcontrol.Configuration(wmcontrol.build_parser())
+        finally:
+            sys.argv = argv
+
+    def test_params(self):
+        p = self.cfg.params('HLT_newconditions_ZeroBias')
+        self.assertIs(p, self.cfg.params('HLT_newconditions_ZeroBias'))
+        self.assertEqual((p.priority, p.multicore, p.size_memory), (900000, 4, 7800))
+        self.assertIs(p.keep_step1, True)
+        self.assertIs(p.keep_step2, False)
+        self.assertEqual(p.step2_lumisperjob, 1)
+        self.assertEqual(p.request_type, 'TaskChain')
+        self.assertEqual(self.cfg.get_param('step2_globaltag', p.globaltag, 'HLT_newconditions_ZeroBias'),
+                         '130X_dataRun3_Prompt_v2')
+        self.assertEqual(self.cfg.get_param('step1_docID', None, 'HLT_refer_ZeroBias'), '0123456789abcdef')
+        with self.assertRaises(Exception):
+            self.cfg.get_param('step3_release', None, 'HLT_refer_ZeroBias')
+        with self.assertRaisesRegex(ValueError, 'HLT_refer_ZeroBias: parameter keep_step1'):
+            self.cfg.params('HLT_refer_ZeroBias')
+
+    def test_build_params(self):
+        params, service = wmcontrol.build_params_dict('HLT_newconditions_ZeroBias', self.cfg)
+        self.assertEqual(params['TaskChain'], 2)
+        self.assertEqual(params['Task1']['LumisPerJob'], 10)
+        self.assertIs(params['Task1']['KeepOutput'], True)
+        self.assertEqual(params['Task1']['ProcessingString'], 'HLTnewco')
+        self.assertEqual(params['Task2']['GlobalTag'], '130X_dataRun3_Prompt_v2')
+        self.assertEqual(params['Task2']['Campaign'], 'CMSSW_13_0_3__ALCA_w16')
+        self.assertIs(params['EnableHarvesting'], True)
+        self.assertEqual(params['DQMUploadUrl'], 'https://cmsweb.cern.ch/dqm/relval')
+        self.assertEqual(service['margin'], 0.05)
+        self.assertIs(service['brute_force'], False)
+
+
+if __name__ == '__main__':
+    unittest.main()
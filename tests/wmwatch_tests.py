@@ -0,0 +1,70 @@
+import unittest, os, sys, tempfile
+from pathlib import Path
+directory = os.path.abspath(__file__)
+sys.path.append(str(Path(directory).parent.parent))
+
+from wmwatch import WorkflowWatcher
+
+WORKFLOWS = {'wf_HLT_newco': 'HLT_newconditions_ZeroBias', 'wf_HLT_refer': 'HLT_reference_ZeroBias'}
+
+
+class FakeReqMgr():
+    """Returns the statuses of the next step at every query"""
+    def __init__(self, steps):
+        self.steps = steps
+        self.queries = []
+
+    def __call__(self, workflows):
+        self.queries.append(sorted(workflows))
+        statuses = self.steps.pop(0) if self.steps else {}
+        if isinstance(statuses, Exception):
+            raise statuses
+        return dict((w, s) for w, s in statuses.items() if w in workflows)
+
+
+class TestWorkflowWatcher(unittest.TestCase):
+    def setUp(self):
+        self.journal = os.path.join(tempfile.mkdtemp(), 'journal.jsonl')
+
+    def test_watch(self):
+        fetch = FakeReqMgr([
+            {'wf_HLT_newco': 'running-open', 'wf_HLT_refer': 'running-open'},
+            {'wf_HLT_newco': 'running-open', 'wf_HLT_refer': 'running-open'},
+            {'wf_HLT_newco': 'running-open', 'wf_HLT_refer': 'running-open'},
+            {'wf_HLT_newco': 'completed', 'wf_HLT_refer': 'running-closed'},
+            {'wf_HLT_refer': 'completed'}])
+        waits = []
+        watcher = WorkflowWatcher(WORKFLOWS, self.journal, min_interval=10, max_interval=30, fetch=fetch)
+        self.assertTrue(watcher.watch(sleep=waits.append))
+        self.assertEqual(waits, [10, 20, 30, 10])
+        # completed workflows are not queried again
+        self.assertEqual(fetch.queries[-1], ['wf_HLT_refer'])
+        with open(self.journal) as f:
+            self.assertEqual(len(f.readlines()), 5)
+
+        # a new watcher resumes from the journal
+        resumed = WorkflowWatcher(WORKFLOWS, self.journal, fetch=FakeReqMgr([]))
+        self.assertEqual(resumed.pending(), [])
+        self.assertTrue(resumed.completed())
+
+    def test_query_error(self):
+        fetch = FakeReqMgr([
+            {'wf_HLT_newco': 'running-open', 'wf_HLT_refer': 'running-open'},
+            IOError('cmsweb.cern.ch timed out'),
+            {'wf_HLT_newco': 'completed', 'wf_HLT_refer': 'completed'}])
+        waits = []
+        watcher = WorkflowWatcher(WORKFLOWS, self.journal, min_interval=10, max_interval=30, fetch=fetch)
+        # the failed query backs off to max_interval and the watch goes on
+        self.assertTrue(watcher.watch(sleep=waits.append))
+        self.assertEqual(waits, [10, 30])
+        self.assertEqual(len(fetch.queries), 3)
+
+    def test_failed(self):
+        fetch = FakeReqMgr([{'wf_HLT_newco': 'completed', 'wf_HLT_refer': 'aborted'}])
+        watcher = WorkflowWatcher(WORKFLOWS, self.journal, fetch=fetch)
+        self.assertFalse(watcher.watch(sleep=lambda s: None))
+        self.assertEqual(watcher.failed(), ['wf_HLT_refer'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -19,6 +19,7 @@ import random
 import optparse
 import json
 import pprint
+import collections
 try:
     import ConfigParser
 except ImportError:
@@ -31,6 +32,8 @@ import ast
 sys.path.append(os.path.join(sys.path[0], 'modules'))
 from modules import helper
 from modules import wma # here u have all the components to interact with the wma
+from modules.dbs_runs import RunIndex
+from modules.request_validator import RequestValidator
 
 #-------------------------------------------------------------------------------
 workflow_file = "workflow_config.json"
@@ -46,7 +49,7 @@ default_parameters = {
     'priority': 181983,
     'request_type': 'ReReco',
     'scramarch': 'slc5_amd64_gcc462',
-    'includeparents': 'False',
+    'includeparents': False,
     'multicore': 1}
 
 if os.getenv('SCRAM_ARCH'):
@@ -75,6 +78,101 @@ class ExtendedOption (optparse.Option):
             optparse.Option.take_action(self, action, dest, opt, value,
                     values, parser)
 
+#-------------------------------------------------------------------------------
+NOT_DEFINED = "__NOT-DEFINED__"
+
+def to_bool(value):
+    '''
+    True/False in any case. 0/1 are refused: computing expects a boolean since 2016-11.
+    '''
+    if value.strip().upper() == 'TRUE':
+        return True
+    if value.strip().upper() == 'FALSE':
+        return False
+    raise ValueError(value)
+
+def to_int(value):
+    return int(float(value))
+
+# The parameters of a request with their type and default. Parameters whose
+# default depends on other parameters (e.g. step2_globaltag) are looked up with
+# Configuration.get_param.
+PARAMETERS = collections.OrderedDict([
+    ('wmtest', (bool, False)),
+    ('url_dict', (str, '')),
+    ('docID', (str, '')),
+    ('step1_docID', (str, '')),
+    ('step2_docID', (str, '')),
+    ('step3_docID', (str, '')),
+    ('cfg_db_file', (str, '')),
+    ('release', (str, '')),
+    ('globaltag', (str, '')),
+    ('pu_dataset', (str, '')),
+    ('primary_dataset', (str, '')),
+    ('filter_eff', (float, 1.0)),
+    ('number_events', (int, 0)),
+    ('version', (str, '')),
+    ('time_event', (float, 20)),
+    ('size_memory', (int, 2300)),
+    ('size_event', (int, 2000)),
+    ('multicore', (int, default_parameters['multicore'])),
+    ('scramarch', (str, default_parameters['scramarch'])),
+    ('identifier', (str, '')),
+    ('dbsurl', (str, default_parameters['dbsurl'])),
+    ('includeparents', (bool, default_parameters['includeparents'])),
+    ('req_name', (str, '')),
+    ('process_string', (str, '')),
+    ('processing_string', (str, '')),
+    ('batch', (str, '')),
+    ('skim_cfg', (str, '')),
+    ('skim_docID', (str, '')),
+    ('skim_name', (str, '')),
+    ('skim_input', (str, 'RECOoutput')),
+    ('priority', (int, default_parameters['priority'])),
+    ('blocks', (None, [])),
+    ('cfg_path', (str, '')),
+    ('step1_cfg', (str, '')),
+    ('harvest_cfg', (str, '')),
+    ('harvest_docID', (str, '')),
+    ('step1_output', (str, '')),
+    ('keep_step1', (bool, default_parameters['keep_step1'])),
+    ('step1_lumisperjob', (int, 5)),
+    ('step2_cfg', (str, '')),
+    ('step2_output', (str, '')),
+    ('step2_input', (str, 'Task1')),
+    ('keep_step2', (bool, default_parameters['keep_step2'])),
+    ('step2_lumisperjob', (int, 1)),
+    ('step2_timeevent', (float, 0)),
+    ('step2_memory', (int, 0)),
+    ('step3_cfg', (str, '')),
+    ('step3_output', (str, '')),
+    ('step3_input', (str, 'Task2')),
+    ('step3_lumisperjob', (int, 5)),
+    ('step3_timeevent', (float, 0)),
+    ('step3_memory', (int, 0)),
+    ('transient_output', (None, [])),
+    ('request_type', (str, default_parameters['request_type'])),
+    ('request_id', (str, '')),
+    ('events_per_job', (int, 0)),
+    ('events_per_lumi', (int, 100)), # 100 is legacy
+    ('force_lumis', (bool, False)),
+    ('brute_force', (bool, False)),
+    ('margin', (float, 0.05)),
+    ('lumi_list', (str, '')),
+    ('subreq_type', (str, '')),
+    ('campaign', (str, '')),
+    ('acquisition_era', (str, 'FAKE')),
+    ('lhe_input', (bool, False)),
+    ('dqmuploadurl', (str, 'https://cmsweb.cern.ch/dqm/offline')),
+    ('enableharvesting', (bool, False)),
+    ('dset_run_dict', (str, '')),
+    ('input_name', (str, ''))])
+
+CASTS = {bool: to_bool, int: to_int, float: float, str: str}
+
+# Typed and read-only parameters of one section
+Parameters = collections.namedtuple('Parameters', list(PARAMETERS))
+
 #-------------------------------------------------------------------------------
 class Configuration:
     '''
@@ -82,6 +180,8 @@ class Configuration:
     optionParser (command line) or a ConfigParser (ini cfg).
     The key is to build a ConfigParser object with a single section out
     of the option parser.
+    Every section is read once: params() returns its typed Parameters and
+    get_param() is a lookup in its values.
     '''
 
     default_section = '__OptionParser__'
@@ -89,6 +189,8 @@ class Configuration:
         # assume you have a .conf input file, first...
         # see : https://docs.python.org/2/library/configparser.html
         self.configparser = ConfigParser.ConfigParser()
+        self.__values = dict()
+        self.__params = dict()
 
         try:
             options,args = parser.parse_args()
@@ -120,7 +222,7 @@ class Configuration:
         self.configparser.add_section(self.__class__.default_section)
         for param,param_value in options.__dict__.items():
             if param_value == None:
-                param_value = "__NOT-DEFINED__"
+                param_value = NOT_DEFINED
             #print "Setting params in cfg: %s with default %s" %(param,param_value)
             ### HOLLY SHIT THE SYSTEMATIC RECASTING TO STR
             self.configparser.set(self.__class__.default_section, param,
@@ -129,42 +231,65 @@ class Configuration:
         #with open('example.cfg', 'wb') as configfile:
             #self.ConfigParser.write(configfile)
 
+    def values(self, section):
+        '''
+        The interpolated values of a section, DEFAULT included, read once.
+        '''
+        if section not in self.__values:
+            if not self.configparser.has_section(section):
+                raise Exception ("No section %s found in configuration." % (section))
+            self.__values[section] = dict(self.configparser.items(section))
+        return self.__values[section]
+
+    def params(self, section=default_section):
+        '''
+        The Parameters of a section, cast to their type once.
+        Raises a ValueError naming the section and the parameter for a bad value.
+        '''
+        if section not in self.__params:
+            values = self.values(section)
+            typed = dict()
+            for name, (kind, default) in PARAMETERS.items():
+                value = values.get(name.lower(), NOT_DEFINED)
+                if value == NOT_DEFINED or (kind not in (str, None) and value.strip() == ''):
+                    typed[name] = default
+                elif kind is None:
+                    typed[name] = value
+                else:
+                    try:
+                        typed[name] = CASTS[kind](value)
+                    except ValueError:
+                        raise ValueError("Section %s: parameter %s = '%s' is not a valid %s" % (
+                                section, name, value, kind.__name__))
+            self.__params[section] = Parameters(**typed)
+        return self.__params[section]
+
     def get_param(self, name, default=None, section=default_section, verbose=False):
         '''
         I am astonished that such function does not exist in Python!!
         '''
-        ret_val = None
         if verbose:
             print("I am looking for section %s and option %s, the default is #%s#" % (
                     name, section, default))
 
-        if self.configparser.has_section(section):
-            if self.configparser.has_option(section,name):
-                #print "Getting %s %s" %(section,name)
-                ret_val = self.configparser.get(section,name)
-                # We had a cfg file and the default was not given
-                if ret_val == "__NOT-DEFINED__":
-                    if verbose:
-                        print("I was reading parameter %s and I put the default %s" % (
-                                name, default))
-
-                    ret_val = default
-                # we have both: read and return!
-                else:
-                    pass
+        ret_val = self.values(section).get(name.lower())
+        if ret_val is None:
+            # We don't have the option, try to return the default
+            if default != None:
+                # Case 1, we have the default
+                ret_val = default
             else:
-                # We don't have the option, try to return the default
-                if default != None:
-                    # Case 1, we have the default
-                    ret_val = default
-                else:
-                    # Case 2, we do not have the default, exception
-                    raise Exception ("Parameter %s cannot be found in section %s and no default is given." % (
-                            name, section))
+                # Case 2, we do not have the default, exception
+                raise Exception ("Parameter %s cannot be found in section %s and no default is given." % (
+                        name, section))
 
-        else:
-            # No section found, just rais e an exception
-            raise Exception ("No section %s found in configuration." % (section))
+        # We had a cfg file and the default was not given
+        elif ret_val == NOT_DEFINED:
+            if verbose:
+                print("I was reading parameter %s and I put the default %s" % (
+                        name, default))
+
+            ret_val = default
 
         if verbose:
             print("I am returning the value #%s# type:%s" % (ret_val, ret_val.__class__))
@@ -172,24 +297,9 @@ class Configuration:
 
 def get_runs(dset_name, minrun=-1, maxrun=-1):
     '''
-    Get the runs from the DBS via the DBS interface
+    Get the runs from the DBS via the DBS3 interface, cached per dataset
     '''
-    print("Looking for runs in DBS for %s" % (dset_name))
-    minrun = int(minrun)
-    maxrun = int(maxrun)
-
-    # check if cmssw is set up for the dbs command
-    if "CMSSW_BASE" not in os.environ:
-        raise Exception("No CMSSW environment set. You need it to query dbs.")
-
-    return_data = json.loads(wma.generic_get(wma.WMAGENT_URL, wma.DBS3_URL + "runs?dataset=%s" % (dset_name)))
-    run_list = return_data[0]["run_num"]
-    if minrun >= 0:
-        run_list = filter(lambda n: n >= minrun,run_list)
-    if maxrun >= 0:
-        run_list = filter(lambda n: n <= maxrun,run_list)
-
-    return sorted(run_list)
+    return RunIndex().runs(dset_name, minrun, maxrun)
 
 #-------------------------------------------------------------------------------
 def custodial(datasetpath):
@@ -326,7 +436,7 @@ def get_dataset_runs_dict(section, cfg):
     dataset_runs_dict = {}
     run_list = []
     try:
-        dataset_runs_dict = ast.literal_eval(cfg.get_param('dset_run_dict', '', section))
+        dataset_runs_dict = ast.literal_eval(cfg.params(section).dset_run_dict)
         for key in dataset_runs_dict.keys(): # loop over PD's
             if isinstance(dataset_runs_dict[key], str):
                 if os.path.exists(dataset_runs_dict[key]):
@@ -349,7 +459,7 @@ def get_dataset_runs_dict(section, cfg):
                     #sys.exit()
                     return False
     except:
-        dataset_runs_dict[cfg.get_param('input_name', '', section)] = []
+        dataset_runs_dict[cfg.params(section).input_name] = []
     return dataset_runs_dict
 
 #-------------------------------------------------------------------------------
@@ -448,6 +558,10 @@ def loop_and_submit(cfg):
     wfIDs = get_workflow_dict()
     pp = pprint.PrettyPrinter(indent=4)
 
+    # parse all the sections first, a bad value stops us before any submission
+    for section in cfg.configparser.sections():
+        cfg.params(section)
+
     for section in cfg.configparser.sections():
         wfIDs.update({section: {}})
         # Warning muted
@@ -695,70 +809,61 @@ def build_params_dict(section,cfg):
     Put a dictionary on top?
     '''
 
+    # typed parameters of the section, parsed once
+    p = cfg.params(section)
+
     #wm testing
-    wmtest = cfg.get_param('wmtest', False, section)
-    url_dict = cfg.get_param('url_dict', "", section)
+    wmtest = p.wmtest
+    url_dict = p.url_dict
 
     # fetch some important parameters
     #this trick is to make the uniformation smoother and be able to read old cfgfiles
-    doc_id = step1_docID = ''
-    doc_id = step1_docID = cfg.get_param('docID', '', section)
-    dummy = cfg.get_param('step1_docID', '', section)
-    if dummy != '':
-        doc_id = step1_docID = dummy
-
-    step2_docid = cfg.get_param('step2_docID', '', section)
-    #print step2_docid
-    step3_docid = cfg.get_param('step3_docID', '', section)
-    #print step3_docid
+    doc_id = step1_docID = p.step1_docID or p.docID
+
+    step2_docid = p.step2_docID
+    step3_docid = p.step3_docID
     # elaborate the file containing the name docid pairs
-    cfg_db_file = cfg.get_param('cfg_db_file', '', section)
-    #print cfg_db_file
+    cfg_db_file = p.cfg_db_file
     cfg_docid_dict = make_cfg_docid_dict(cfg_db_file)
 
-    release = cfg.get_param('release', '', section)
-    globaltag = cfg.get_param('globaltag', '', section)
-    pileup_dataset = cfg.get_param('pu_dataset', '', section)
-    primary_dataset = cfg.get_param('primary_dataset', '', section)
+    release = p.release
+    globaltag = p.globaltag
+    pileup_dataset = p.pu_dataset
+    primary_dataset = p.primary_dataset
 
-    filter_eff = cfg.get_param('filter_eff', '', section)
-    if not filter_eff:
-        filter_eff = 1.0
+    filter_eff = p.filter_eff or 1.0
 
-    number_events = int(cfg.get_param('number_events', 0, section))
-    #number_events = cfg.get_param('number_events',0,section)
-    version = cfg.get_param('version', '', section)
+    number_events = p.number_events
+    version = p.version
 
     ##new values for renewed Request Agent
-    time_event = float(cfg.get_param('time_event', 20, section))
-    size_memory = int(float(cfg.get_param('size_memory', 2300, section)))
-    size_event = int(float(cfg.get_param('size_event', 2000, section)))
+    time_event = p.time_event
+    size_memory = p.size_memory
+    size_event = p.size_event
     if size_event < 0:
         size_event = 2000
 
-    multicore = int(float(cfg.get_param('multicore', 1, section)))
+    multicore = p.multicore
 
     # parameters with fallback
-    scramarch = cfg.get_param('scramarch', default_parameters['scramarch'], section)
-    #group = cfg.get_param('group',default_parameters['group'],section)
-    #requestor = cfg.get_param('requestor',default_parameters['requestor'],section)
-    identifier = cfg.get_param('identifier', '', section)
-    dbsurl = cfg.get_param('dbsurl', default_parameters['dbsurl'], section)
-    includeparents = cfg.get_param('includeparents', default_parameters['includeparents'], section)
-
-    req_name = cfg.get_param('req_name', '', section)
-    process_string = cfg.get_param('process_string', '', section)
-    processing_string = cfg.get_param('processing_string', '', section)
-    batch = cfg.get_param('batch', '', section)
+    scramarch = p.scramarch
+    identifier = p.identifier
+    dbsurl = p.dbsurl
+    includeparents = p.includeparents
+
+    req_name = p.req_name
+    process_string = p.process_string
+    processing_string = p.processing_string
+    batch = p.batch
 
     # for the user and group
     user, group = get_user_group(cfg, section)
 
     # for the skims
-    skim_cfg = cfg.get_param('skim_cfg', '', section)
-    skim_docid = cfg.get_param('skim_docID', '', section)
-    skim_name = cfg.get_param('skim_name', '', section)
-    skim_input = cfg.get_param('skim_input', 'RECOoutput', section)
+    skim_cfg = p.skim_cfg
+    skim_docid = p.skim_docID
+    skim_name = p.skim_name
+    skim_input = p.skim_input
 
     if not skim_docid and skim_cfg:
         if skim_cfg in cfg_docid_dict:
@@ -767,45 +872,41 @@ def build_params_dict(section,cfg):
             skim_docid = wma.upload_to_couch(skim_cfg, section, user, group,test_mode)
 
     # priority
-    priority = int(cfg.get_param('priority', default_parameters['priority'], section))
+    priority = p.priority
 
     #blocks
-    blocks = cfg.get_param('blocks', [], section)
+    blocks = p.blocks
 
     # Now the service ones
     # Service
-    step1_cfg = cfg_path = ''
-    step1_cfg = cfg_path = cfg.get_param('cfg_path', '', section)
-    dummy = cfg.get_param('step1_cfg', '', section)
-    if dummy != '':
-        step1_cfg = cfg_path = dummy
-
-    harvest_cfg = cfg.get_param('harvest_cfg', '', section)
-    harvest_docID = cfg.get_param('harvest_docID', '', section)
-
-    step1_output = cfg.get_param('step1_output', '', section)
-    keep_step1 = cfg.get_param('keep_step1', False, section)
-
-    step2_cfg = cfg.get_param('step2_cfg', '', section)
-    step2_docID = cfg.get_param('step2_docID', '', section)
-    step2_output = cfg.get_param('step2_output', '', section)
-    keep_step2 = cfg.get_param('keep_step2', False, section)
-
-    step3_cfg = cfg.get_param('step3_cfg', '', section)
-    step3_docID = cfg.get_param('step3_docID', '', section)
-    step3_output = cfg.get_param('step3_output' ,'', section)
-
-    transient_output = cfg.get_param('transient_output', [], section)
-
-    request_type = cfg.get_param('request_type', default_parameters['request_type'], section)
-    request_id = cfg.get_param('request_id', '' ,section)
-    events_per_job = cfg.get_param('events_per_job', '', section)
-    events_per_lumi = int(float(cfg.get_param('events_per_lumi', 100, section))) # 100 is legacy
-    force_lumis = cfg.get_param('force_lumis', False, section)
-    brute_force = cfg.get_param('brute_force', False, section)
-    margin = cfg.get_param('margin', 0.05, section)
-    lumi_list = cfg.get_param('lumi_list', '', section)
-    subrequest_type = cfg.get_param('subreq_type', '', section)
+    step1_cfg = cfg_path = p.step1_cfg or p.cfg_path
+
+    harvest_cfg = p.harvest_cfg
+    harvest_docID = p.harvest_docID
+
+    step1_output = p.step1_output
+    keep_step1 = p.keep_step1
+
+    step2_cfg = p.step2_cfg
+    step2_docID = p.step2_docID
+    step2_output = p.step2_output
+    keep_step2 = p.keep_step2
+
+    step3_cfg = p.step3_cfg
+    step3_docID = p.step3_docID
+    step3_output = p.step3_output
+
+    transient_output = p.transient_output
+
+    request_type = p.request_type
+    request_id = p.request_id
+    events_per_job = p.events_per_job
+    events_per_lumi = p.events_per_lumi
+    force_lumis = p.force_lumis
+    brute_force = p.brute_force
+    margin = p.margin
+    lumi_list = p.lumi_list
+    subrequest_type = p.subreq_type
 
     # Upload to couch if needed or check in the cfg dict if there
     docIDs = [step1_docID, step2_docID, step3_docID]
@@ -836,7 +937,7 @@ def build_params_dict(section,cfg):
         sys.exit(-1)
 
     # Extract Campaign from PREP-ID if necessary
-    campaign = cfg.get_param('campaign', '', section)
+    campaign = p.campaign
     if campaign == "" and request_id == "":
         print("Campaign and request-id are not set. Provide at least the Campaign.")
     elif campaign == "" and request_id != "":
@@ -845,7 +946,7 @@ def build_params_dict(section,cfg):
         print("Campaign and request-id are set. Using %s as campaign." % (campaign))
 
     ##get acquisitionEra if it was passed
-    acquisition_era = cfg.get_param('acquisition_era', 'FAKE', section)
+    acquisition_era = p.acquisition_era
 
     time_per_campaign = wma.time_per_events(campaign)
     if time_per_campaign:
@@ -956,7 +1057,7 @@ def build_params_dict(section,cfg):
                         "FirstLumi": 1,
                         "TimePerEvent": time_event,
                         "FilterEfficiency": filter_eff,
-                        "LheInputFiles": cfg.get_param('lhe_input', False, section),
+                        "LheInputFiles": p.lhe_input,
                         "RequestNumEvents": number_events,
                         "ConfigCacheID": step1_docID,
                         "PrimaryDataset": primary_dataset,
@@ -968,7 +1069,7 @@ def build_params_dict(section,cfg):
         if wmtest:
             params.pop("EventsPerLumi")
 
-        if params["LheInputFiles"] == 'True' or params["LheInputFiles"] == True:
+        if params["LheInputFiles"]:
             #max out to 500K for "lhe step zero"
             print("Setting events per job here !!!!",type(params["LheInputFiles"]),params["LheInputFiles"])
             events_per_job = 500000
@@ -995,7 +1096,7 @@ def build_params_dict(section,cfg):
         if pileup_dataset:
             params.update({"MCPileup": pileup_dataset})
 
-        if int(number_events):
+        if number_events:
             params.update({"RequestNumEvents": number_events})
 
     elif request_type == 'LHEStepZero':
@@ -1003,7 +1104,7 @@ def build_params_dict(section,cfg):
                         "TimePerEvent": time_event,
                         "FirstEvent": 1,
                         "FirstLumi": 1,
-                        "LheInputFiles" : cfg.get_param('lhe_input', False,section),
+                        "LheInputFiles" : p.lhe_input,
                         "Memory": 2300,
                         "SizePerEvent": size_event,
                         "ConfigCacheID": step1_docID,
@@ -1078,10 +1179,10 @@ def build_params_dict(section,cfg):
         task1_dict['GlobalTag'] = cfg.get_param('step1_globaltag', globaltag, section)
         task1_dict['ConfigCacheID'] = step1_docID
         task1_dict['KeepOutput'] = keep_step1
-        task1_dict['ProcessingString'] = cfg.get_param('processing_string', processing_string, section)
+        task1_dict['ProcessingString'] = processing_string
         task1_dict['AcquisitionEra'] = cfg.get_param('step1_era', params['CMSSWVersion'], section)
         task1_dict['Campaign'] = cfg.get_param('campaign', params['CMSSWVersion'], section)
-        task1_dict['LumisPerJob'] = int(cfg.get_param('step1_lumisperjob', 5, section))
+        task1_dict['LumisPerJob'] = p.step1_lumisperjob
 
         params['Task1'] = task1_dict
         params['TaskChain'] = 1
@@ -1091,7 +1192,7 @@ def build_params_dict(section,cfg):
             task2_dict['CMSSWVersion'] = cfg.get_param('step2_release', params['CMSSWVersion'], section)
             task2_dict['ConfigCacheID'] = step2_docID
             task2_dict['InputFromOutputModule'] = step2_output
-            task2_dict['InputTask'] = cfg.get_param('step2_input', 'Task1', section)
+            task2_dict['InputTask'] = p.step2_input
             #task2_dict['KeepOutput'] = keep_step2 # THIS NEEDS BE ASSESSED!!!! GF: check with Alan's example of taskchain
 
             # global processing_string, the value for the entire workflow,
@@ -1100,7 +1201,12 @@ def build_params_dict(section,cfg):
             # if not specified in .conf, AcquisitionEra is set to the CMSSW release of the current task => MUST BE DISCUSSED w/ PdmV for behaviour on MC
             task2_dict['AcquisitionEra'] = cfg.get_param('step2_era', task2_dict['CMSSWVersion'], section)
             task2_dict['Campaign'] = cfg.get_param('campaign', task2_dict['CMSSWVersion'], section)
-            task2_dict['LumisPerJob'] = int(cfg.get_param('step2_lumisperjob', 1, section))
+            task2_dict['LumisPerJob'] = p.step2_lumisperjob
+            # the tasks inherit TimePerEvent and Memory of the request unless they have their own
+            if p.step2_timeevent:
+                task2_dict['TimePerEvent'] = p.step2_timeevent
+            if p.step2_memory:
+                task2_dict['Memory'] = p.step2_memory
             params['Task2'] = task2_dict
             params['TaskChain'] = 2
 
@@ -1110,13 +1216,17 @@ def build_params_dict(section,cfg):
                 task3_dict['CMSSWVersion'] = cfg.get_param('step3_release', params['CMSSWVersion'], section)
                 task3_dict['ConfigCacheID'] = step3_docID
                 task3_dict['InputFromOutputModule'] = step3_output
-                task3_dict['InputTask'] = cfg.get_param('step3_input', 'Task2', section)
+                task3_dict['InputTask'] = p.step3_input
                 # global processing_string, the value for the entire workflow, always exists in the scope of build_params_dict (could be set to ''). If step3_processstring not set, step3'll inhering the global value
                 task3_dict['ProcessingString'] = cfg.get_param('step3_processstring', processing_string, section)
                 # if not specified in .conf, AcquisitionEra is set to the CMSSW release of the current task => MUST BE DISCUSSED w/ PdmV for behaviour on MC
                 task3_dict['AcquisitionEra'] = cfg.get_param('step3_era', task3_dict['CMSSWVersion'], section)
                 task3_dict['Campaign'] = cfg.get_param('campaign', task3_dict['CMSSWVersion'], section)
-                task3_dict['LumisPerJob'] = int(cfg.get_param('step3_lumisperjob',5,section))
+                task3_dict['LumisPerJob'] = p.step3_lumisperjob
+                if p.step3_timeevent:
+                    task3_dict['TimePerEvent'] = p.step3_timeevent
+                if p.step3_memory:
+                    task3_dict['Memory'] = p.step3_memory
                 #task3_dict['KeepOutput'] = keep_step3   # ASSESS THIS ONE !!!
                 params['Task3'] = task3_dict
                 params['TaskChain'] = 3
@@ -1130,7 +1240,7 @@ def build_params_dict(section,cfg):
                         "Scenario": "pp",
                         "PrepID": request_id,
                         "TransientOutputModules":transient_output,
-                        "DQMUploadUrl": cfg.get_param('dqmuploadurl', 'https://cmsweb.cern.ch/dqm/offline', section),
+                        "DQMUploadUrl": p.dqmuploadurl,
                         "DQMConfigCacheID": harvest_docID})
 
     else:
@@ -1139,22 +1249,10 @@ def build_params_dict(section,cfg):
 
     if harvest_docID and request_type != "DQMHarvest":
         ##setup automatic harvesting
+        ##computing expects a boolean since 2016-11, old 0/1 values are refused when the section is parsed
+        params["EnableHarvesting"] = p.enableharvesting
 
-        __enable_harvesting = cfg.get_param('enableharvesting', 'False', section)
-        ##checks mandatory since 2016-11 as computing expects boolean as a string or a boolean option. Was 0 or 1...
-        ##we crash in case people still set wrong/old value in config file
-
-        if __enable_harvesting.upper() == 'TRUE':
-            params["EnableHarvesting"] = True
-        elif __enable_harvesting.upper() == 'FALSE':
-            params["EnableHarvesting"] = False
-        else:
-            print("enableHarvesting parameter given: %s. Expecting a boolean" % (
-                    __enable_harvesting))
-
-            raise Exception('enableharvesting value is wrong type')
-
-        params.update({"DQMUploadUrl": cfg.get_param('dqmuploadurl', 'https://cmsweb.cern.ch/dqm/offline', section),
+        params.update({"DQMUploadUrl": p.dqmuploadurl,
                         "DQMConfigCacheID": harvest_docID})
 
     ## pop any empty parameters
@@ -1214,6 +1312,8 @@ def build_parser():
     parser.add_option('--step2-era', help='AcquisitionEra for step2 in a TaskChain', dest='step2_era')
     parser.add_option('--step2-output', help='step 2 output', dest='step2_output')
     parser.add_option('--step2-lumisperjob', help='lumi per job of step 2 in a TaskChain', dest='step2_lumisperjob')
+    parser.add_option('--step2-timeevent', help='time per event of step 2 in a TaskChain', dest='step2_timeevent')
+    parser.add_option('--step2-memory', help='RSS memory in MB of step 2 in a TaskChain', dest='step2_memory')
     parser.add_option('--keep-step2', help='step2 output keeping flag', action='store_true', dest='keep_step2')
     parser.add_option('--step2-docID', help='step 2 configuration', dest='step2_docID')
     parser.add_option('--step3-cfg', help='step 3 configuration', dest='step3_cfg')
@@ -1223,6 +1323,8 @@ def build_parser():
 
     parser.add_option('--step3-era', help='AcquisitionEra for step3 in a TaskChain', dest='step3_era')
     parser.add_option('--step3-lumisperjob', help='lumi per job of step 3 in a TaskChain', dest='step3_lumisperjob')
+    parser.add_option('--step3-timeevent', help='time per event of step 3 in a TaskChain', dest='step3_timeevent')
+    parser.add_option('--step3-memory', help='RSS memory in MB of step 3 in a TaskChain', dest='step3_memory')
     parser.add_option('--step3-docID', help='step 3 configuration', dest='step3_docID')
     parser.add_option('--priority', help='priority flag', dest='priority')
     parser.add_option('--primary-dataset', help='primary dataset name', dest='primary_dataset')
@@ -1322,5 +1424,10 @@ if __name__ == "__main__":
     # here we have all parameters, taken from commandline or config
     config = Configuration(parser)
 
+    # check all the requests offline, before uploading or injecting anything
+    if RequestValidator(config).report():
+        sys.stderr.write("[wmcontrol exception] Invalid requests in the configuration")
+        sys.exit(-1)
+
     # loop on the requests and submit them
     loop_and_submit(config)
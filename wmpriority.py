@@ -1,15 +1,10 @@
 #! /usr/bin/env python
 from __future__ import print_function
-try:
-    import httplib
-except ImportError:
-    import http.client as httplib
-
 import sys
-import os
 import optparse
 import time
 import json
+from modules import credentials
 
 
 def change_priority(url, workflow, priority, cert, key, retry):
@@ -18,7 +13,7 @@ def change_priority(url, workflow, priority, cert, key, retry):
                'Accept': 'application/json'}
 
     for _ in range(retry):
-        conn = httplib.HTTPSConnection(url, cert_file=cert, key_file=key)
+        conn = credentials.https_connection(url, cert, key)
         conn.request('PUT', '/reqmgr2/data/request/%s' % workflow, json.dumps(data), headers)
         response = conn.getresponse()
         status, res = response.status, response.read()
@@ -39,13 +34,13 @@ def main():
                       dest='url',
                       default='cmsweb.cern.ch')
     parser.add_option('-c', '--cert',
-                      help='Cert file location',
+                      help='Cert file location (Default: the checked X509 proxy)',
                       dest='cert',
-                      default=os.getenv('X509_USER_PROXY'))
+                      default=None)
     parser.add_option('-k', '--key',
-                      help='Key file location',
+                      help='Key file location (Default: the cert file)',
                       dest='key',
-                      default=os.getenv('X509_USER_PROXY'))
+                      default=None)
     parser.add_option('-r', '--retry',
                       help='Number of retries',
                       dest='retry',
@@ -0,0 +1,172 @@
+#! /usr/bin/env python3
+"""
+Watch the workflows of a validation until they are completed.
+
+The workflows of workflow_config.json are polled in batched ReqMgr2
+queries, quickly while their status changes and more and more slowly while
+nothing happens. Every status transition is appended to a JSON-Lines
+journal, and when all the workflows are completed a marker file is written
+and the --on-complete command is run, e.g. to start the TWiki and Jira
+follow-up.
+"""
+from __future__ import print_function
+import os
+import sys
+import json
+import time
+import optparse
+import subprocess
+from modules import wma
+
+# statuses of the workflows that produced their output
+COMPLETED = {'completed', 'closed-out', 'announced', 'normal-archived'}
+# statuses of the workflows that will never complete
+FAILED = {'failed', 'aborted', 'aborted-completed', 'aborted-archived', 'rejected', 'rejected-archived'}
+
+
+def load_workflows(path='workflow_config.json'):
+    """Returns {workflow name: section} of the submitted workflows"""
+    config = json.load(open(path))
+    return dict((values['workflow_name'], section) for section, values in config.items() if 'workflow_name' in values)
+
+
+class WorkflowWatcher():
+
+    def __init__(self, workflows, journal='wmwatch_journal.jsonl', min_interval=60, max_interval=1800,
+                 fetch=None):
+        """Poll the status of workflows and journal the transitions
+
+        Arguments
+        workflows -- {workflow name: section}
+        journal -- JSON-Lines file of the transitions, the last statuses are reloaded from it
+        min_interval -- seconds between two polls while statuses change
+        max_interval -- longest wait between two polls, reached doubling the wait while nothing changes
+        fetch -- function(workflows) returning {workflow: status}, batched ReqMgr2 queries by default
+        """
+        self.workflows = workflows
+        self.journal = journal
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.fetch = fetch or (lambda names: wma.getWorkflowsStatus(wma.WMAGENT_URL, names))
+        self.statuses = self.load_journal()
+
+    def load_journal(self):
+        statuses = dict()
+        if os.path.exists(self.journal):
+            with open(self.journal) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    statuses[entry['workflow']] = entry['status']
+        return statuses
+
+    def record(self, workflow, status):
+        entry = {'time': time.time(), 'workflow': workflow, 'section': self.workflows.get(workflow, ''),
+                 'previous': self.statuses.get(workflow), 'status': status}
+        with open(self.journal, 'a') as f:
+            f.write(json.dumps(entry, sort_keys=True) + '\n')
+        print('%s %-80s %s -> %s' % (time.strftime('%Y-%m-%d %H:%M:%S'), workflow, entry['previous'], status))
+        self.statuses[workflow] = status
+
+    def pending(self):
+        """Workflows not completed nor failed yet"""
+        return [w for w in self.workflows if self.statuses.get(w) not in COMPLETED | FAILED]
+
+    def poll(self):
+        """Query the pending workflows once, returns the number of transitions.
+        A failed query is reported and the next one waits max_interval"""
+        changed = 0
+        try:
+            statuses = self.fetch(self.pending())
+        except Exception as e:
+            print('%s Query of the workflow statuses failed, retrying in %d s: %s' % (
+                time.strftime('%Y-%m-%d %H:%M:%S'), self.max_interval, e), file=sys.stderr)
+            self.interval = self.max_interval
+            return changed
+        for workflow, status in statuses.items():
+            if workflow in self.workflows and status != self.statuses.get(workflow):
+                self.record(workflow, status)
+                changed += 1
+        # fast while the workflows move, slower and slower while they do not
+        self.interval = self.min_interval if changed else min(self.interval * 2, self.max_interval)
+        return changed
+
+    def completed(self):
+        return all(self.statuses.get(w) in COMPLETED for w in self.workflows)
+
+    def failed(self):
+        return sorted(w for w in self.workflows if self.statuses.get(w) in FAILED)
+
+    def watch(self, sleep=time.sleep):
+        """Poll until every workflow is completed or failed, returns True if all are completed"""
+        while self.pending():
+            self.poll()
+            if self.pending():
+                sleep(self.interval)
+        return self.completed()
+
+
+def on_complete(watcher, marker, command=None):
+    """Write the completion marker and run the follow-up command"""
+    with open(marker, 'w') as f:
+        json.dump({'completed_at': time.time(), 'statuses': watcher.statuses}, f, indent=2)
+    print('All %d workflows are completed, written %s' % (len(watcher.workflows), marker))
+    if command:
+        print('Running: %s' % command)
+        return subprocess.call(command, shell=True)
+    return 0
+
+
+def getOptions():
+    parser = optparse.OptionParser()
+    parser.add_option('-c', '--config', help='Submitted workflows', dest='config', default='workflow_config.json')
+    parser.add_option('-w', '--workflows', help='Comma separated workflows to watch instead of those of --config',
+                      dest='workflows', default='')
+    parser.add_option('-j', '--journal', help='Journal of the status transitions', dest='journal',
+                      default='wmwatch_journal.jsonl')
+    parser.add_option('--marker', help='File written when all the workflows are completed', dest='marker',
+                      default='workflows_completed.json')
+    parser.add_option('--on-complete', help='Command to run when all the workflows are completed',
+                      dest='on_complete', default=None)
+    parser.add_option('--min-interval', help='Seconds between polls while statuses change', dest='min_interval',
+                      type='int', default=60)
+    parser.add_option('--max-interval', help='Longest wait between polls in seconds', dest='max_interval',
+                      type='int', default=1800)
+    parser.add_option('--once', help='Poll once and print the statuses', action='store_true', dest='once',
+                      default=False)
+    parser.add_option('--wmtest', help='To watch requests in the cmsweb test bed', action='store_true',
+                      dest='wmtest', default=False)
+    parser.add_option('--wmtesturl', help='To watch a specific testbed', dest='wmtesturl',
+                      default='cmsweb-testbed.cern.ch')
+    try:
+        options, _ = parser.parse_args()
+        return options
+    except SystemExit:
+        print("Error in parsing options")
+        sys.exit(-1)
+
+
+if __name__ == '__main__':
+    options = getOptions()
+    if options.wmtest:
+        wma.testbed(options.wmtesturl)
+    if options.workflows:
+        workflows = dict((w, '') for w in options.workflows.split(','))
+    else:
+        workflows = load_workflows(options.config)
+    if not workflows:
+        print('No workflows found')
+        sys.exit(-1)
+    watcher = WorkflowWatcher(workflows, options.journal, options.min_interval, options.max_interval)
+    if options.once:
+        watcher.poll()
+        for workflow in sorted(workflows):
+            print('%-80s %s' % (workflow, watcher.statuses.get(workflow)))
+        sys.exit(0)
+    if watcher.watch():
+        sys.exit(on_complete(watcher, options.marker, options.on_complete))
+    print('Workflows that will not complete: %s' % ', '.join(watcher.failed()))
+    sys.exit(1)